@@ -3,46 +3,77 @@
 """
 from flask import Flask
 from flask_login import LoginManager
+from werkzeug.utils import import_string
 from config import config
 from app.models import db, User
+from app.services.queries import user_by_id
+from app.services.assets import assets
+from app.services.availability import availability_index
+from app.services.circuit_breaker import circuit_breaker
+from app.services.idempotency import idempotency_store
+from app.services.rate_limit import rate_limiter
+from app.services.reminders import reminder_scheduler
+from app.services.sqlite_writer import sqlite_writer
+from app.services.stale_reads import stale_reads
+from app.utils.json_provider import FastJSONProvider
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Пожалуйста, войдите в систему для доступа к этой странице.'
 login_manager.login_message_category = 'info'
 
+# Blueprints: имя -> (путь к объекту, url_prefix). Модули роутов
+# импортируются только для запрошенных blueprints
+BLUEPRINTS = {
+    'auth': ('app.routes.auth:auth_bp', None),
+    'api': ('app.routes.api:api_bp', '/api'),
+    'main': ('app.routes.main:main_bp', None),
+}
+
 
 @login_manager.user_loader
 def load_user(user_id):
     """Загрузить пользователя из базы данных."""
-    return db.session.get(User, int(user_id))
+    return db.session.execute(user_by_id(), {'user_id': int(user_id)}).scalar_one_or_none()
     
 
-def create_app(config_name='development'):
+def create_app(config_name='development', blueprints=None):
     """
     создание Flask приложения с правильным конфигом.
     
     Args:
         config_name: Имя конфигурации ('development', 'testing', 'production')
+        blueprints: Имена blueprints из BLUEPRINTS (по умолчанию все).
+            Скриптам без HTTP (архивация, outbox, отчёты) роуты не нужны:
+            () не импортирует ни одного модуля роутов
     
     Returns:
         Flask приложение
     """
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
     # Инициализация расширений
     db.init_app(app)
     login_manager.init_app(app)
+    reminder_scheduler.init_app(app)
+    rate_limiter.init_app(app)
+    idempotency_store.init_app(app)
+    sqlite_writer.init_app(app)
+    availability_index.init_app(app)
+    circuit_breaker.init_app(app)
+    stale_reads.init_app(app)
+    assets.init_app(app)
+    if app.config.get('PROFILER_TOKEN') or app.config.get('PROFILER_SAMPLE_RATE'):
+        # Профилировщик нужен редко: без токена и доли модуль не загружается
+        from app.services.profiler import request_profiler
+        request_profiler.init_app(app)
     
     # Регистрация blueprints
-    from app.routes.auth import auth_bp
-    from app.routes.api import api_bp
-    from app.routes.main import main_bp
-    
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(api_bp, url_prefix='/api')
-    app.register_blueprint(main_bp)
+    for name in BLUEPRINTS if blueprints is None else blueprints:
+        path, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(import_string(path), url_prefix=url_prefix)
     
     return app
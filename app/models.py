@@ -5,6 +5,7 @@ from datetime import datetime
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 
 db = SQLAlchemy()
 
@@ -18,6 +19,10 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Счётчик изменений подписок пользователя (токен delta-синхронизации)
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    # Токены меньше этого значения устарели: надгробия до него удалены
+    sync_floor_seq = db.Column(db.BigInteger, nullable=False, default=0)
     
     # Связь с подписками
     subscriptions = db.relationship('Subscription', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -43,9 +48,23 @@ class Subscription(db.Model):
     name = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     interval = db.Column(db.String(20), nullable=False)  # 'monthly' или 'yearly'
-    next_billing_date = db.Column(db.Date, nullable=False)
+    next_billing_date = db.Column(db.Date, nullable=False, index=True)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Индекс - для sync_changes() планировщика напоминаний
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Версия строки для оптимистической блокировки (ETag / If-Match)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Номер последнего изменения в счётчике пользователя (users.change_seq)
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_subscriptions_user_change_seq', 'user_id', 'change_seq'),
+        # id не переиспользуются: архивированная подписка восстанавливается
+        # под своим id
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version}
     
     def __repr__(self):
         return f'<Subscription {self.name} - {self.amount}>'
@@ -56,14 +75,121 @@ class Subscription(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'name': self.name,
-            'amount': float(self.amount),
+            'amount': self.amount,
             'interval': self.interval,
-            'next_billing_date': self.next_billing_date.isoformat() if self.next_billing_date else None,
+            'next_billing_date': self.next_billing_date,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'version': self.version
         }
 
 
+# Триграммный индекс для поиска по названию (только PostgreSQL)
+event.listen(
+    Subscription.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+event.listen(
+    Subscription.__table__,
+    'after_create',
+    DDL(
+        'CREATE INDEX IF NOT EXISTS ix_subscriptions_name_trgm '
+        'ON subscriptions USING gin (name gin_trgm_ops)'
+    ).execute_if(dialect='postgresql'),
+)
+
+
+class ArchivedSubscription(db.Model):
+    """Неактивная подписка, перенесённая из горячей таблицы в архив."""
+    __tablename__ = 'subscriptions_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(200), nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    interval = db.Column(db.String(20), nullable=False)
+    next_billing_date = db.Column(db.Date, nullable=False)
+    is_active = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    to_dict = Subscription.to_dict
+    
+    def __repr__(self):
+        return f'<ArchivedSubscription {self.name} - {self.amount}>'
+
+
+class SubscriptionTombstone(db.Model):
+    """Надгробие удалённой подписки для delta-синхронизации."""
+    __tablename__ = 'subscription_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    subscription_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_subscription_tombstones_user_change_seq', 'user_id', 'change_seq'),
+    )
+    
+    def __repr__(self):
+        return f'<SubscriptionTombstone {self.subscription_id}@{self.change_seq}>'
+
+
+class OutboxEvent(db.Model):
+    """Событие изменения подписки для доставки во внешний сервис (outbox)."""
+    __tablename__ = 'outbox_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    endpoint = db.Column(db.String(255), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)  # 'subscription.created', ...
+    user_id = db.Column(db.Integer, nullable=False)
+    subscription_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.BigInteger, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON данных подписки
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    delivered_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_events_pending', 'endpoint', 'delivered_at', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<OutboxEvent {self.event_type} {self.subscription_id}@{self.change_seq}>'
+
+
+class IdempotencyKey(db.Model):
+    """Ответ на запрос с заголовком Idempotency-Key (общий для всех воркеров)."""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.LargeBinary(16), nullable=False)  # хеш тела запроса
+    # None, пока ответ не сохранён (запрос выполняется)
+    status_code = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    headers = db.Column(db.JSON, nullable=True)  # [[имя, значение], ...]
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'endpoint', 'key', name='uq_idempotency_keys_user_endpoint_key'),
+    )
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.endpoint}:{self.key}>'
+
+
 class AuditLog(db.Model):
     """Модель лога аудита."""
     __tablename__ = 'audit_logs'
@@ -91,7 +217,7 @@ class AuditLog(db.Model):
             'action': self.action,
             'entity_type': self.entity_type,
             'entity_id': self.entity_id,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'timestamp': self.timestamp,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent
         }
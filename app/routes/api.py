@@ -1,45 +1,280 @@
 """
 RESTful API эндпоинты для управления подписками.
 """
-from flask import Blueprint, request, jsonify
+import codecs
+import io
+from flask import (
+    Blueprint, Response, abort, current_app, g, request, jsonify, stream_with_context, url_for
+)
 from flask_login import login_required, current_user
-from datetime import datetime
-from app.models import db, Subscription
+from sqlalchemy import bindparam
+from datetime import date, datetime, timedelta
+from app.models import db, ArchivedSubscription, Subscription
 from app.utils.validators import validate_subscription_interval, validate_date
+from app.services import archive
 from app.services.audit import log_audit_event
+from app.services.deadlines import deadline
+from app.services.events import change_notifier, stream_changes, stream_slots
+from app.services.formats import compress_response, list_response
+from app.services.idempotency import IdempotencyConflict, idempotency_store
+from app.services import outbox
+from app.services.queries import (
+    AUDIT_LOG_FIELDS, SUBSCRIPTION_FIELDS, active_subscription_fields_by_user,
+    active_subscriptions_by_user, archived_subscription_by_id, parse_fields,
+    recent_audit_log_fields_by_user, recent_audit_logs_by_user, subscription_by_id,
+    subscription_fields_by_id
+)
+from app.services.rate_limit import rate_limiter
+from app.services.reminders import reminder_scheduler
+from app.services.search import search_index, search_subscriptions
+from app.services.sqlite_writer import sqlite_writer
+from app.services.stale_reads import stale_reads
+from app.services.sync import (
+    StaleSyncToken, add_tombstone, current_change_seq, get_changes, next_change_seq, parse_token
+)
 
 api_bp = Blueprint('api', __name__)
+api_bp.before_request(rate_limiter.api_guard)
+api_bp.after_request(compress_response)
+
+
+def _on_subscription_saved(subscription):
+    """Обновить in-process индексы после создания или изменения подписки."""
+    reminder_scheduler.schedule(subscription)
+    search_index.upsert(subscription)
+    change_notifier.notify(subscription.user_id, subscription.change_seq)
+
+
+def _on_subscription_deleted(user_id, subscription_id, change_seq):
+    """Обновить in-process индексы после удаления подписки."""
+    reminder_scheduler.cancel(subscription_id)
+    search_index.remove(user_id, subscription_id)
+    change_notifier.notify(user_id, change_seq)
+
+
+def _insert_subscription(values, reservation=None):
+    """
+    Задание записи: вставить подписку и событие outbox, вернуть строку.
+
+    Idempotency-Key резервируется первым, в той же транзакции.
+    """
+    if reservation is not None:
+        idempotency_store.reserve(reservation)
+    subscription = Subscription(**values)
+    subscription.change_seq = next_change_seq(subscription.user_id)
+    db.session.add(subscription)
+    db.session.flush()
+    outbox.enqueue('subscription.created', subscription.user_id, subscription.id,
+                   subscription.change_seq, subscription.to_dict())
+    return {column.name: getattr(subscription, column.name) for column in Subscription.__table__.columns}
+
+
+class _NoRowsMatched(Exception):
+    """Условная запись не затронула ни одной строки: задание откатывается."""
+
+
+def _update_subscription(user_id, stmt):
+    """Задание записи: UPDATE ... RETURNING и событие outbox, вернуть строку."""
+    change_seq = next_change_seq(user_id)
+    row = db.session.execute(stmt, {'change_seq': change_seq}).mappings().first()
+    if row is None:
+        raise _NoRowsMatched()
+    values = dict(row)
+    outbox.enqueue('subscription.updated', user_id, values['id'], change_seq,
+                   Subscription(**values).to_dict())
+    return values
+
+
+def _delete_subscription(user_id, subscription_id, stmt):
+    """Задание записи: DELETE, надгробие и событие outbox, вернуть change_seq."""
+    change_seq = next_change_seq(user_id)
+    if db.session.execute(stmt).scalar_one_or_none() is None:
+        raise _NoRowsMatched()
+    add_tombstone(user_id, subscription_id, change_seq)
+    outbox.enqueue('subscription.deleted', user_id, subscription_id, change_seq, None)
+    return change_seq
+
+
+def _restore_subscription(subscription_id):
+    """Задание записи: вернуть подписку из архива и событие outbox, вернуть строку."""
+    subscription = archive.restore(subscription_id)
+    outbox.enqueue('subscription.restored', subscription.user_id, subscription.id,
+                   subscription.change_seq, subscription.to_dict())
+    return {column.name: getattr(subscription, column.name) for column in Subscription.__table__.columns}
+
+
+def _requested_fields(allowed):
+    """
+    Поля из ?fields=.
+
+    Returns:
+        tuple: (поля или None, ответ 400 или None)
+    """
+    try:
+        return parse_fields(request.args.get('fields'), allowed), None
+    except ValueError as e:
+        return None, (jsonify({
+            'error': f'Неизвестные поля: {e}' if str(e) else 'Не указаны поля',
+            'fields': list(allowed)
+        }), 400)
 
 
 @api_bp.route('/subscriptions', methods=['GET'])
+@stale_reads.serve_stale
+@deadline(500)
 @login_required
 def get_subscriptions():
-    """Получить список всех активных подписок текущего пользователя."""
-    subscriptions = Subscription.query.filter_by(
-        user_id=current_user.id,
-        is_active=True
-    ).all()
+    """
+    Получить список всех активных подписок текущего пользователя.
+    
+    ?fields=id,name,amount ограничивает и SELECT, и ответ этими полями.
+    """
+    fields, error = _requested_fields(SUBSCRIPTION_FIELDS)
+    if error is not None:
+        return error
+    params = {'user_id': current_user.id}
+    
+    if fields is None:
+        subscriptions = db.session.execute(active_subscriptions_by_user(), params).scalars().all()
+        return list_response('subscriptions', [sub.to_dict() for sub in subscriptions],
+                             SUBSCRIPTION_FIELDS)
     
+    rows = db.session.execute(active_subscription_fields_by_user(fields), params).mappings()
+    return list_response('subscriptions', [dict(row) for row in rows], fields)
+
+
+@api_bp.route('/subscriptions/search', methods=['GET'])
+@stale_reads.serve_stale
+@deadline(300)
+@login_required
+def find_subscriptions():
+    """Найти подписки текущего пользователя по названию."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Параметр q обязателен'}), 400
+    if len(query) > 200:
+        return jsonify({'error': 'Слишком длинный запрос'}), 400
+
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, 100))
+
+    results = search_subscriptions(current_user.id, query, limit)
     return jsonify({
-        'subscriptions': [sub.to_dict() for sub in subscriptions]
+        'subscriptions': [
+            dict(sub.to_dict(), score=round(score, 4)) for sub, score in results
+        ]
     }), 200
 
 
+@api_bp.route('/subscriptions/changes', methods=['GET'])
+@stale_reads.serve_stale
+@deadline(500)
+@login_required
+def get_subscription_changes():
+    """
+    Получить изменения подписок после токена синхронизации.
+    
+    Без since возвращается полный снимок (включая неактивные подписки).
+    Ответ 410 означает, что токен устарел и нужна полная пересинхронизация.
+    """
+    since = parse_token(request.args.get('since'))
+    if since is None:
+        return jsonify({'error': 'Некорректный токен синхронизации'}), 400
+    
+    limit = request.args.get('limit', 500, type=int)
+    limit = max(1, min(limit, 1000))
+    
+    try:
+        changes = get_changes(current_user.id, since, limit)
+    except StaleSyncToken:
+        return jsonify({'error': 'Токен устарел, требуется полная синхронизация'}), 410
+    
+    return jsonify({
+        'changed': [sub.to_dict() for sub in changes['changed']],
+        'deleted': changes['deleted'],
+        'next': str(changes['next']),
+        'has_more': changes['has_more']
+    }), 200
+
+
+@api_bp.route('/subscriptions/events', methods=['GET'])
+@deadline(500)
+@login_required
+def subscription_events():
+    """
+    Поток server-sent events с изменениями подписок текущего пользователя.
+    
+    Id события - токен синхронизации; браузер сам передаёт его в
+    Last-Event-ID при переподключении. Без него поток начинается с
+    текущего состояния. Если в воркере уже открыто EVENTS_MAX_STREAMS
+    лент, ответ 503 с Retry-After: клиент опрашивает /changes и
+    переподключается позже с last_event_id.
+    """
+    user_id = current_user.id
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    if last_event_id is None:
+        since = current_change_seq(user_id)
+    else:
+        since = parse_token(last_event_id)
+        if since is None:
+            return jsonify({'error': 'Некорректный Last-Event-ID'}), 400
+    release = stream_slots.acquire(current_app.config['EVENTS_MAX_STREAMS'])
+    if release is None:
+        return jsonify({'error': 'Слишком много открытых лент изменений'}), 503, {
+            'Retry-After': str(current_app.config['EVENTS_RETRY_AFTER'])
+        }
+    # Поток открывает свои транзакции: соединение роута возвращаем в пул
+    db.session.close()
+    
+    response = Response(
+        stream_with_context(stream_changes(user_id, since, on_close=release)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Место освобождается и тогда, когда поток так и не начался
+    response.call_on_close(release)
+    return response
+
+
 @api_bp.route('/subscriptions/<int:subscription_id>', methods=['GET'])
+@stale_reads.serve_stale
+@deadline(200)
 @login_required
 def get_subscription(subscription_id):
-    """Получить детали одной подписки."""
-    subscription = Subscription.query.get_or_404(subscription_id)
+    """Получить детали одной подписки (в том числе из архива)."""
+    fields, error = _requested_fields(SUBSCRIPTION_FIELDS)
+    if error is not None:
+        return error
+    if fields is not None:
+        params = {'subscription_id': subscription_id, 'user_id': current_user.id}
+        row = (
+            db.session.execute(subscription_fields_by_id(fields), params).mappings().first()
+            or db.session.execute(subscription_fields_by_id(fields, archived=True), params).mappings().first()
+        )
+        if row is not None:
+            # ETag только если версия запрошена: лишние колонки не читаем
+            headers = {'ETag': f'"{row["version"]}"'} if 'version' in fields else {}
+            return jsonify(dict(row)), 200, headers
+        # Нет своей подписки: ниже различаем 404 и 403
+    
+    params = {'subscription_id': subscription_id}
+    subscription = db.session.execute(subscription_by_id(), params).scalar_one_or_none()
+    if subscription is None:
+        subscription = db.session.execute(archived_subscription_by_id(), params).scalar_one_or_none()
+    if subscription is None:
+        abort(404)
     
     # Проверка прав доступа
     if subscription.user_id != current_user.id:
         return jsonify({'error': 'Доступ запрещен'}), 403
     
-    return jsonify(subscription.to_dict()), 200
+    return jsonify(subscription.to_dict()), 200, {'ETag': f'"{subscription.version}"'}
 
 
 @api_bp.route('/subscriptions', methods=['POST'])
+@deadline(1000)
 @login_required
+@idempotency_store.idempotent
 def create_subscription():
     """Создать новую подписку."""
     data = request.get_json()
@@ -80,46 +315,127 @@ def create_subscription():
     if errors:
         return jsonify({'errors': errors}), 400
     
-    # Создание подписки
-    subscription = Subscription(
-        user_id=current_user.id,
-        name=name,
-        amount=amount,
-        interval=interval,
-        next_billing_date=next_billing_date,
-        is_active=True
-    )
+    # Создание подписки (в SQLite профиле - через очередь писателя)
+    values = {
+        'user_id': current_user.id,
+        'name': name,
+        'amount': amount,
+        'interval': interval,
+        'next_billing_date': next_billing_date,
+        'is_active': True
+    }
     
     try:
-        db.session.add(subscription)
-        db.session.commit()
+        # Снимок строки вне сессии, как и при обновлении
+        subscription = Subscription(**sqlite_writer.run(
+            _insert_subscription, values, g.get('idempotency_reservation')))
         
         # Логирование аудита
         log_audit_event(current_user.id, 'create', 'subscription', subscription.id, request)
+        _on_subscription_saved(subscription)
         
-        return jsonify(subscription.to_dict()), 201
+        return jsonify(subscription.to_dict()), 201, {'ETag': f'"{subscription.version}"'}
+    except IdempotencyConflict:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Ошибка при создании подписки'}), 500
 
 
-@api_bp.route('/subscriptions/<int:subscription_id>', methods=['PUT'])
+def _schedule_imported(user_id, first_seq, last_seq):
+    """Поставить напоминания импортированным подпискам из окна планировщика."""
+    if not reminder_scheduler.is_loaded:
+        return
+    config = current_app.config
+    until = date.today() + timedelta(days=config['REMINDER_HORIZON_DAYS'] + config['REMINDER_DAYS_BEFORE'])
+    rows = db.session.execute(
+        db.select(*Subscription.__table__.columns)
+        .where(Subscription.user_id == user_id)
+        .where(Subscription.change_seq.between(first_seq, last_seq))
+        .where(Subscription.next_billing_date <= until)
+    ).mappings()
+    for row in rows:
+        reminder_scheduler.schedule(Subscription(**row))
+
+
+@api_bp.route('/subscriptions/import', methods=['POST'])
+@deadline(120_000)
 @login_required
-def update_subscription(subscription_id):
-    """Обновить существующую подписку."""
-    subscription = Subscription.query.get_or_404(subscription_id)
-    
-    # Проверка прав доступа
-    if subscription.user_id != current_user.id:
-        return jsonify({'error': 'Доступ запрещен'}), 403
-    
-    data = request.get_json()
-    if not data:
-        return jsonify({'error': 'Данные не предоставлены'}), 400
-    
+def import_subscriptions():
+    """
+    Импортировать подписки из выписки CSV или OFX.
+
+    Файл - тело запроса или поле file формы multipart/form-data. Формат
+    задаётся ?format=csv|ofx, типом содержимого или расширением файла,
+    иначе определяется по первым байтам; кодировка - ?encoding=
+    (по умолчанию utf-8). Строки с ошибками пропускаются и
+    перечисляются в ответе. Файл читается и проверяется до записи в БД,
+    остальные строки загружаются пачками (см. app.services.statement_import).
+    """
+    # Редкий роут: модуль импорта выписок и csv загружаются при первом вызове
+    import csv
+    from app.services.statement_import import (
+        ImportFormatError, detect_format, load_statement, read_csv, read_ofx,
+        validate_statement,
+    )
+
+    if request.content_length is None:
+        return jsonify({'error': 'Нужен заголовок Content-Length'}), 411
+    if request.content_length > current_app.config['IMPORT_MAX_BYTES']:
+        return jsonify({'error': 'Файл слишком большой'}), 413
+
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if upload is not None:
+        stream, mimetype, filename = upload.stream, upload.mimetype, upload.filename
+        head = stream.read(512)
+        stream.seek(0)
+    else:
+        stream, mimetype, filename = io.BufferedReader(request.stream), request.mimetype, ''
+        head = stream.peek(512)[:512]
+
+    file_format = request.args.get('format') or detect_format(head, mimetype, filename)
+    readers = {'csv': read_csv, 'ofx': read_ofx}
+    if file_format not in readers:
+        return jsonify({'error': "Формат должен быть 'csv' или 'ofx'"}), 415
+    encoding = request.args.get('encoding', 'utf-8')
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return jsonify({'error': f'Неизвестная кодировка: {encoding}'}), 400
+
+    try:
+        result, rows = validate_statement(readers[file_format](stream, encoding))
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Не удалось разобрать файл: {e}'}), 400
+
+    with rows:
+        try:
+            load_statement(current_user.id, rows, result, request._get_current_object())
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Ошибка импорта выписки: {e}")
+            error = {'error': 'Ошибка при импорте подписок', 'imported': result['imported']}
+            return jsonify(error), 500
+        finally:
+            # С писателем SQLite пачки до ошибки уже зафиксированы
+            first_seq, last_seq = result.pop('first_change_seq'), result.pop('last_change_seq')
+            if result['imported']:
+                search_index.invalidate(current_user.id)
+                _schedule_imported(current_user.id, first_seq, last_seq)
+                change_notifier.notify(current_user.id, last_seq)
+    return jsonify(result)
+
+
+def _parse_subscription_changes(data):
+    """
+    Провалидировать частичное обновление подписки.
+
+    Returns:
+        tuple: (dict изменяемых колонок, list ошибок)
+    """
+    values = {}
     errors = []
     
-    # Обновление полей (только если они предоставлены)
     if 'name' in data:
         name = data['name'].strip()
         if not name:
@@ -127,7 +443,7 @@ def update_subscription(subscription_id):
         elif len(name) > 200:
             errors.append('Название подписки слишком длинное')
         else:
-            subscription.name = name
+            values['name'] = name
     
     if 'amount' in data:
         try:
@@ -135,7 +451,7 @@ def update_subscription(subscription_id):
             if amount <= 0:
                 errors.append('Сумма должна быть положительным числом')
             else:
-                subscription.amount = amount
+                values['amount'] = amount
         except (ValueError, TypeError):
             errors.append('Некорректная сумма')
     
@@ -144,68 +460,193 @@ def update_subscription(subscription_id):
         if not validate_subscription_interval(interval):
             errors.append("Интервал должен быть 'monthly' или 'yearly'")
         else:
-            subscription.interval = interval
+            values['interval'] = interval
     
     if 'next_billing_date' in data:
         is_valid_date, next_billing_date = validate_date(data['next_billing_date'])
         if not is_valid_date:
             errors.append('Некорректная дата следующего списания (формат: YYYY-MM-DD)')
         else:
-            subscription.next_billing_date = next_billing_date
+            values['next_billing_date'] = next_billing_date
+    
+    return values, errors
+
+
+def _if_match_versions():
+    """
+    Версии из заголовка If-Match.
+
+    Returns:
+        list или None: None, если заголовка нет или он равен '*'
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    versions = []
+    for etag in request.if_match.as_set(include_weak=True):
+        try:
+            versions.append(int(etag))
+        except ValueError:
+            continue
+    return versions
+
+
+def _scoped_write_failed(subscription_id):
+    """
+    Определить, почему условная запись не затронула ни одной строки.
+
+    Выполняется только на пути ошибки, успешные запросы обходятся
+    одним обращением к БД.
+    """
+    row = db.session.execute(
+        db.select(Subscription.user_id, Subscription.version)
+        .where(Subscription.id == subscription_id)
+    ).first()
+    archived = row is None and db.session.execute(
+        db.select(ArchivedSubscription.user_id)
+        .where(ArchivedSubscription.id == subscription_id)
+        .where(ArchivedSubscription.user_id == current_user.id)
+    ).first() is not None
+    db.session.rollback()
     
+    if archived:
+        return jsonify({
+            'error': 'Подписка в архиве, сначала восстановите её',
+            'restore': url_for('api.restore_subscription', subscription_id=subscription_id)
+        }), 409
+    if row is None:
+        return jsonify({'error': 'Ресурс не найден'}), 404
+    if row.user_id != current_user.id:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    return jsonify({
+        'error': 'Подписка была изменена другим запросом',
+        'version': row.version
+    }), 412, {'ETag': f'"{row.version}"'}
+
+
+@api_bp.route('/subscriptions/<int:subscription_id>', methods=['PUT', 'PATCH'])
+@deadline(1000)
+@login_required
+def update_subscription(subscription_id):
+    """
+    Обновить существующую подписку.
+    
+    Строка меняется одним UPDATE ... WHERE id AND user_id [AND version]
+    RETURNING, без предварительного чтения; в той же транзакции
+    увеличивается счётчик изменений пользователя. Заголовок If-Match
+    включает оптимистическую блокировку по версии.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'Данные не предоставлены'}), 400
+    
+    values, errors = _parse_subscription_changes(data)
+    if not errors and not values:
+        errors.append('Нет полей для обновления')
     if errors:
         return jsonify({'errors': errors}), 400
     
+    stmt = (
+        db.update(Subscription)
+        .where(Subscription.id == subscription_id)
+        .where(Subscription.user_id == current_user.id)
+        .values(version=Subscription.version + 1, change_seq=bindparam('change_seq'), **values)
+        .returning(*Subscription.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+    versions = _if_match_versions()
+    if versions is not None:
+        stmt = stmt.where(Subscription.version.in_(versions))
+    
     try:
-        db.session.commit()
+        # Снимок строки вне сессии: commit не инвалидирует его атрибуты
+        subscription = Subscription(**sqlite_writer.run(_update_subscription, current_user.id, stmt))
         
         # Логирование аудита
         log_audit_event(current_user.id, 'update', 'subscription', subscription.id, request)
+        _on_subscription_saved(subscription)
         
-        return jsonify(subscription.to_dict()), 200
+        return jsonify(subscription.to_dict()), 200, {'ETag': f'"{subscription.version}"'}
+    except _NoRowsMatched:
+        return _scoped_write_failed(subscription_id)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Ошибка при обновлении подписки'}), 500
 
 
 @api_bp.route('/subscriptions/<int:subscription_id>', methods=['DELETE'])
+@deadline(1000)
 @login_required
 def delete_subscription(subscription_id):
-    """Удалить подписку."""
-    subscription = Subscription.query.get_or_404(subscription_id)
-    
-    # Проверка прав доступа
-    if subscription.user_id != current_user.id:
-        return jsonify({'error': 'Доступ запрещен'}), 403
+    """Удалить подписку одним DELETE с проверкой владельца и версии."""
+    stmt = (
+        db.delete(Subscription)
+        .where(Subscription.id == subscription_id)
+        .where(Subscription.user_id == current_user.id)
+        .returning(Subscription.id)
+        .execution_options(synchronize_session='fetch')
+    )
+    versions = _if_match_versions()
+    if versions is not None:
+        stmt = stmt.where(Subscription.version.in_(versions))
     
     try:
-        # Физическое удаление
-        db.session.delete(subscription)
-        db.session.commit()
+        # Физическое удаление, для синхронизации остаётся надгробие
+        change_seq = sqlite_writer.run(_delete_subscription, current_user.id, subscription_id, stmt)
         
         # Логирование аудита
         log_audit_event(current_user.id, 'delete', 'subscription', subscription_id, request)
+        _on_subscription_deleted(current_user.id, subscription_id, change_seq)
         
         return jsonify({'message': 'Подписка удалена'}), 200
+    except _NoRowsMatched:
+        return _scoped_write_failed(subscription_id)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Ошибка при удалении подписки'}), 500
 
 
+@api_bp.route('/subscriptions/<int:subscription_id>/restore', methods=['POST'])
+@deadline(1000)
+@login_required
+def restore_subscription(subscription_id):
+    """Вернуть подписку из архива."""
+    archived = db.session.execute(
+        archived_subscription_by_id(), {'subscription_id': subscription_id}
+    ).scalar_one_or_none()
+    if archived is None:
+        return jsonify({'error': 'Подписка не найдена в архиве'}), 404
+    if archived.user_id != current_user.id:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    try:
+        subscription = Subscription(**sqlite_writer.run(_restore_subscription, subscription_id))
+        
+        log_audit_event(current_user.id, 'restore', 'subscription', subscription.id, request)
+        _on_subscription_saved(subscription)
+        
+        return jsonify(subscription.to_dict()), 200, {'ETag': f'"{subscription.version}"'}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Ошибка при восстановлении подписки'}), 500
+
+
 @api_bp.route('/audit_logs', methods=['GET'])
+@stale_reads.serve_stale
+@deadline(1000)
 @login_required
 def get_audit_logs():
-    """Получить логи аудита текущего пользователя."""
-    from app.models import AuditLog
+    """Получить логи аудита текущего пользователя (поддерживает ?fields=)."""
+    fields, error = _requested_fields(AUDIT_LOG_FIELDS)
+    if error is not None:
+        return error
+    params = {'user_id': current_user.id}
     
-    logs = AuditLog.query.filter_by(user_id=current_user.id)\
-        .order_by(AuditLog.timestamp.desc())\
-        .limit(100)\
-        .all()
+    if fields is None:
+        logs = db.session.execute(recent_audit_logs_by_user(), params).scalars().all()
+        return list_response('audit_logs', [log.to_dict() for log in logs], AUDIT_LOG_FIELDS)
     
-    return jsonify({
-        'audit_logs': [log.to_dict() for log in logs]
-    }), 200
+    rows = db.session.execute(recent_audit_log_fields_by_user(fields), params).mappings()
+    return list_response('audit_logs', [dict(row) for row in rows], fields)
 
 
 # Обработчики ошибок
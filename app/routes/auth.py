@@ -6,11 +6,24 @@ from flask_login import login_user, logout_user, login_required, current_user
 from app.models import db, User
 from app.utils.validators import validate_email, validate_password
 from app.services.audit import log_audit_event
+from app.services.availability import availability_index
+from app.services.deadlines import deadline
+from app.services.rate_limit import rate_limiter
+from app.services.sqlite_writer import sqlite_writer
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def _login_username():
+    """Имя пользователя из формы входа: ключ лимита на учётную запись."""
+    data = request.get_json(silent=True) if request.is_json else request.form
+    return (data or {}).get('username', '').strip().lower() or None
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@deadline(3000)
+@rate_limiter.limit(ip='20/minute', user='10/minute', user_key=_login_username, methods=('POST',))
+@rate_limiter.admission('auth', methods=('POST',))
 def login():
     """Страница входа."""
     if current_user.is_authenticated:
@@ -44,7 +57,18 @@ def login():
     return render_template('login.html')
 
 
+def _insert_user(values):
+    """Задание записи: вставить пользователя, вернуть строку."""
+    user = User(**values)
+    db.session.add(user)
+    db.session.flush()
+    return {column.name: getattr(user, column.name) for column in User.__table__.columns}
+
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@deadline(3000)
+@rate_limiter.limit(ip='5/minute', methods=('POST',))
+@rate_limiter.admission('auth', methods=('POST',))
 def register():
     """Страница регистрации."""
     if current_user.is_authenticated:
@@ -84,13 +108,17 @@ def register():
                 flash(error, 'error')
             return render_template('register.html')
         
-        # Создание пользователя
+        # Создание пользователя: хеш пароля считается в потоке запроса,
+        # в SQLite профиле в очередь писателя уходит только INSERT
         user = User(username=username, email=email)
         user.set_password(password)
         
         try:
-            db.session.add(user)
-            db.session.commit()
+            user = User(**sqlite_writer.run(_insert_user, {
+                'username': user.username, 'email': user.email, 'password_hash': user.password_hash,
+            }))
+            
+            availability_index.add(user.username, user.email)
             
             # Логирование аудита
             log_audit_event(user.id, 'create', 'user', user.id, request)
@@ -110,7 +138,33 @@ def register():
     return render_template('register.html')
 
 
+@auth_bp.route('/availability')
+@deadline(300)
+@rate_limiter.limit(ip='120/minute')
+def availability():
+    """
+    Свободны ли имя пользователя и/или email (проверка формы регистрации).
+    
+    Ответ: {"username": true, "email": false} - только по переданным
+    параметрам. Без обращения к БД, если значения нет в фильтре Блума.
+    """
+    username = request.args.get('username', '').strip()
+    email = request.args.get('email', '').strip()
+    if not username and not email:
+        return jsonify({'error': 'Укажите username и/или email'}), 400
+    if len(username) > 80 or len(email) > 120:
+        return jsonify({'error': 'Слишком длинное значение'}), 400
+    
+    result = {}
+    if username:
+        result['username'] = availability_index.username_available(username)
+    if email:
+        result['email'] = availability_index.email_available(email)
+    return jsonify(result), 200, {'Cache-Control': 'no-store'}
+
+
 @auth_bp.route('/logout')
+@deadline(500)
 @login_required
 def logout():
     """Выход из системы."""
@@ -4,6 +4,8 @@
 from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
 
+from app.services.stale_reads import stale_reads
+
 main_bp = Blueprint('main', __name__)
 
 
@@ -16,6 +18,7 @@ def index():
 
 
 @main_bp.route('/subscriptions')
+@stale_reads.serve_stale
 @login_required
 def subscriptions():
     """Страница управления подписками."""
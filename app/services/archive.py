@@ -0,0 +1,108 @@
+"""
+Архив неактивных подписок (разделение на горячие и холодные данные).
+
+Неактивные подписки, не менявшиеся дольше порога, переносятся из
+subscriptions в subscriptions_archive небольшими пачками, каждая в своей
+короткой транзакции, поэтому перенос не держит долгих блокировок и не
+раздувает журнал. Горячая таблица и её индексы содержат только то, что
+нужно спискам, а чтение одной подписки прозрачно продолжается в архиве.
+Восстановление возвращает строку под тем же id.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import literal
+
+from app.models import db, ArchivedSubscription, Subscription
+from app.services.sync import next_change_seq
+
+_COLUMNS = [column.name for column in Subscription.__table__.columns]
+
+
+def archive_inactive(older_than_days=90, chunk_size=1000, pause=0.0, now=None):
+    """
+    Перенести в архив неактивные подписки, не менявшиеся older_than_days дней.
+
+    Args:
+        chunk_size: Сколько строк переносить за одну транзакцию
+        pause: Пауза между пачками в секундах (снижает нагрузку на БД)
+
+    Returns:
+        int: Число перенесённых подписок
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    inactive = (
+        db.select(Subscription.id)
+        .where(Subscription.is_active.is_(False))
+        .where(Subscription.updated_at < cutoff)
+        .order_by(Subscription.id)
+        .limit(chunk_size)
+    )
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Строки, которые сейчас меняет API, возьмём в следующий раз
+        inactive = inactive.with_for_update(skip_locked=True)
+
+    moved = 0
+    while True:
+        ids = db.session.execute(inactive).scalars().all()
+        if not ids:
+            break
+        db.session.execute(
+            db.insert(ArchivedSubscription).from_select(
+                _COLUMNS + ['archived_at'],
+                db.select(*Subscription.__table__.columns, literal(now))
+                .where(Subscription.id.in_(ids))
+                .where(Subscription.is_active.is_(False)),
+            )
+        )
+        # Повторная проверка is_active: подписку могли включить после выборки
+        result = db.session.execute(
+            db.delete(Subscription)
+            .where(Subscription.id.in_(ids))
+            .where(Subscription.is_active.is_(False))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        moved += result.rowcount
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def restore(subscription_id):
+    """
+    Вернуть подписку из архива в горячую таблицу в текущей транзакции.
+
+    Восстановление считается изменением для delta-синхронизации: строка
+    получает новый change_seq.
+
+    Returns:
+        Subscription или None: восстановленная подписка или None, если её
+        нет в архиве
+    """
+    user_id = db.session.execute(
+        db.select(ArchivedSubscription.user_id).where(ArchivedSubscription.id == subscription_id)
+    ).scalar_one_or_none()
+    if user_id is None:
+        return None
+
+    change_seq = next_change_seq(user_id)
+    columns = [
+        literal(change_seq) if name == 'change_seq' else ArchivedSubscription.__table__.c[name]
+        for name in _COLUMNS
+    ]
+    db.session.execute(
+        db.insert(Subscription).from_select(
+            _COLUMNS,
+            db.select(*columns).where(ArchivedSubscription.id == subscription_id),
+        )
+    )
+    db.session.execute(
+        db.delete(ArchivedSubscription)
+        .where(ArchivedSubscription.id == subscription_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.get(Subscription, subscription_id, populate_existing=True)
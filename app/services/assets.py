@@ -0,0 +1,352 @@
+"""
+Статические файлы с хешем содержимого в имени и предсжатыми копиями.
+
+Сборка (build_assets.py, при сборке образа) минифицирует CSS и JS из
+app/static, пишет их в ASSETS_DIR под именами с хешем содержимого
+(css/style.3f2a9c1b0d4e5f60.css), рядом - копии .gz и .br (если
+установлен brotli) и manifest.json: исходное имя -> имя с хешем.
+
+В шаблонах asset_url('css/style.css') возвращает адрес собранного файла
+под ASSETS_URL_PATH. Имя меняется вместе с содержимым, поэтому ответ
+кешируется браузером навсегда (Cache-Control: immutable) и не
+перепроверяется при каждой загрузке страницы. Предсжатая копия
+выбирается по Accept-Encoding и отдаётся send_file с путём к файлу:
+gunicorn передаёт такие ответы через sendfile, без чтения в Python.
+Без сборки (разработка) asset_url ведёт на обычный /static.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: только gzip
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+# Предсжатые копии: кодировка -> суффикс файла, в порядке предпочтения
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_WORD = re.compile(r'[\w$\\]|[^\x00-\x7f]')
+
+# Символы и слова, после которых / начинает регулярное выражение, а не деление
+_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORD = re.compile(
+    r'(?:^|[^\w$])(?:return|typeof|instanceof|in|of|new|delete|void|throw|case|do|else|yield|await)$'
+)
+
+# Конец и начало выражения, между которыми перевод строки нельзя убрать:
+# он может быть точкой с запятой (автоматическая вставка в JS)
+_STATEMENT_END = frozenset(')]}\'"`+-')
+_STATEMENT_START = frozenset('([{\'"`+-!~/')
+
+_CSS_TIGHT = frozenset('{};,>')
+
+
+def _is_word(char):
+    return bool(_WORD.match(char))
+
+
+def _read_string(source, start):
+    """Конец строкового литерала '...' или "..." (индекс после кавычки)."""
+    quote = source[start]
+    i = start + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote:
+            return i + 1
+        i += 1
+    raise ValueError(f'Незакрытая строка с позиции {start}')
+
+
+def _read_template(source, start):
+    """Конец шаблонной строки `...` с подстановками ${...} (любой вложенности)."""
+    i = start + 1
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '`':
+            return i + 1
+        if source.startswith('${', i):
+            depth = 1
+            i += 2
+            while depth:
+                if i >= len(source):
+                    break
+                char = source[i]
+                if char in '\'"':
+                    i = _read_string(source, i)
+                    continue
+                if char == '`':
+                    i = _read_template(source, i)
+                    continue
+                depth += {'{': 1, '}': -1}.get(char, 0)
+                i += 1
+            continue
+        i += 1
+    raise ValueError(f'Незакрытая шаблонная строка с позиции {start}')
+
+
+def _read_regex(source, start):
+    """Конец литерала регулярного выражения /.../flags."""
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            break
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and _is_word(source[i]):
+                i += 1
+            return i
+        i += 1
+    raise ValueError(f'Незакрытое регулярное выражение с позиции {start}')
+
+
+def minify_js(source):
+    """
+    Убрать комментарии и лишние пробелы из JavaScript.
+
+    Строки, шаблонные строки и регулярные выражения копируются как есть.
+    Перевод строки сохраняется там, где он может заменять точку с
+    запятой, поэтому минификация не меняет смысл кода без ";".
+    """
+    out = []
+    i, length = 0, len(source)
+    pending_space = None  # None, ' ' или '\n' - пропуск перед следующим токеном
+    last = ''  # последний значимый выведенный символ
+
+    def emit(text):
+        nonlocal pending_space, last
+        if pending_space is not None and last:
+            first = text[0]
+            if _is_word(last) and _is_word(first):
+                out.append(pending_space)
+            elif pending_space == '\n' and (_is_word(last) or last in _STATEMENT_END) \
+                    and (_is_word(first) or first in _STATEMENT_START):
+                out.append('\n')
+            elif last in '+-' and first in '+-':
+                out.append(' ')
+        pending_space = None
+        out.append(text)
+        last = text[-1]
+
+    while i < length:
+        char = source[i]
+        if char in ' \t\r\n\f\v':
+            j = i
+            while j < length and source[j] in ' \t\r\n\f\v':
+                j += 1
+            newline = '\n' in source[i:j]
+            pending_space = '\n' if newline or pending_space == '\n' else ' '
+            i = j
+        elif source.startswith('//', i):
+            j = source.find('\n', i)
+            i = length if j == -1 else j
+        elif source.startswith('/*', i):
+            j = source.find('*/', i + 2)
+            if j == -1:
+                raise ValueError(f'Незакрытый комментарий с позиции {i}')
+            # Комментарий с переводом строки - тоже перевод строки для ASI
+            if '\n' in source[i:j]:
+                pending_space = '\n'
+            elif pending_space is None:
+                pending_space = ' '
+            i = j + 2
+        elif char in '\'"':
+            j = _read_string(source, i)
+            emit(source[i:j])
+            i = j
+        elif char == '`':
+            j = _read_template(source, i)
+            emit(source[i:j])
+            i = j
+        elif char == '/' and (not last or last in _REGEX_PRECEDERS
+                              or _REGEX_KEYWORD.search(''.join(out[-12:]))):
+            j = _read_regex(source, i)
+            emit(source[i:j])
+            i = j
+        else:
+            emit(char)
+            i += 1
+    return ''.join(out) + '\n'
+
+
+def minify_css(source):
+    """Убрать комментарии и лишние пробелы из CSS (строки не меняются)."""
+    out = []
+    i, length = 0, len(source)
+    pending_space = False
+
+    def emit(text):
+        nonlocal pending_space
+        if pending_space and out and out[-1][-1] not in _CSS_TIGHT and out[-1][-1] != ':' \
+                and text[0] not in _CSS_TIGHT:
+            out.append(' ')
+        pending_space = False
+        out.append(text)
+
+    while i < length:
+        char = source[i]
+        if char.isspace():
+            pending_space = True
+            i += 1
+        elif source.startswith('/*', i):
+            j = source.find('*/', i + 2)
+            if j == -1:
+                raise ValueError(f'Незакрытый комментарий с позиции {i}')
+            i = j + 2
+        elif char in '\'"':
+            j = _read_string(source, i)
+            emit(source[i:j])
+            i = j
+        elif char == '}' and out and out[-1] == ';':
+            # Последняя точка с запятой блока не нужна
+            out[-1] = '}'
+            pending_space = False
+            i += 1
+        else:
+            emit(char)
+            i += 1
+    return ''.join(out) + '\n'
+
+
+_MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def build_assets(source_dir, output_dir):
+    """
+    Собрать статические файлы: минификация, хеш в имени, предсжатие.
+
+    Файлы прошлых сборок не удаляются: страницы, открытые до выкладки,
+    могут ещё запросить старые имена.
+
+    Args:
+        source_dir: Каталог исходников (app/static)
+        output_dir: Каталог сборки (ASSETS_DIR)
+
+    Returns:
+        dict: исходное имя -> {'path', 'bytes', 'source_bytes', 'gzip', 'br'}
+            (размеры предсжатых копий или None)
+    """
+    source_dir, output_dir = Path(source_dir), Path(output_dir)
+    manifest, report = {}, {}
+    for source in sorted(source_dir.rglob('*')):
+        if source.suffix not in _MINIFIERS or output_dir in source.parents:
+            continue
+        name = source.relative_to(source_dir).as_posix()
+        text = source.read_text(encoding='utf-8')
+        data = _MINIFIERS[source.suffix](text).encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+        hashed = f"{name[:-len(source.suffix)]}.{digest}{source.suffix}"
+        target = output_dir / hashed
+        _write(target, data)
+
+        sizes = {'gzip': None, 'br': None}
+        # mtime=0: одинаковый вход даёт побайтно одинаковый .gz
+        compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(data, quality=11)
+        for encoding, suffix in ENCODINGS:
+            if encoding in compressed and len(compressed[encoding]) < len(data):
+                _write(target.with_name(target.name + suffix), compressed[encoding])
+                sizes[encoding] = len(compressed[encoding])
+
+        manifest[name] = hashed
+        report[name] = dict(sizes, path=hashed, bytes=len(data), source_bytes=len(text.encode('utf-8')))
+
+    _write(output_dir / MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return report
+
+
+class AssetManifest:
+    """Адреса собранных файлов для шаблонов и их отдача с долгим кешем."""
+
+    def __init__(self):
+        self.directory = None
+        self.manifest = {}
+        self._variants = {}
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DIR', str(Path(app.root_path).parent / 'build' / 'assets'))
+        app.config.setdefault('ASSETS_URL_PATH', '/assets')
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 86400)
+        app.extensions['assets'] = self
+        self.load(app.config['ASSETS_DIR'])
+        app.add_url_rule(f"{app.config['ASSETS_URL_PATH']}/<path:filename>", 'assets', self.serve)
+        app.add_template_global(self.url, 'asset_url')
+
+    def load(self, directory):
+        """Прочитать manifest.json сборки (без сборки - пустой манифест)."""
+        self.directory = Path(directory)
+        try:
+            self.manifest = json.loads((self.directory / MANIFEST).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            self.manifest = {}
+        # Какие предсжатые копии есть у каждого файла: проверяется один раз
+        self._variants = {
+            hashed: tuple(
+                (encoding, suffix) for encoding, suffix in ENCODINGS
+                if (self.directory / (hashed + suffix)).is_file()
+            )
+            for hashed in self.manifest.values()
+        }
+
+    def url(self, filename):
+        """Адрес файла: собранный с хешем или обычный /static без сборки."""
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        variants = self._variants.get(filename)
+        if variants is None:
+            abort(404)
+
+        encodings = request.accept_encodings
+        encoding, suffix = next(
+            ((encoding, suffix) for encoding, suffix in variants if encodings[encoding]),
+            (None, ''),
+        )
+        response = send_from_directory(
+            self.directory, filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0],
+            max_age=current_app.config['ASSETS_MAX_AGE'],
+        )
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if variants:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = AssetManifest()
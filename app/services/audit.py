@@ -1,8 +1,20 @@
 """
 Сервис для логирования действий пользователей (аудит).
 """
+from datetime import datetime
+
 from flask import request
 from app.models import db, AuditLog
+from app.services.sqlite_writer import sqlite_writer
+
+
+def _insert_audit_log(values):
+    db.session.add(AuditLog(**values))
+
+
+def _report_failure(future):
+    if future.exception() is not None:
+        print(f"Ошибка при записи в аудит: {future.exception()}")
 
 
 def log_audit_event(user_id, action, entity_type, entity_id, request_obj=None):
@@ -23,15 +35,22 @@ def log_audit_event(user_id, action, entity_type, entity_id, request_obj=None):
         ip_address = request_obj.remote_addr
         user_agent = request_obj.headers.get('User-Agent', '')[:255]  # Ограничение длины
     
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
+    values = {
+        'user_id': user_id,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'timestamp': datetime.utcnow(),
+        'ip_address': ip_address,
+        'user_agent': user_agent
+    }
+    
+    if sqlite_writer.enabled:
+        # Запись аудита не ждём: она уйдёт в БД со следующей пачкой
+        sqlite_writer.submit(_insert_audit_log, values).add_done_callback(_report_failure)
+        return
     
+    audit_log = AuditLog(**values)
     try:
         db.session.add(audit_log)
         db.session.commit()
@@ -0,0 +1,431 @@
+"""
+Холодное хранилище старых записей аудита в колоночных сегментах.
+
+Записи аудита старше порога нужны только при расследованиях, поэтому
+ночная задача переносит их из audit_logs в файлы сегментов на локальном
+диске и удаляет из таблицы. Сегмент хранит строки, отсортированные по
+(user_id, timestamp, id), блоками по AUDIT_ARCHIVE_BLOCK_ROWS строк.
+Каждая колонка блока сжата zlib отдельно:
+
+- user_id - серии (пользователь, число строк): после сортировки строки
+  пользователя идут подряд;
+- timestamp (микросекунды) и id - разности соседних значений внутри
+  серии пользователя (в основном небольшие числа), первое значение
+  серии - целиком;
+- entity_id - целые как есть;
+- action, entity_type, ip_address, user_agent - словарь значений блока и
+  коды (1-4 байта на строку).
+
+Оглавление в конце файла хранит для каждого блока смещения колонок и
+диапазоны user_id и времени. Чтение отображает файл в память (mmap),
+пропускает блоки по оглавлению, находит серии пользователя и
+восстанавливает время только внутри них (двоичный поиск по периоду);
+остальные колонки распаковываются, только если в блоке нашлись строки.
+Массивы пишутся в порядке байтов машины: сегменты читаются там же, где
+записаны.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+from app.models import db, AuditLog
+
+MAGIC = b'AUDSEG1\n'
+COLUMNS = ('id', 'user_id', 'action', 'entity_type', 'entity_id', 'timestamp',
+           'ip_address', 'user_agent')
+
+_TRAILER = struct.Struct('<Q8s')  # длина оглавления, MAGIC
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NULL_USER = -1  # user_id анонимных событий (в сегменте нет NULL)
+_STRING_COLUMNS = ('action', 'entity_type', 'ip_address', 'user_agent')
+
+
+def _to_micros(value):
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _runs(users):
+    """Серии одинаковых user_id: список (user_id, начало, конец)."""
+    runs = []
+    start = 0
+    for i in range(1, len(users) + 1):
+        if i == len(users) or users[i] != users[start]:
+            runs.append((users[start], start, i))
+            start = i
+    return runs
+
+
+def _run_deltas(values, runs):
+    deltas = []
+    for _, start, end in runs:
+        previous = 0
+        for value in values[start:end]:
+            deltas.append(value - previous)
+            previous = value
+    return deltas
+
+
+def _encode_ints(values):
+    return array('q', values).tobytes()
+
+
+def _decode_ints(data):
+    values = array('q')
+    values.frombytes(data)
+    return values
+
+
+def _encode_strings(values):
+    dictionary = {None: 0}
+    codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+    typecode = 'B' if len(dictionary) <= 1 << 8 else 'H' if len(dictionary) <= 1 << 16 else 'I'
+    header = json.dumps([typecode, list(dictionary)[1:]], ensure_ascii=False).encode()
+    return struct.pack('<I', len(header)) + header + array(typecode, codes).tobytes()
+
+
+def _decode_strings(data):
+    """Returns: tuple (словарь значений, массив кодов строк)."""
+    (size,) = struct.unpack_from('<I', data)
+    typecode, values = json.loads(data[4:4 + size])
+    codes = array(typecode)
+    codes.frombytes(data[4 + size:])
+    return [None, *values], codes
+
+
+class SegmentWriter:
+    """
+    Запись сегмента: строки в порядке (user_id, timestamp, id).
+
+    Файл пишется под временным именем и появляется под своим только
+    после close(): читатели никогда не видят недописанный сегмент.
+    """
+
+    def __init__(self, path, block_rows=4096, level=6):
+        self.path = Path(path)
+        self._tmp_path = self.path.with_suffix('.tmp')
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self.block_rows = block_rows
+        self.level = level
+        self.blocks = []
+        self.rows = 0
+        self._pending = []
+
+    def append(self, row):
+        """Добавить строку - кортеж значений в порядке COLUMNS."""
+        self._pending.append(row)
+        if len(self._pending) >= self.block_rows:
+            self._flush_block()
+
+    def _write(self, data):
+        blob = zlib.compress(data, self.level)
+        self._file.write(blob)
+        location = [self._offset, len(blob)]
+        self._offset += len(blob)
+        return location
+
+    def _flush_block(self):
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        columns = dict(zip(COLUMNS, zip(*rows)))
+        users = [_NULL_USER if user_id is None else user_id for user_id in columns['user_id']]
+        runs = _runs(users)
+        timestamps = [_to_micros(value) for value in columns['timestamp']]
+        locations = {
+            'user_id': self._write(_encode_ints(
+                [value for user, start, end in runs for value in (user, end - start)]
+            )),
+            'timestamp': self._write(_encode_ints(_run_deltas(timestamps, runs))),
+            'id': self._write(_encode_ints(_run_deltas(columns['id'], runs))),
+            'entity_id': self._write(_encode_ints(columns['entity_id'])),
+        }
+        for name in _STRING_COLUMNS:
+            locations[name] = self._write(_encode_strings(columns[name]))
+        self.blocks.append({
+            'rows': len(rows),
+            'user_min': users[0],
+            'user_max': users[-1],
+            'ts_min': min(timestamps),
+            'ts_max': max(timestamps),
+            'columns': locations,
+        })
+        self.rows += len(rows)
+
+    def close(self, **meta):
+        """
+        Дописать оглавление и открыть сегмент под постоянным именем.
+
+        Args:
+            meta: Дополнительные поля оглавления (порог, максимальный id)
+        """
+        self._flush_block()
+        footer = dict(meta, version=1, rows=self.rows, blocks=self.blocks)
+        if self.blocks:
+            footer.update(
+                user_min=min(block['user_min'] for block in self.blocks),
+                user_max=max(block['user_max'] for block in self.blocks),
+                ts_min=min(block['ts_min'] for block in self.blocks),
+                ts_max=max(block['ts_max'] for block in self.blocks),
+            )
+        data = zlib.compress(json.dumps(footer).encode(), self.level)
+        self._file.write(data)
+        self._file.write(_TRAILER.pack(len(data), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class AuditSegment:
+    """Сегмент, отображённый в память."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(self._mm) - _TRAILER.size
+        length, magic = _TRAILER.unpack_from(self._mm, end)
+        if magic != MAGIC or self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f'Не сегмент аудита: {self.path}')
+        self.meta = json.loads(zlib.decompress(self._mm[end - length:end]))
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _column(self, block, name):
+        offset, length = block['columns'][name]
+        return zlib.decompress(self._mm[offset:offset + length])
+
+    def _overlaps(self, user_id=None, start_us=None, end_us=None, meta=None):
+        """Может ли сегмент (или блок meta) содержать строки из диапазона."""
+        meta = meta or self.meta
+        if not meta.get('rows', True):
+            return False
+        if user_id is not None and not meta['user_min'] <= user_id <= meta['user_max']:
+            return False
+        if start_us is not None and meta['ts_max'] < start_us:
+            return False
+        if end_us is not None and meta['ts_min'] >= end_us:
+            return False
+        return True
+
+    def scan(self, user_id=None, start=None, end=None):
+        """
+        Записи пользователя (или всех) за период [start, end).
+
+        Yields:
+            dict: запись в формате AuditLog.to_dict()
+        """
+        start_us = None if start is None else _to_micros(start)
+        end_us = None if end is None else _to_micros(end)
+        if not self._overlaps(user_id, start_us, end_us):
+            return
+        for block in self.meta['blocks']:
+            if not self._overlaps(user_id, start_us, end_us, block):
+                continue
+            pairs = _decode_ints(self._column(block, 'user_id'))
+            runs, start = [], 0
+            for user, count in zip(pairs[::2], pairs[1::2]):
+                if user_id is None or user == user_id:
+                    runs.append((user, start, start + count))
+                start += count
+            if not runs:
+                continue
+
+            # Время восстанавливается только внутри нужных серий; внутри
+            # серии оно упорядочено, период ищется двоичным поиском
+            deltas = _decode_ints(self._column(block, 'timestamp'))
+            matches = []
+            for user, lo, hi in runs:
+                timestamps = list(accumulate(deltas[lo:hi]))
+                first = 0 if start_us is None else bisect.bisect_left(timestamps, start_us)
+                last = len(timestamps) if end_us is None else bisect.bisect_left(timestamps, end_us)
+                if first < last:
+                    matches.append((user, lo, timestamps, first, last))
+            if not matches:
+                continue
+
+            id_deltas = _decode_ints(self._column(block, 'id'))
+            entity_ids = _decode_ints(self._column(block, 'entity_id'))
+            strings = [_decode_strings(self._column(block, name)) for name in _STRING_COLUMNS]
+            for user, lo, timestamps, first, last in matches:
+                ids = list(accumulate(id_deltas[lo:lo + last]))
+                for k in range(first, last):
+                    i = lo + k
+                    action, entity_type, ip_address, user_agent = (
+                        dictionary[codes[i]] for dictionary, codes in strings
+                    )
+                    yield {
+                        'id': ids[k],
+                        'user_id': None if user == _NULL_USER else user,
+                        'action': action,
+                        'entity_type': entity_type,
+                        'entity_id': entity_ids[i],
+                        'timestamp': _EPOCH + timedelta(microseconds=timestamps[k]),
+                        'ip_address': ip_address,
+                        'user_agent': user_agent,
+                    }
+
+
+class AuditArchive:
+    """
+    Каталог сегментов аудита.
+
+    Открытые сегменты (отображение и разобранное оглавление) кэшируются
+    между поисками; новые сегменты подхватываются при следующем поиске.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def segments(self):
+        return sorted(self.directory.glob('audit-*.seg'))
+
+    def _segments(self):
+        paths = self.segments()
+        with self._lock:
+            for path in set(self._open) - set(paths):
+                self._open.pop(path).close()
+            for path in paths:
+                if path not in self._open:
+                    self._open[path] = AuditSegment(path)
+            return [self._open[path] for path in paths]
+
+    def close(self):
+        with self._lock:
+            for segment in self._open.values():
+                segment.close()
+            self._open.clear()
+
+    def scan(self, user_id=None, start=None, end=None):
+        """
+        Записи из всех сегментов, см. AuditSegment.scan().
+
+        Порядок - по сегментам, внутри сегмента - по (user_id, timestamp, id).
+        """
+        for segment in self._segments():
+            yield from segment.scan(user_id, start, end)
+
+    def stats(self):
+        """Число сегментов, строк и байт на диске."""
+        segments = self._segments()
+        return {
+            'segments': len(segments),
+            'rows': sum(segment.meta['rows'] for segment in segments),
+            'bytes': sum(segment.path.stat().st_size for segment in segments),
+        }
+
+
+def _delete_archived_rows(cutoff, max_id, chunk_size, pause):
+    batch = (
+        db.select(AuditLog.id)
+        .where(AuditLog.timestamp < cutoff)
+        .where(AuditLog.id <= max_id)
+        .limit(chunk_size)
+    )
+    deleted = 0
+    while True:
+        ids = db.session.execute(batch).scalars().all()
+        if not ids:
+            break
+        db.session.execute(
+            db.delete(AuditLog)
+            .where(AuditLog.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def archive_audit_logs(directory, older_than_days=90, block_rows=4096, chunk_size=10000,
+                       pause=0.0, now=None):
+    """
+    Перенести записи аудита старше older_than_days дней в новый сегмент.
+
+    Строки удаляются из таблицы только после того, как сегмент записан на
+    диск. Оглавление сегмента хранит порог и максимальный id выгрузки, и
+    перед новой выгрузкой из таблицы удаляются строки уже записанных
+    сегментов: прерванный запуск не даёт дублей при повторе.
+
+    Args:
+        block_rows: Строк в блоке сегмента
+        chunk_size: Сколько строк удалять за одну транзакцию
+        pause: Пауза между пачками удаления в секундах
+
+    Returns:
+        dict: rows (выгружено), deleted (удалено из таблицы), path
+        (новый сегмент или None) и bytes (его размер)
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    archive = AuditArchive(directory)
+
+    deleted = 0
+    for path in archive.segments():
+        with AuditSegment(path) as segment:
+            meta = segment.meta
+        deleted += _delete_archived_rows(
+            datetime.fromisoformat(meta['cutoff']), meta['max_id'], chunk_size, pause
+        )
+
+    max_id = db.session.execute(
+        db.select(db.func.max(AuditLog.id)).where(AuditLog.timestamp < cutoff)
+    ).scalar()
+    if max_id is None:
+        db.session.commit()
+        return {'rows': 0, 'deleted': deleted, 'path': None, 'bytes': 0}
+
+    rows = db.session.execute(
+        db.select(*(AuditLog.__table__.c[name] for name in COLUMNS))
+        .where(AuditLog.timestamp < cutoff)
+        .where(AuditLog.id <= max_id)
+        .order_by(db.func.coalesce(AuditLog.user_id, _NULL_USER), AuditLog.timestamp, AuditLog.id)
+        .execution_options(yield_per=block_rows)
+    )
+    path = directory / f'audit-{now:%Y%m%dT%H%M%S}-{max_id}.seg'
+    writer = SegmentWriter(path, block_rows)
+    try:
+        for partition in rows.partitions():
+            for row in partition:
+                writer.append(tuple(row))
+        writer.close(cutoff=cutoff.isoformat(), max_id=max_id, created_at=now.isoformat())
+    except BaseException:
+        writer.abort()
+        db.session.rollback()
+        raise
+    db.session.commit()
+
+    deleted += _delete_archived_rows(cutoff, max_id, chunk_size, pause)
+    return {'rows': writer.rows, 'deleted': deleted, 'path': path, 'bytes': path.stat().st_size}
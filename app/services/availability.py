@@ -0,0 +1,186 @@
+"""
+Проверка занятости имени пользователя и email без обращения к БД.
+
+Каждый воркер держит два фильтра Блума: по именам пользователей и по
+email в нижнем регистре. Фильтр не даёт ложноотрицательных ответов,
+поэтому "нет в фильтре" означает "свободно" без запроса к БД, и только
+вероятные совпадения (занятые значения и AVAILABILITY_ERROR_RATE
+ложных срабатываний) проверяются запросом по уникальному индексу.
+
+Фильтры строятся при первом обращении (gunicorn строит их в мастере до
+fork, и воркеры делят память), пополняются при регистрации в этом
+воркере, а пользователей, зарегистрированных в других воркерах, раз в
+AVAILABILITY_REFRESH_INTERVAL секунд дочитывают по id > последнего
+известного.
+"""
+import math
+import threading
+import time
+
+from flask import current_app
+
+from app.models import db, User
+
+_MASK32 = 0xFFFFFFFF
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на bytearray с двойным хешированием.
+
+    Позиции битов - h1 + i * h2 по модулю размера, где h1 и h2 - младшие и
+    старшие 32 бита hash() значения. hash() строк случаен для каждого
+    интерпретатора, поэтому фильтр нельзя сохранять между запусками:
+    он живёт только в памяти процесса (и его потомков после fork).
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        h = hash(value)
+        h1, h2 = h & _MASK32, ((h >> 32) & _MASK32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values):
+        """Добавить значения пачкой (горячий цикл построения фильтра)."""
+        bits, size, hashes = self.bits, self.size, range(self.hashes)
+        added = 0
+        for value in values:
+            h = hash(value)
+            h1, h2 = h & _MASK32, ((h >> 32) & _MASK32) | 1
+            for i in hashes:
+                position = (h1 + i * h2) % size
+                bits[position >> 3] |= 1 << (position & 7)
+            added += 1
+        self.count += added
+
+    def __contains__(self, value):
+        bits = self.bits
+        for position in self._positions(value):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def memory_usage(self):
+        """Размер битового массива в байтах."""
+        return len(self.bits)
+
+
+class AvailabilityIndex:
+    """Фильтры Блума имён и email пользователей одного воркера."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.clear()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AVAILABILITY_ERROR_RATE', 0.01)
+        app.config.setdefault('AVAILABILITY_MIN_CAPACITY', 100_000)
+        app.config.setdefault('AVAILABILITY_REFRESH_INTERVAL', 5)
+        app.extensions['availability_index'] = self
+
+    def clear(self):
+        with self._lock:
+            self.usernames = None
+            self.emails = None
+            self._last_id = 0
+            self._refreshed_at = 0.0
+
+    @staticmethod
+    def _rows(after_id=0):
+        return db.session.execute(
+            db.select(User.id, User.username, User.email)
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .execution_options(yield_per=10_000)
+        )
+
+    def build(self):
+        """
+        Построить фильтры по всем пользователям.
+
+        Ёмкость - вдвое больше текущего числа пользователей (не меньше
+        AVAILABILITY_MIN_CAPACITY): запас на рост до следующей перестройки.
+
+        Returns:
+            float: время построения в секундах
+        """
+        config = current_app.config
+        started = time.perf_counter()
+        total = db.session.execute(db.select(db.func.count(User.id))).scalar()
+        capacity = max(2 * total, config['AVAILABILITY_MIN_CAPACITY'])
+        usernames = BloomFilter(capacity, config['AVAILABILITY_ERROR_RATE'])
+        emails = BloomFilter(capacity, config['AVAILABILITY_ERROR_RATE'])
+        last_id = 0
+        for rows in self._rows().partitions():
+            usernames.update([username for _, username, _ in rows])
+            emails.update([email.lower() for _, _, email in rows])
+            last_id = rows[-1][0]
+        with self._lock:
+            self.usernames, self.emails = usernames, emails
+            self._last_id = last_id
+            self._refreshed_at = time.monotonic()
+        elapsed = time.perf_counter() - started
+        current_app.logger.info(
+            f"Фильтры доступности: {usernames.count} пользователей за {elapsed:.1f} с, "
+            f"{(usernames.memory_usage + emails.memory_usage) / 2**20:.1f} МБ"
+        )
+        return elapsed
+
+    def _ensure_fresh(self):
+        if self.usernames is None:
+            self.build()
+            return
+        if time.monotonic() - self._refreshed_at < current_app.config['AVAILABILITY_REFRESH_INTERVAL']:
+            return
+        rows = self._rows(self._last_id).all()
+        with self._lock:
+            for user_id, username, email in rows:
+                self.usernames.add(username)
+                self.emails.add(email.lower())
+                self._last_id = max(self._last_id, user_id)
+            self._refreshed_at = time.monotonic()
+        if self.usernames.count > self.usernames.capacity:
+            # Фильтр переполнен, доля ложных срабатываний растёт
+            self.build()
+
+    def add(self, username, email):
+        """Учесть нового пользователя (после регистрации в этом воркере)."""
+        with self._lock:
+            if self.usernames is not None:
+                self.usernames.add(username)
+                self.emails.add(email.lower())
+
+    def username_available(self, username):
+        self._ensure_fresh()
+        if username not in self.usernames:
+            return True
+        return db.session.execute(
+            db.select(User.id).where(User.username == username)
+        ).first() is None
+
+    def email_available(self, email):
+        self._ensure_fresh()
+        if email.lower() not in self.emails:
+            return True
+        # Регистрация сравнивает email как есть; нижний регистр - самый
+        # частый вариант того же адреса. Оба значения ищутся по индексу
+        return db.session.execute(
+            db.select(User.id).where(User.email.in_(sorted({email, email.lower()})))
+        ).first() is None
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,237 @@
+"""
+Автомат защиты (circuit breaker) вокруг БД.
+
+Пока PostgreSQL тормозит или переключается на реплику, каждый запрос
+ждёт таймаута соединения или statement_timeout, и все воркеры gunicorn
+висят на одной недоступной БД. Автомат считает подряд идущие ошибки
+доступности (обрыв соединения, отказ в подключении, таймаут соединения)
+по событиям движка SQLAlchemy; отмена запроса по дедлайну и таймаут
+блокировки - ошибки запроса, а не БД, и не считаются:
+
+- closed: запросы идут в БД как обычно;
+- open: после CIRCUIT_BREAKER_FAILURES ошибок подряд подключения и SQL
+  запросы отклоняются сразу (CircuitOpenError, ответ 503), пишущие
+  запросы - ещё до роута;
+- half_open: через CIRCUIT_BREAKER_RESET_TIMEOUT секунд один поток
+  пропускается в БД пробой. Успешный запрос закрывает автомат и
+  вызывает обработчики on_close, ошибка открывает его снова.
+
+Состояние у каждого воркера своё: воркеры узнают о недоступности БД
+независимо, каждый за CIRCUIT_BREAKER_FAILURES ошибок.
+"""
+import threading
+import time
+
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+
+from app.models import db
+from app.services.deadlines import is_query_cancelled
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Методы, которые не меняют данные и при открытом автомате доходят до
+# роута (например, чтобы отдать устаревшие данные)
+_READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+# SQLSTATE ошибок блокировок PostgreSQL: lock_not_available (lock_timeout)
+# и deadlock_detected
+_PG_LOCK_ERRORS = frozenset(('55P03', '40P01'))
+
+# Ожидание блокировки SQLite дольше busy timeout
+_SQLITE_LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def _is_query_failure(error):
+    """
+    OperationalError, которая говорит о самом запросе, а не о БД.
+
+    Отмена по дедлайну (statement_timeout, progress handler SQLite) и
+    таймаут ожидания блокировки означают медленный запрос или спор за
+    строки: БД при этом отвечает, и автомат открывать не нужно.
+    Остальные OperationalError DBAPI - отказ в подключении, обрыв,
+    таймаут соединения - считаются ошибками доступности.
+    """
+    if is_query_cancelled(error) or (has_app_context() and g.get('deadline_exceeded')):
+        return True
+    if getattr(error, 'pgcode', None) in _PG_LOCK_ERRORS:
+        return True
+    return str(error).startswith(_SQLITE_LOCK_MESSAGES)
+
+
+class CircuitOpenError(Exception):
+    """БД считается недоступной: запрос отклонён без обращения к ней."""
+
+
+class DatabaseCircuitBreaker:
+    """Счётчик ошибок доступности БД с состояниями closed/open/half_open."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=10):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._close_callbacks = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = 0.0
+            self._probe = None
+            self._probe_started = 0.0
+            self.stats = {'opened': 0, 'closed': 0, 'rejected': 0}
+
+    def init_app(self, app):
+        app.config.setdefault('CIRCUIT_BREAKER_ENABLED', True)
+        app.config.setdefault('CIRCUIT_BREAKER_FAILURES', 5)
+        app.config.setdefault('CIRCUIT_BREAKER_RESET_TIMEOUT', 10)
+        app.extensions['circuit_breaker'] = self
+        self.failure_threshold = app.config['CIRCUIT_BREAKER_FAILURES']
+        self.reset_timeout = app.config['CIRCUIT_BREAKER_RESET_TIMEOUT']
+        self.reset()
+        if not app.config['CIRCUIT_BREAKER_ENABLED']:
+            return
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'do_connect', self._before_connect)
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._on_error)
+        app.before_request(self.guard)
+        app.register_error_handler(CircuitOpenError, lambda error: self.unavailable())
+
+    @property
+    def enabled(self):
+        return current_app.config['CIRCUIT_BREAKER_ENABLED']
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def is_open(self):
+        """Будет ли запрос текущего потока отклонён (без захвата пробы)."""
+        state = self._state
+        if state == CLOSED:
+            return False
+        now = time.monotonic()
+        if state == OPEN:
+            return now < self._opened_at + self.reset_timeout
+        return self._probe != threading.get_ident() and now < self._probe_started + self.reset_timeout
+
+    def retry_after(self):
+        """Секунд до следующей пробы БД."""
+        if self._state != OPEN:
+            return 1
+        return max(1, int(self._opened_at + self.reset_timeout - time.monotonic() + 0.999))
+
+    def allow(self):
+        """
+        Можно ли текущему потоку обратиться к БД.
+
+        Первый поток после CIRCUIT_BREAKER_RESET_TIMEOUT становится пробой
+        и пропускается, пока его запрос не завершится (проба, не
+        вернувшаяся за тот же таймаут, передаётся следующему потоку).
+        """
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now < self._opened_at + self.reset_timeout:
+                return False
+            if self._state == HALF_OPEN and self._probe == threading.get_ident():
+                return True
+            if self._state == HALF_OPEN and now < self._probe_started + self.reset_timeout:
+                return False
+            self._state = HALF_OPEN
+            self._probe = threading.get_ident()
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state == CLOSED:
+                return
+            self._state = CLOSED
+            self._probe = None
+            self.stats['closed'] += 1
+            callbacks = list(self._close_callbacks)
+        self._log('info', 'БД снова доступна, автомат закрыт')
+        for callback in callbacks:
+            callback()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == OPEN:
+                return
+            if self._state == CLOSED and self._failures < self.failure_threshold:
+                return
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe = None
+            self.stats['opened'] += 1
+            failures = self._failures
+        self._log('warning', f'БД недоступна ({failures} ошибок подряд), автомат открыт')
+
+    def on_close(self, callback):
+        """Вызывать callback() при каждом закрытии автомата (в потоке пробы)."""
+        with self._lock:
+            if callback not in self._close_callbacks:
+                self._close_callbacks.append(callback)
+
+    def unavailable(self):
+        """Ответ 503 с Retry-After до следующей пробы."""
+        self.stats['rejected'] += 1
+        message = 'База данных временно недоступна'
+        if request.is_json or request.blueprint == 'api':
+            response = jsonify({'error': message})
+        else:
+            response = current_app.response_class(message, mimetype='text/plain')
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.retry_after())
+        return response
+
+    def guard(self):
+        """before_request: пишущие запросы при открытом автомате - сразу 503."""
+        if request.method in _READ_METHODS or not self.is_open:
+            return None
+        return self.unavailable()
+
+    def _check(self):
+        if not self.allow():
+            raise CircuitOpenError()
+
+    def _before_connect(self, dialect, connection_record, cargs, cparams):
+        self._check()
+
+    def _before_execute(self, connection, cursor, statement, parameters, context, executemany):
+        self._check()
+
+    def _after_execute(self, connection, cursor, statement, parameters, context, executemany):
+        # Горячий путь: при закрытом автомате без ошибок - два сравнения
+        if self._state != CLOSED or self._failures:
+            self.record_success()
+
+    def _on_error(self, context):
+        error = context.original_exception
+        if isinstance(error, CircuitOpenError):
+            return
+        if context.is_disconnect:
+            self.record_failure()
+        elif isinstance(error, context.dialect.loaded_dbapi.OperationalError) \
+                and not _is_query_failure(error):
+            self.record_failure()
+
+    def _log(self, level, message):
+        if has_app_context():
+            getattr(current_app.logger, level)(message)
+
+
+circuit_breaker = DatabaseCircuitBreaker()
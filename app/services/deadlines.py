@@ -0,0 +1,160 @@
+"""
+Дедлайны запросов и отмена медленных SQL запросов.
+
+Каждый роут объявляет бюджет задержки декоратором @deadline(ms). В
+начале каждой транзакции остаток бюджета передаётся в БД:
+
+- PostgreSQL: SET LOCAL statement_timeout, сервер сам отменяет запрос;
+- SQLite: progress handler соединения прерывает выполнение, как только
+  дедлайн прошёл.
+
+Отменённый запрос превращается в ответ 503, а счётчики по эндпоинтам
+доступны через deadline_metrics().
+"""
+import sqlite3
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+from app.models import db
+
+# Через сколько инструкций виртуальной машины SQLite проверять дедлайн
+_SQLITE_PROGRESS_STEPS = 1000
+
+# SQLSTATE query_canceled в PostgreSQL
+_PG_QUERY_CANCELED = '57014'
+
+_metrics_lock = threading.Lock()
+_metrics = {'requests': Counter(), 'exceeded': Counter()}
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет запроса исчерпан до начала транзакции."""
+
+
+def _current_deadline():
+    if not has_app_context():
+        return None
+    return g.get('deadline')
+
+
+def mark_deadline_exceeded():
+    """Отметить, что запрос не уложился в бюджет (ответ будет 503)."""
+    if has_app_context():
+        g.deadline_exceeded = True
+
+
+def deadline(budget_ms):
+    """
+    Декоратор роута: объявить бюджет задержки в миллисекундах.
+
+    Если за время обработки SQL запрос был отменён по дедлайну, клиент
+    получает 503 независимо от того, как роут обработал исключение.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['DEADLINES_ENABLED']:
+                return view(*args, **kwargs)
+
+            endpoint = request.endpoint or request.path
+            g.deadline = time.monotonic() + budget_ms / 1000
+            g.deadline_exceeded = False
+            with _metrics_lock:
+                _metrics['requests'][endpoint] += 1
+            session = db.session()
+            try:
+                # Транзакция могла начаться до роута (загрузка пользователя)
+                if session.in_transaction():
+                    _apply_deadline(session, None, session.connection())
+                response = view(*args, **kwargs)
+            except Exception:
+                if not g.deadline_exceeded:
+                    raise
+                response = None
+            finally:
+                # Запросы после роута (потоковые ответы) уже вне бюджета
+                g.deadline = None
+                if session.in_transaction() and session.is_active:
+                    session.connection().info.pop('deadline', None)
+
+            if g.deadline_exceeded:
+                with _metrics_lock:
+                    _metrics['exceeded'][endpoint] += 1
+                current_app.logger.warning(f"Превышен дедлайн {budget_ms} мс: {endpoint}")
+                db.session.rollback()
+                return jsonify({'error': 'Превышено время обработки запроса'}), 503, \
+                    {'Retry-After': '1'}
+            return response
+        wrapper.deadline_ms = budget_ms
+        return wrapper
+    return decorator
+
+
+def deadline_metrics():
+    """
+    Счётчики дедлайнов.
+
+    Returns:
+        dict: requests и exceeded по именам эндпоинтов
+    """
+    with _metrics_lock:
+        return {name: dict(counter) for name, counter in _metrics.items()}
+
+
+@event.listens_for(Session, 'after_begin')
+def _apply_deadline(session, transaction, connection):
+    """Передать остаток бюджета в БД в начале транзакции."""
+    expires_at = _current_deadline()
+    if expires_at is None:
+        return
+
+    remaining = expires_at - time.monotonic()
+    if remaining <= 0:
+        mark_deadline_exceeded()
+        raise DeadlineExceeded()
+
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}')
+    else:
+        connection.info['deadline'] = expires_at
+
+
+@event.listens_for(Pool, 'connect')
+def _install_sqlite_progress_handler(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    info = connection_record.info
+
+    def check_deadline():
+        expires_at = info.get('deadline')
+        # Ненулевой результат прерывает текущий запрос SQLite
+        return 1 if expires_at is not None and time.monotonic() > expires_at else 0
+
+    dbapi_connection.set_progress_handler(check_deadline, _SQLITE_PROGRESS_STEPS)
+
+
+@event.listens_for(Pool, 'checkin')
+def _clear_deadline(dbapi_connection, connection_record):
+    connection_record.info.pop('deadline', None)
+
+
+def is_query_cancelled(error):
+    """Ошибка DBAPI - отмена запроса (statement_timeout или progress handler)."""
+    if getattr(error, 'pgcode', None) == _PG_QUERY_CANCELED:
+        return True
+    return isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _detect_cancelled_query(context):
+    """Отметить запрос, отменённый по дедлайну, для ответа 503."""
+    if is_query_cancelled(context.original_exception):
+        mark_deadline_exceeded()
@@ -0,0 +1,176 @@
+"""
+Лента изменений подписок для server-sent events.
+
+Источником событий служит delta-синхронизация (app.services.sync): id
+события равен change_seq, поэтому переподключение с Last-Event-ID
+продолжает ленту без потерь, в том числе после перезапуска воркера.
+ChangeNotifier лишь будит открытые в этом процессе потоки, чтобы они не
+опрашивали БД; изменения из других воркеров подхватываются проверкой
+счётчика при heartbeat.
+"""
+import threading
+import time
+
+from flask import current_app
+
+from app.models import db
+from app.services.sync import StaleSyncToken, current_change_seq, get_changes
+
+
+class ChangeNotifier:
+    """
+    Оповещение ожидающих потоков об изменениях подписок пользователя.
+
+    На пользователя с открытыми потоками хранится одна запись
+    [Condition, последний change_seq, число ожидающих]; запись удаляется,
+    когда уходит последний ожидающий.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def notify(self, user_id, change_seq):
+        """Сообщить об изменении с номером change_seq."""
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None:
+            return
+        condition = entry[0]
+        with condition:
+            entry[1] = max(entry[1], change_seq)
+            condition.notify_all()
+
+    def wait(self, user_id, since, timeout):
+        """
+        Дождаться изменения с номером больше since.
+
+        Returns:
+            bool: True, если пришло оповещение, False по таймауту
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = [threading.Condition(), since, 0]
+            entry[2] += 1
+        try:
+            condition = entry[0]
+            with condition:
+                return condition.wait_for(lambda: entry[1] > since, timeout)
+        finally:
+            with self._lock:
+                entry[2] -= 1
+                if entry[2] == 0:
+                    del self._users[user_id]
+
+    def waiting(self):
+        """Число потоков, ожидающих изменений."""
+        with self._lock:
+            return sum(entry[2] for entry in self._users.values())
+
+
+change_notifier = ChangeNotifier()
+
+
+class StreamSlots:
+    """
+    Число открытых лент в воркере.
+
+    Лента занимает поток gthread на EVENTS_STREAM_TIMEOUT секунд: без
+    предела несколько вкладок заняли бы все потоки воркера, и обычные
+    запросы API ждали бы в очереди.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = 0
+
+    @property
+    def open(self):
+        return self._open
+
+    def acquire(self, limit):
+        """
+        Занять место под ленту.
+
+        Returns:
+            callable или None: освобождение места (повторный вызов ничего
+            не делает) или None, если уже открыто limit лент
+        """
+        with self._lock:
+            if self._open >= limit:
+                return None
+            self._open += 1
+        released = []
+
+        def release():
+            with self._lock:
+                if not released:
+                    released.append(True)
+                    self._open -= 1
+        return release
+
+
+stream_slots = StreamSlots()
+
+
+def format_event(data, event=None, event_id=None):
+    """Сформировать одно сообщение text/event-stream."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_changes(user_id, since, on_close=None):
+    """
+    Генератор ленты изменений пользователя в формате text/event-stream.
+
+    События: upsert (данные подписки), delete ({"id": ...}) и resync
+    (токен устарел, клиент должен перезагрузить список целиком). Между
+    событиями отправляются heartbeat-комментарии. По истечении
+    EVENTS_STREAM_TIMEOUT поток закрывается, и браузер переподключается
+    с Last-Event-ID. on_close() вызывается, когда поток завершён.
+    """
+    config = current_app.config
+    heartbeat = config['EVENTS_HEARTBEAT_INTERVAL']
+    deadline = time.monotonic() + config['EVENTS_STREAM_TIMEOUT']
+    dumps = current_app.json.dumps
+
+    yield f"retry: {config['EVENTS_RETRY_MS']}\n\n"
+    check_db = True
+    try:
+        while time.monotonic() < deadline:
+            if check_db:
+                try:
+                    changes = get_changes(user_id, since)
+                except StaleSyncToken:
+                    yield format_event('{}', event='resync')
+                    return
+                for seq, item in changes['events']:
+                    if isinstance(item, int):
+                        yield format_event(dumps({'id': item}), event='delete', event_id=seq)
+                    else:
+                        yield format_event(dumps(item.to_dict()), event='upsert', event_id=seq)
+                since = changes['next']
+                # Не держим соединение из пула, пока поток простаивает
+                db.session.close()
+                if changes['has_more']:
+                    continue
+
+            timeout = min(heartbeat, max(deadline - time.monotonic(), 0))
+            if change_notifier.wait(user_id, since, timeout):
+                check_db = True
+                continue
+
+            yield ': heartbeat\n\n'
+            # Изменения, сделанные другими воркерами: дешёвая проверка счётчика
+            check_db = current_change_seq(user_id) > since
+            db.session.close()
+    finally:
+        db.session.close()
+        if on_close is not None:
+            on_close()
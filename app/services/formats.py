@@ -0,0 +1,141 @@
+"""
+Согласование формата списков (Accept) и сжатие ответов API.
+
+Для больших списков JSON массив объектов повторяет все ключи в каждой
+строке. Клиент может запросить через Accept:
+
+- application/json - массив объектов (по умолчанию);
+- application/vnd.subscriptions.columnar+json - по массиву на поле;
+- application/msgpack и application/vnd.subscriptions.columnar+msgpack -
+  то же в MessagePack (если установлен msgpack).
+
+compress_response сжимает ответы API gzip или brotli (если установлен) по
+Accept-Encoding клиента.
+"""
+import decimal
+import gzip
+from datetime import date
+
+from flask import current_app, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # Необязательная зависимость: только JSON форматы
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: только gzip
+    brotli = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.subscriptions.columnar+json'
+MSGPACK = 'application/msgpack'
+COLUMNAR_MSGPACK = 'application/vnd.subscriptions.columnar+msgpack'
+
+
+def available_formats():
+    """Поддерживаемые типы в порядке предпочтения сервера."""
+    formats = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        formats += [MSGPACK, COLUMNAR_MSGPACK]
+    return formats
+
+
+def columnar(rows, fields):
+    """Список словарей -> словарь поле -> список значений."""
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def _msgpack_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Тип {type(value).__name__} не сериализуется в MessagePack')
+
+
+def list_response(key, rows, fields):
+    """
+    Ответ со списком в формате, выбранном по заголовку Accept.
+
+    Args:
+        key: Ключ списка в ответе ('subscriptions', 'audit_logs')
+        rows: Список словарей (to_dict())
+        fields: Порядок полей для колоночного формата
+
+    Returns:
+        Response: 200 в выбранном формате или 406, если ни один формат
+        из Accept не поддерживается
+    """
+    formats = available_formats()
+    mimetype = request.accept_mimetypes.best_match(formats)
+    if mimetype is None:
+        if request.accept_mimetypes:
+            response = jsonify({'error': 'Неподдерживаемый формат', 'formats': formats})
+            response.status_code = 406
+            return response
+        mimetype = JSON
+
+    if mimetype in (COLUMNAR_JSON, COLUMNAR_MSGPACK):
+        body = {key: columnar(rows, fields), 'count': len(rows)}
+    else:
+        body = {key: rows}
+
+    if mimetype in (MSGPACK, COLUMNAR_MSGPACK):
+        response = current_app.response_class(
+            msgpack.packb(body, default=_msgpack_default), mimetype=mimetype
+        )
+    else:
+        response = jsonify(body)
+        response.mimetype = mimetype
+    response.vary.add('Accept')
+    return response
+
+
+def _accepted_encoding():
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br']:
+        return 'br'
+    if encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """
+    after_request: сжать ответ, если клиент это поддерживает.
+
+    Не сжимаются потоковые ответы (SSE), уже сжатые и меньше
+    COMPRESS_MIN_SIZE байт.
+    """
+    config = current_app.config
+    if (
+        not config['COMPRESS_ENABLED']
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        data = gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # Сжатое представление побайтно отличается от исходного
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
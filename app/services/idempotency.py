@@ -0,0 +1,273 @@
+"""
+Идемпотентные повторы POST запросов по заголовку Idempotency-Key.
+
+Ключ (пользователь, роут, значение заголовка) резервируется строкой
+idempotency_keys в той же транзакции, что и запись роута: если запись
+зафиксирована, зафиксирован и ключ, и повтор в любом воркере уже не
+создаст вторую подписку. После ответа в строку сохраняются статус, тело
+и заголовки, и повторы получают их без выполнения роута.
+
+Дубликат из другого воркера, пока первый запрос выполняется, упирается в
+уникальный индекс (IdempotencyConflict) и опрашивает строку, пока в ней
+не появится ответ. Дубликаты в том же воркере ждут первый запрос на
+threading.Event, не обращаясь к БД. Строки живут IDEMPOTENCY_TTL секунд:
+просроченный ключ освобождается при следующем резервировании, остальные
+удаляет purge_idempotency_keys.py.
+
+Ответ сохраняется отдельной записью после фиксации роута. Если она не
+удалась (воркер упал, писатель не успел), строка так и осталась бы "в
+работе" до конца TTL, и все повторы получали бы 409. Поэтому резерв без
+ответа - аренда на IDEMPOTENCY_LEASE секунд с created_at: после неё повтор
+забирает ключ и выполняет запрос заново.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, IdempotencyKey
+from app.services.sqlite_writer import sqlite_writer
+
+# Заголовки первого ответа, которые повторяются при воспроизведении
+_REPLAYED_HEADERS = ('Content-Type', 'ETag', 'Location')
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже зарезервирован другим запросом (возможно, в другом воркере)."""
+
+
+class Reservation:
+    """Ключ запроса: передаётся в задание записи роута для reserve()."""
+    __slots__ = ('user_id', 'endpoint', 'key', 'fingerprint')
+
+    def __init__(self, user_id, endpoint, key, fingerprint):
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.key = key
+        self.fingerprint = fingerprint
+
+    def where(self, statement):
+        return (
+            statement
+            .where(IdempotencyKey.user_id == self.user_id)
+            .where(IdempotencyKey.endpoint == self.endpoint)
+            .where(IdempotencyKey.key == self.key)
+        )
+
+
+def _complete(reservation, status, body, headers):
+    db.session.execute(
+        reservation.where(db.update(IdempotencyKey))
+        .where(IdempotencyKey.status_code.is_(None))
+        .values(status_code=status, body=body, headers=headers)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _abandon(reservation):
+    db.session.execute(
+        reservation.where(db.delete(IdempotencyKey))
+        .where(IdempotencyKey.status_code.is_(None))
+        .execution_options(synchronize_session=False)
+    )
+
+
+class IdempotencyStore:
+    """Ключи и первые ответы в БД, ожидание выполняющихся запросов воркера."""
+
+    def __init__(self, ttl=86400, lease=30, poll_interval=0.05):
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        # Выполняющиеся в этом воркере ключи -> Event их завершения
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'replayed': 0, 'waited': 0, 'conflicts': 0, 'taken_over': 0}
+
+    def init_app(self, app):
+        app.config.setdefault('IDEMPOTENCY_TTL', 86400)
+        app.config.setdefault('IDEMPOTENCY_WAIT', 10)
+        app.config.setdefault('IDEMPOTENCY_POLL_INTERVAL', 0.05)
+        app.config.setdefault('IDEMPOTENCY_LEASE', 30)
+        self.ttl = app.config['IDEMPOTENCY_TTL']
+        self.lease = app.config['IDEMPOTENCY_LEASE']
+        self.poll_interval = app.config['IDEMPOTENCY_POLL_INTERVAL']
+        app.extensions['idempotency'] = self
+
+    def reserve(self, reservation, now=None):
+        """
+        Зарезервировать ключ в текущей транзакции.
+
+        Вызывается из задания записи роута до самой записи: ключ
+        фиксируется или откатывается вместе с ней. Просроченный ключ и
+        резерв без ответа с истёкшей арендой удаляются.
+
+        Raises:
+            IdempotencyConflict: ключ уже занят (запись откатывается)
+        """
+        now = now or datetime.utcnow()
+        db.session.execute(
+            reservation.where(db.delete(IdempotencyKey))
+            .where(or_(
+                IdempotencyKey.expires_at <= now,
+                and_(IdempotencyKey.status_code.is_(None),
+                     IdempotencyKey.created_at <= now - timedelta(seconds=self.lease)),
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(IdempotencyKey).values(
+                    user_id=reservation.user_id, endpoint=reservation.endpoint,
+                    key=reservation.key, fingerprint=reservation.fingerprint,
+                    created_at=now, expires_at=now + timedelta(seconds=self.ttl),
+                ))
+        except IntegrityError:
+            raise IdempotencyConflict() from None
+
+    def lookup(self, reservation, now=None):
+        """Строка ключа (не просроченная) или None."""
+        return db.session.execute(
+            reservation.where(db.select(
+                IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                IdempotencyKey.body, IdempotencyKey.headers, IdempotencyKey.created_at,
+            ))
+            .where(IdempotencyKey.expires_at > (now or datetime.utcnow()))
+        ).first()
+
+    def complete(self, reservation, response):
+        """Сохранить ответ в зарезервированную строку."""
+        headers = [[name, response.headers[name]]
+                   for name in _REPLAYED_HEADERS if name in response.headers]
+        sqlite_writer.run(_complete, reservation, response.status_code, response.get_data(), headers)
+        self.stats['executed'] += 1
+
+    def abandon(self, reservation):
+        """Освободить ключ без ответа: повтор должен выполниться заново."""
+        db.session.rollback()
+        sqlite_writer.run(_abandon, reservation)
+
+    def purge_expired(self, now=None):
+        """
+        Удалить просроченные ключи.
+
+        Returns:
+            int: Число удалённых строк
+        """
+        removed = db.session.execute(
+            db.delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return removed
+
+    def idempotent(self, view):
+        """
+        Декоратор роута: поддержка заголовка Idempotency-Key.
+
+        Запросы без заголовка выполняются как обычно. Роут передаёт
+        g.idempotency_reservation в задание записи, которое вызывает
+        reserve(). Повтор с тем же ключом и телом получает сохранённый
+        ответ с заголовком Idempotent-Replayed; с другим телом - 422.
+        Ответы 5xx и ответы без записи (ошибки валидации) не сохраняются.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            header = request.headers.get('Idempotency-Key')
+            if header is None:
+                return view(*args, **kwargs)
+            if not header or len(header) > MAX_KEY_LENGTH:
+                return jsonify({'error': 'Некорректный Idempotency-Key'}), 400
+
+            reservation = Reservation(
+                current_user.id, request.endpoint, header,
+                hashlib.blake2b(request.get_data(), digest_size=16).digest(),
+            )
+            slot = (reservation.user_id, reservation.endpoint, reservation.key)
+            expires_at = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT']
+
+            # Дубликаты в этом воркере ждут первый запрос без обращения к БД
+            while True:
+                with self._lock:
+                    running = self._inflight.get(slot)
+                    if running is None:
+                        self._inflight[slot] = threading.Event()
+                        break
+                self.stats['waited'] += 1
+                if not running.wait(max(0.0, expires_at - time.monotonic())):
+                    return _in_progress()
+            try:
+                return self._execute(view, args, kwargs, reservation, expires_at)
+            finally:
+                with self._lock:
+                    self._inflight.pop(slot).set()
+        return wrapper
+
+    def _execute(self, view, args, kwargs, reservation, expires_at):
+        while True:
+            now = datetime.utcnow()
+            stored = self.lookup(reservation, now)
+            if stored is not None and stored.fingerprint != reservation.fingerprint:
+                return jsonify({'error': 'Idempotency-Key уже использован с другим запросом'}), 422
+            if stored is not None and stored.status_code is not None:
+                self.stats['replayed'] += 1
+                response = current_app.response_class(
+                    stored.body, status=stored.status_code, headers=stored.headers
+                )
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            lease_expired = (
+                stored is not None and stored.created_at <= now - timedelta(seconds=self.lease)
+            )
+            if stored is None or lease_expired:
+                if lease_expired:
+                    # Ответ первого запроса так и не сохранён: забираем ключ
+                    self.stats['taken_over'] += 1
+                try:
+                    return self._run_view(view, args, kwargs, reservation)
+                except IdempotencyConflict:
+                    # Ключ зарезервировал запрос другого воркера
+                    self.stats['conflicts'] += 1
+                    continue
+            if time.monotonic() >= expires_at:
+                return _in_progress()
+            time.sleep(self.poll_interval)
+            # Новая транзакция: строка другого воркера видна после его COMMIT
+            db.session.rollback()
+
+    def _run_view(self, view, args, kwargs, reservation):
+        g.idempotency_reservation = reservation
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except IdempotencyConflict:
+            raise
+        except BaseException:
+            self.abandon(reservation)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            self.abandon(reservation)
+            return response
+        try:
+            self.complete(reservation, response)
+        except Exception as e:
+            # Запись роута уже зафиксирована, поэтому ответ отдаётся; ключ
+            # освободится по истечении аренды IDEMPOTENCY_LEASE
+            db.session.rollback()
+            current_app.logger.error(f"Не удалось сохранить ответ Idempotency-Key: {e}")
+        return response
+
+
+def _in_progress():
+    return jsonify({'error': 'Запрос с этим Idempotency-Key ещё выполняется'}), 409
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,361 @@
+"""
+Transactional outbox: доставка изменений подписок во внешние сервисы.
+
+Роуты API записывают событие в outbox_events в той же транзакции, что и
+само изменение (по строке на каждый адрес из OUTBOX_ENDPOINTS), поэтому
+событие не теряется при сбое и не появляется для отменённого изменения,
+а запрос не ждёт внешний сервис.
+
+OutboxDispatcher (скрипт outbox_worker.py) забирает недоставленные
+события и отправляет их пачками: один POST {"events": [...]} на адрес за
+проход, адреса обслуживаются параллельно (не больше OUTBOX_CONCURRENCY).
+Неудачная пачка повторяется с экспоненциальной задержкой, а более
+поздние события тех же подписок придерживаются до её доставки, так что
+порядок событий одной подписки сохраняется. Порядок гарантируется при
+одном воркере на базу.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.models import db, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# urlopen открывает и file://, и ftp://: адреса получателей - только HTTP
+ALLOWED_SCHEMES = ('http', 'https')
+
+
+def check_endpoint(url):
+    """Проверить адрес получателя: ValueError, если схема не http/https."""
+    if urllib.parse.urlsplit(url).scheme.lower() not in ALLOWED_SCHEMES:
+        raise ValueError(f'Адрес outbox должен быть http(s): {url!r}')
+    return url
+
+
+def _endpoints():
+    """Адреса получателей из OUTBOX_ENDPOINTS (с проверкой схемы)."""
+    return [check_endpoint(url) for url in current_app.config['OUTBOX_ENDPOINTS']]
+
+
+def enqueue(event_type, user_id, subscription_id, change_seq, data):
+    """
+    Записать событие в outbox в текущей транзакции.
+
+    Args:
+        event_type: 'subscription.created', 'subscription.updated',
+            'subscription.deleted' или 'subscription.restored'
+        data: Данные подписки (to_dict()) или None для удаления
+    """
+    endpoints = _endpoints()
+    if not endpoints:
+        return
+    payload = current_app.json.dumps(data)
+    now = datetime.utcnow()
+    db.session.execute(db.insert(OutboxEvent), [
+        {
+            'endpoint': endpoint,
+            'event_type': event_type,
+            'user_id': user_id,
+            'subscription_id': subscription_id,
+            'change_seq': change_seq,
+            'payload': payload,
+            'created_at': now,
+            'next_attempt_at': now,
+        }
+        for endpoint in endpoints
+    ])
+
+
+def enqueue_many(event_type, subscriptions):
+    """
+    Записать события для пачки подписок одним executemany (импорт).
+
+    Args:
+        subscriptions: Объекты Subscription с id и change_seq
+    """
+    endpoints = _endpoints()
+    if not endpoints:
+        return
+    now = datetime.utcnow()
+    rows = []
+    for subscription in subscriptions:
+        payload = current_app.json.dumps(subscription.to_dict())
+        rows.extend(
+            {
+                'endpoint': endpoint,
+                'event_type': event_type,
+                'user_id': subscription.user_id,
+                'subscription_id': subscription.id,
+                'change_seq': subscription.change_seq,
+                'payload': payload,
+                'created_at': now,
+                'next_attempt_at': now,
+            }
+            for endpoint in endpoints
+        )
+    if rows:
+        db.session.execute(db.insert(OutboxEvent), rows)
+
+
+def _batch_body(events):
+    """Тело пачки; сохранённый JSON данных вставляется без разбора."""
+    items = []
+    for event in events:
+        meta = json.dumps({
+            'id': event.id,
+            'type': event.event_type,
+            'user_id': event.user_id,
+            'subscription_id': event.subscription_id,
+            'change_seq': event.change_seq,
+            'created_at': event.created_at.isoformat(),
+        }, ensure_ascii=False)
+        items.append(f'{meta[:-1]},"data":{event.payload}}}')
+    return f'{{"events":[{",".join(items)}]}}'.encode()
+
+
+def post_batch(url, body, timeout):
+    """
+    Отправить пачку событий.
+
+    Returns:
+        bool: True, если получатель ответил 2xx
+    """
+    try:
+        check_endpoint(url)
+    except ValueError as e:
+        logger.error(f"Outbox: {e}")
+        return False
+    request = urllib.request.Request(
+        url, data=body, method='POST', headers={'Content-Type': 'application/json'}
+    )
+    try:
+        # Схема проверена check_endpoint: только http/https
+        with urllib.request.urlopen(request, timeout=timeout) as response:  # nosec B310
+            return 200 <= response.status < 300
+    except urllib.error.HTTPError as e:
+        logger.warning(f"Outbox: {url} ответил {e.code}")
+    except OSError as e:
+        logger.warning(f"Outbox: {url} недоступен: {e}")
+    return False
+
+
+class OutboxDispatcher:
+    """Воркер доставки событий outbox."""
+
+    def __init__(self, app, send=post_batch):
+        self.app = app
+        self.send = send
+        config = app.config
+        self.batch_size = config['OUTBOX_BATCH_SIZE']
+        self.concurrency = config['OUTBOX_CONCURRENCY']
+        self.timeout = config['OUTBOX_TIMEOUT']
+        self.retry_base = config['OUTBOX_RETRY_BASE']
+        self.retry_max = config['OUTBOX_RETRY_MAX']
+        for url in config['OUTBOX_ENDPOINTS']:
+            check_endpoint(url)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._stop = threading.Event()
+        self.stats = {'delivered': 0, 'failed_batches': 0, 'batches': 0}
+
+    def close(self):
+        self._executor.shutdown()
+
+    def retry_delay(self, attempts):
+        """Задержка перед попыткой номер attempts + 1, в секундах."""
+        return min(self.retry_base * 2 ** attempts, self.retry_max)
+
+    def _next_batch(self, endpoint, now):
+        """
+        Готовые к отправке события адреса в порядке id.
+
+        Подписка, у которой есть событие, ожидающее повтора, блокируется:
+        её более поздние события не отправляются раньше него.
+        """
+        pending = db.session.execute(
+            db.select(OutboxEvent)
+            .where(OutboxEvent.endpoint == endpoint)
+            .where(OutboxEvent.delivered_at.is_(None))
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size * 4)
+        ).scalars().all()
+
+        batch, blocked = [], set()
+        for event in pending:
+            if event.subscription_id in blocked:
+                continue
+            if event.next_attempt_at > now:
+                blocked.add(event.subscription_id)
+                continue
+            batch.append(event)
+            if len(batch) == self.batch_size:
+                break
+        return batch
+
+    def run_once(self, now=None):
+        """
+        Один проход доставки по всем адресам.
+
+        Returns:
+            int: Число доставленных событий
+        """
+        now = now or datetime.utcnow()
+        endpoints = db.session.execute(
+            db.select(OutboxEvent.endpoint)
+            .where(OutboxEvent.delivered_at.is_(None))
+            .distinct()
+        ).scalars().all()
+
+        batches = {}
+        for endpoint in endpoints:
+            batch = self._next_batch(endpoint, now)
+            if batch:
+                batches[endpoint] = (
+                    [event.id for event in batch],
+                    max(event.attempts for event in batch),
+                    _batch_body(batch),
+                )
+        # Соединение не держим, пока ждём получателей
+        db.session.commit()
+
+        futures = {
+            endpoint: self._executor.submit(self.send, endpoint, body, self.timeout)
+            for endpoint, (_, _, body) in batches.items()
+        }
+
+        delivered = 0
+        for endpoint, future in futures.items():
+            ids, attempts, _ = batches[endpoint]
+            self.stats['batches'] += 1
+            if future.result():
+                db.session.execute(
+                    db.update(OutboxEvent)
+                    .where(OutboxEvent.id.in_(ids))
+                    .values(delivered_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                delivered += len(ids)
+            else:
+                self.stats['failed_batches'] += 1
+                delay = timedelta(seconds=self.retry_delay(attempts))
+                db.session.execute(
+                    db.update(OutboxEvent)
+                    .where(OutboxEvent.id.in_(ids))
+                    .values(attempts=OutboxEvent.attempts + 1, next_attempt_at=now + delay)
+                    .execution_options(synchronize_session=False)
+                )
+        db.session.commit()
+        self.stats['delivered'] += delivered
+        return delivered
+
+    def purge_delivered(self, retention_hours, now=None):
+        """Удалить доставленные события старше срока хранения."""
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=retention_hours)
+        removed = db.session.execute(
+            db.delete(OutboxEvent)
+            .where(OutboxEvent.delivered_at < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return removed
+
+    def run_forever(self, interval):
+        """Доставлять события до вызова stop(), опрашивая таблицу раз в interval секунд."""
+        retention = self.app.config['OUTBOX_RETENTION_HOURS']
+        while not self._stop.is_set():
+            try:
+                delivered = self.run_once()
+                for endpoint, lag in outbox_lag().items():
+                    logger.info(f"Outbox: {endpoint} отставание {lag:.1f} с")
+                self.purge_delivered(retention)
+            except Exception:
+                db.session.rollback()
+                logger.exception('Ошибка доставки outbox')
+                delivered = 0
+            finally:
+                db.session.remove()
+            # Пока есть очередь, следующий проход сразу
+            if not delivered:
+                self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def outbox_lag(now=None):
+    """
+    Отставание доставки по адресам.
+
+    Returns:
+        dict: адрес -> возраст самого старого недоставленного события, сек
+    """
+    now = now or datetime.utcnow()
+    rows = db.session.execute(
+        db.select(OutboxEvent.endpoint, func.min(OutboxEvent.created_at))
+        .where(OutboxEvent.delivered_at.is_(None))
+        .group_by(OutboxEvent.endpoint)
+    ).all()
+    return {endpoint: (now - oldest).total_seconds() for endpoint, oldest in rows}
+
+
+class LocalWebhookReceiver:
+    """
+    Локальный HTTP получатель пачек для тестов, бенчмарков и разработки.
+
+    Принятые пачки складываются в batches. statuses - коды ответов для
+    первых запросов (например, [500] - первая пачка отклоняется), затем 200.
+    """
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.batches = []
+        self.statuses = list(statuses)
+        self.delay = delay
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if receiver.delay:
+                    time.sleep(receiver.delay)
+                with receiver._lock:
+                    status = receiver.statuses.pop(0) if receiver.statuses else 200
+                    if status < 300:
+                        receiver.batches.append(json.loads(body)['events'])
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/events'
+
+    @property
+    def events(self):
+        with self._lock:
+            return [event for batch in self.batches for event in batch]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,141 @@
+"""
+Сэмплирующий профилировщик отдельных запросов API.
+
+Профилируется только запрос с заголовком X-Profile, равным
+PROFILER_TOKEN, или случайная доля запросов PROFILER_SAMPLE_RATE. Для
+такого запроса фоновый поток раз в PROFILER_INTERVAL секунд снимает стек
+потока, обрабатывающего запрос (sys._current_frames), а после ответа
+стеки записываются в PROFILER_OUTPUT_DIR в collapsed формате
+("a;b;c 12"), который читают flamegraph.pl, speedscope и inferno. Имя
+файла возвращается в заголовке X-Profile-File.
+
+Если ни токен, ни доля не заданы, хуки не регистрируются вовсе, и
+выключенный профилировщик ничего не стоит.
+"""
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request
+
+
+def _frame_label(code):
+    """'engine/base:execute' - каталог, модуль и функция кадра."""
+    directory, filename = os.path.split(code.co_filename)
+    module = os.path.splitext(filename)[0]
+    return f'{os.path.basename(directory)}/{module}:{code.co_name}'
+
+
+class StackSampler:
+    """Фоновый сбор стеков одного потока."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """Стеки в collapsed формате, по строке на стек."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Расширение Flask: профилирование отдельных запросов по требованию."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_TOKEN', None)
+        app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILER_INTERVAL', 0.005)
+        app.config.setdefault('PROFILER_OUTPUT_DIR', 'profiles')
+        app.extensions['request_profiler'] = self
+
+        if not app.config['PROFILER_TOKEN'] and not app.config['PROFILER_SAMPLE_RATE']:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    def _requested(self):
+        config = current_app.config
+        token = request.headers.get('X-Profile')
+        if token and config['PROFILER_TOKEN']:
+            return hmac.compare_digest(token, config['PROFILER_TOKEN'])
+        # Выборка запросов для профилирования, не механизм безопасности
+        return random.random() < config['PROFILER_SAMPLE_RATE']  # nosec B311
+
+    def _start(self):
+        if request.blueprint != 'api' or not self._requested():
+            return
+        sampler = StackSampler(threading.get_ident(), current_app.config['PROFILER_INTERVAL'])
+        g.profile_sampler = sampler
+        sampler.start()
+
+    def _write(self, sampler):
+        directory = current_app.config['PROFILER_OUTPUT_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{}.folded'.format(
+            datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+            (request.endpoint or 'unknown').replace('.', '_'),
+            request.method.lower(),
+        )
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(sampler.collapsed())
+        current_app.logger.info(
+            f"Профиль {request.method} {request.path}: {sampler.samples} сэмплов "
+            f"за {sampler.elapsed * 1000:.1f} мс -> {name}"
+        )
+        return name
+
+    def _finish(self, response):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+            response.headers['X-Profile-File'] = self._write(sampler)
+        return response
+
+    def _teardown(self, exc):
+        # Запрос завершился исключением, after_request не вызывался
+        sampler = g.pop('profile_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+            self._write(sampler)
+
+
+request_profiler = RequestProfiler()
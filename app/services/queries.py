@@ -0,0 +1,171 @@
+"""
+Реестр заранее построенных запросов для горячих путей API.
+
+Каждый запрос строится один раз с bindparam вместо конкретных значений,
+поэтому на запрос не тратится время на сборку Query/Select и вычисление
+ключа кэша (он мемоизируется на объекте statement), а скомпилированный
+SQL берётся из кэша движка SQLAlchemy.
+
+Метрики: обращения к реестру и попадания в кэш компиляции движка.
+"""
+import threading
+from collections import Counter
+from functools import lru_cache, wraps
+
+from sqlalchemy import bindparam, event
+from sqlalchemy.engine import Engine
+
+from app.models import db, ArchivedSubscription, AuditLog, Subscription, User
+
+# Сколько последних записей аудита отдаёт API
+AUDIT_LOG_LIMIT = 100
+
+# Поля, которые можно запросить через ?fields= (и порядок колоночного формата)
+SUBSCRIPTION_FIELDS = (
+    'id', 'user_id', 'name', 'amount', 'interval', 'next_billing_date',
+    'is_active', 'created_at', 'updated_at', 'version',
+)
+AUDIT_LOG_FIELDS = (
+    'id', 'user_id', 'action', 'entity_type', 'entity_id', 'timestamp',
+    'ip_address', 'user_agent',
+)
+
+_statements = {}
+_lock = threading.Lock()
+_registry_stats = Counter()
+_compiled_stats = Counter()
+
+
+def cached_statement(builder):
+    """Декоратор: построить statement при первом обращении и переиспользовать."""
+    name = builder.__name__
+
+    @wraps(builder)
+    def get():
+        stmt = _statements.get(name)
+        if stmt is not None:
+            _registry_stats['hit'] += 1
+            return stmt
+        with _lock:
+            stmt = _statements.get(name)
+            if stmt is None:
+                _registry_stats['miss'] += 1
+                stmt = _statements[name] = builder()
+        return stmt
+    return get
+
+
+@cached_statement
+def active_subscriptions_by_user():
+    return (
+        db.select(Subscription)
+        .where(Subscription.user_id == bindparam('user_id'))
+        .where(Subscription.is_active.is_(True))
+    )
+
+
+@cached_statement
+def subscription_by_id():
+    return db.select(Subscription).where(Subscription.id == bindparam('subscription_id'))
+
+
+@cached_statement
+def archived_subscription_by_id():
+    return db.select(ArchivedSubscription).where(
+        ArchivedSubscription.id == bindparam('subscription_id')
+    )
+
+
+@cached_statement
+def recent_audit_logs_by_user():
+    return (
+        db.select(AuditLog)
+        .where(AuditLog.user_id == bindparam('user_id'))
+        .order_by(AuditLog.timestamp.desc())
+        .limit(AUDIT_LOG_LIMIT)
+    )
+
+
+@cached_statement
+def user_by_id():
+    return db.select(User).where(User.id == bindparam('user_id'))
+
+
+def parse_fields(value, allowed):
+    """
+    Разобрать параметр ?fields=id,name,amount.
+
+    Returns:
+        tuple или None: поля в порядке allowed (None - параметра нет)
+
+    Raises:
+        ValueError: если запрошено поле не из allowed
+    """
+    if value is None:
+        return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested.difference(allowed)
+    if unknown or not requested:
+        raise ValueError(', '.join(sorted(unknown)))
+    return tuple(field for field in allowed if field in requested)
+
+
+def _columns(model, fields):
+    return [model.__table__.c[field] for field in fields]
+
+
+# Запросы с набором колонок строятся один раз на набор полей
+@lru_cache(maxsize=256)
+def active_subscription_fields_by_user(fields):
+    return (
+        db.select(*_columns(Subscription, fields))
+        .where(Subscription.user_id == bindparam('user_id'))
+        .where(Subscription.is_active.is_(True))
+    )
+
+
+@lru_cache(maxsize=256)
+def subscription_fields_by_id(fields, archived=False):
+    model = ArchivedSubscription if archived else Subscription
+    return (
+        db.select(*_columns(model, fields))
+        .where(model.id == bindparam('subscription_id'))
+        .where(model.user_id == bindparam('user_id'))
+    )
+
+
+@lru_cache(maxsize=256)
+def recent_audit_log_fields_by_user(fields):
+    return (
+        db.select(*_columns(AuditLog, fields))
+        .where(AuditLog.user_id == bindparam('user_id'))
+        .order_by(AuditLog.timestamp.desc())
+        .limit(AUDIT_LOG_LIMIT)
+    )
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is None or context.compiled is None:
+        return
+    cache_hit = context.cache_hit
+    _compiled_stats[getattr(cache_hit, 'name', str(cache_hit)).lower()] += 1
+
+
+def statement_cache_stats():
+    """
+    Метрики кэша запросов.
+
+    Returns:
+        dict: registry (hit/miss реестра) и compiled (cache_hit/cache_miss/
+        no_cache_key... по всем выполненным запросам движка)
+    """
+    return {
+        'registry': dict(_registry_stats),
+        'compiled': dict(_compiled_stats),
+    }
+
+
+def reset_statement_cache_stats():
+    _registry_stats.clear()
+    _compiled_stats.clear()
@@ -0,0 +1,362 @@
+"""
+Ограничение частоты запросов и admission control.
+
+Token bucket на ключ (маршрут + IP или маршрут + пользователь). Состояние
+корзин хранится либо в памяти процесса, либо в общем mmap-файле, который
+разделяют все воркеры gunicorn на одной машине. Файл разбит на шарды со
+своими блокировками (fcntl на диапазон байт + threading.Lock), так что
+конкурирующие воркеры редко ждут друг друга.
+
+ConcurrencyLimiter ограничивает число одновременных дорогих операций
+(хеширование паролей) и отклоняет запрос, если ожидание в очереди
+превысило бюджет. С общим файлом (RATELIMIT_STORAGE_PATH) предел общий
+для всех воркеров машины (SharedConcurrencyLimiter), иначе он делится
+между RATELIMIT_WORKERS воркерами поровну.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+try:
+    import fcntl
+except ImportError:  # Windows: только хранилище в памяти
+    fcntl = None
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Слот корзины: хеш ключа, число токенов, время обновления
+_SLOT = struct.Struct('<Qdd')
+
+
+def parse_rate(rate):
+    """
+    Разобрать лимит вида '10/minute'.
+
+    Returns:
+        tuple: (скорость пополнения в токенах/сек, ёмкость корзины)
+    """
+    count, period = rate.split('/')
+    count = int(count)
+    return count / _PERIODS[period.strip()], count
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+    return value or 1  # 0 обозначает пустой слот
+
+
+def _refill(tokens, updated, now, rate, capacity, cost):
+    """Пополнить корзину и попытаться списать cost токенов."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Корзины в памяти процесса, шардированные по хешу ключа."""
+
+    def __init__(self, shards=16):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        """
+        Списать токены из корзины ключа.
+
+        Returns:
+            tuple: (разрешено ли, через сколько секунд повторить)
+        """
+        now = time.time() if now is None else now
+        key_hash = _key_hash(key)
+        buckets, lock = self._shards[key_hash % len(self._shards)]
+        with lock:
+            tokens, updated = buckets.get(key_hash, (capacity, now))
+            allowed, tokens, retry_after = _refill(tokens, updated, now, rate, capacity, cost)
+            buckets[key_hash] = (tokens, now)
+        return allowed, retry_after
+
+
+class SharedBucketStore:
+    """
+    Корзины в mmap-файле, общем для всех процессов на машине.
+
+    Файл состоит из shards шардов по slots слотов. Ключ попадает в шард по
+    хешу и занимает слот с линейным пробированием; при переполнении шарда
+    вытесняется корзина, обновлявшаяся раньше всех (она почти наверняка
+    уже полна, поэтому вытеснение не ослабляет лимит).
+    """
+
+    def __init__(self, path, shards=64, slots=1024):
+        if fcntl is None:
+            raise RuntimeError('SharedBucketStore требует fcntl (POSIX)')
+        self.path = path
+        self.shards = shards
+        self.slots = slots
+        self._shard_size = slots * _SLOT.size
+        size = shards * self._shard_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size != size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        key_hash = _key_hash(key)
+        shard = key_hash % self.shards
+        base = shard * self._shard_size
+        start = (key_hash // self.shards) % self.slots
+
+        with self._locks[shard]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._shard_size, base)
+            try:
+                offset = self._find_slot(base, start, key_hash)
+                slot_hash, tokens, updated = _SLOT.unpack_from(self._map, offset)
+                if slot_hash != key_hash:
+                    tokens, updated = capacity, now
+                allowed, tokens, retry_after = _refill(tokens, updated, now, rate, capacity, cost)
+                _SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._shard_size, base)
+        return allowed, retry_after
+
+    def _find_slot(self, base, start, key_hash):
+        """Смещение слота ключа, пустого слота или слота для вытеснения."""
+        oldest_offset, oldest_updated = None, None
+        for probe in range(self.slots):
+            offset = base + ((start + probe) % self.slots) * _SLOT.size
+            slot_hash, _, updated = _SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash or slot_hash == 0:
+                return offset
+            if oldest_updated is None or updated < oldest_updated:
+                oldest_offset, oldest_updated = offset, updated
+            if probe >= 32:
+                # Длинные цепочки не просматриваем: вытесняем самый старый
+                break
+        return oldest_offset
+
+
+class ConcurrencyLimiter:
+    """Семафор с ограничением времени ожидания в очереди."""
+
+    def __init__(self, max_concurrent, max_wait):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self):
+        """Занять слот; False, если ожидание превысило бюджет."""
+        return self._semaphore.acquire(timeout=self.max_wait)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class SharedConcurrencyLimiter:
+    """
+    Семафор на все процессы машины: слот - байт файла под fcntl.lockf.
+
+    Блокировки fcntl принадлежат процессу, поэтому потоки одного воркера
+    видят занятые им слоты через threading.Lock. Слоты воркера, упавшего
+    посреди операции, освобождает ядро. Свободный слот ожидается опросом
+    раз в poll_interval секунд.
+    """
+
+    def __init__(self, path, max_concurrent, max_wait, poll_interval=0.005):
+        if fcntl is None:
+            raise RuntimeError('SharedConcurrencyLimiter требует fcntl (POSIX)')
+        self.path = path
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        self._held = set()
+        self._local = threading.local()
+
+    def close(self):
+        os.close(self._fd)
+
+    def acquire(self):
+        """Занять слот; False, если ожидание превысило бюджет."""
+        expires_at = time.monotonic() + self.max_wait
+        while True:
+            slot = self._try_acquire()
+            if slot is not None:
+                self._local.__dict__.setdefault('slots', []).append(slot)
+                return True
+            if time.monotonic() >= expires_at:
+                return False
+            time.sleep(self.poll_interval)
+
+    def _try_acquire(self):
+        with self._lock:
+            for slot in range(self.max_concurrent):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                except OSError:
+                    continue
+                self._held.add(slot)
+                return slot
+        return None
+
+    def release(self):
+        slot = self._local.slots.pop()
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+            self._held.discard(slot)
+
+
+class RateLimiter:
+    """Расширение Flask: лимиты частоты и admission control для роутов."""
+
+    def __init__(self, app=None):
+        self.store = None
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self.stats = {'allowed': 0, 'limited': 0, 'shed': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_PATH', None)
+        app.config.setdefault('RATELIMIT_SHARDS', 64)
+        app.config.setdefault('RATELIMIT_API', '300/minute')
+        app.config.setdefault('RATELIMIT_AUTH_CONCURRENCY', os.cpu_count() or 1)
+        app.config.setdefault('RATELIMIT_AUTH_MAX_WAIT', 0.5)
+        app.config.setdefault('RATELIMIT_WORKERS', int(os.environ.get('WEB_CONCURRENCY', 1)))
+        app.extensions['rate_limiter'] = self
+
+        path = app.config['RATELIMIT_STORAGE_PATH']
+        if path and fcntl is not None:
+            self.store = SharedBucketStore(path, shards=app.config['RATELIMIT_SHARDS'])
+        else:
+            self.store = MemoryBucketStore()
+
+    def _is_enabled(self):
+        return current_app.config['RATELIMIT_ENABLED']
+
+    def _reject(self, status, message, retry_after):
+        if request.is_json or request.blueprint == 'api':
+            response = jsonify({'error': message})
+        else:
+            response = current_app.response_class(message, mimetype='text/plain')
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+        return response
+
+    def check(self, scope, ip=None, user=None, user_key=None):
+        """
+        Проверить лимиты для текущего запроса.
+
+        Args:
+            scope: Имя маршрута (часть ключа корзины)
+            ip: Лимит на IP, например '10/minute'
+            user: Лимит на пользователя
+            user_key: Функция, возвращающая идентификатор пользователя
+                (по умолчанию id текущего пользователя)
+
+        Returns:
+            Response или None: ответ 429, если лимит превышен
+        """
+        buckets = []
+        if ip:
+            buckets.append((f'{scope}:ip:{request.remote_addr}', ip))
+        if user:
+            identity = user_key() if user_key else (
+                current_user.get_id() if current_user.is_authenticated else None
+            )
+            if identity:
+                buckets.append((f'{scope}:user:{identity}', user))
+
+        for key, rate in buckets:
+            refill_rate, capacity = parse_rate(rate)
+            allowed, retry_after = self.store.consume(key, refill_rate, capacity)
+            if not allowed:
+                self.stats['limited'] += 1
+                return self._reject(429, 'Слишком много запросов, попробуйте позже', retry_after)
+        self.stats['allowed'] += 1
+        return None
+
+    def limit(self, ip=None, user=None, user_key=None, methods=None):
+        """Декоратор роута с лимитами на IP и/или пользователя."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self._is_enabled() and (methods is None or request.method in methods):
+                    rejected = self.check(request.endpoint, ip=ip, user=user, user_key=user_key)
+                    if rejected is not None:
+                        return rejected
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _concurrency_limiter(self, name):
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                config = current_app.config
+                limit = config[f'RATELIMIT_{name.upper()}_CONCURRENCY']
+                max_wait = config[f'RATELIMIT_{name.upper()}_MAX_WAIT']
+                path = config['RATELIMIT_STORAGE_PATH']
+                if path and fcntl is not None:
+                    limiter = SharedConcurrencyLimiter(f'{path}.{name}', limit, max_wait)
+                else:
+                    # Без общего файла у каждого воркера своя доля предела
+                    limiter = ConcurrencyLimiter(
+                        math.ceil(limit / config['RATELIMIT_WORKERS']), max_wait
+                    )
+                self._limiters[name] = limiter
+            return limiter
+
+    def admission(self, name, methods=None):
+        """
+        Декоратор admission control: не больше RATELIMIT_<NAME>_CONCURRENCY
+        одновременных вызовов на машину.
+
+        Если слот не освободился за RATELIMIT_<NAME>_MAX_WAIT секунд,
+        запрос отклоняется с 503, а не копится в очереди.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._is_enabled() or (methods is not None and request.method not in methods):
+                    return view(*args, **kwargs)
+                limiter = self._concurrency_limiter(name)
+                if not limiter.acquire():
+                    self.stats['shed'] += 1
+                    return self._reject(503, 'Сервер перегружен, попробуйте позже', limiter.max_wait)
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    limiter.release()
+            return wrapper
+        return decorator
+
+    def api_guard(self):
+        """before_request для API: лимит RATELIMIT_API на пользователя и маршрут."""
+        if not self._is_enabled() or request.endpoint is None:
+            return None
+        rate = current_app.config['RATELIMIT_API']
+        if current_user.is_authenticated:
+            return self.check(request.endpoint, user=rate)
+        return self.check(request.endpoint, ip=rate)
+
+
+rate_limiter = RateLimiter()
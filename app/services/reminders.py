@@ -0,0 +1,430 @@
+"""
+Планировщик напоминаний о предстоящих списаниях.
+
+Вместо ежеминутного сканирования таблицы subscriptions по диапазону дат
+ближайшие моменты срабатывания держатся в памяти в min-куче. В кучу
+загружается только окно [сейчас, сейчас + горизонт]; окно сдвигается
+дозагрузкой узкого диапазона по индексу next_billing_date. Изменения
+подписок в этом воркере приходят из API роутов через schedule()/cancel();
+изменения из остальных воркеров и скриптов (импорт, архивация)
+подхватываются на каждом тике: sync_changes() перечитывает строки с
+updated_at после прошлой синхронизации и надгробия удалённых подписок.
+
+Состояние сохраняется в checkpoint-файл, поэтому после перезапуска
+повторное сканирование уже загруженного окна не требуется.
+"""
+import calendar
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.models import db, Subscription, SubscriptionTombstone
+
+
+def _to_timestamp(dt):
+    """Перевести naive UTC datetime в unix timestamp."""
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def _from_timestamp(ts):
+    """Перевести unix timestamp в naive UTC datetime."""
+    return datetime.utcfromtimestamp(ts)
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний на основе кучи с ленивым удалением.
+
+    Куча хранит кортежи (момент срабатывания, id подписки, поколение).
+    Актуальное поколение каждой подписки лежит в словаре _entries;
+    устаревшие элементы кучи пропускаются при извлечении и периодически
+    вычищаются целиком.
+    """
+
+    def __init__(self, app=None):
+        self._heap = []
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._handlers = []
+        self._thread = None
+        self._stopping = False
+        self._loaded_until = None
+        self._fired_until = None
+        self._synced_at = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Зарегистрировать планировщик в приложении."""
+        app.config.setdefault('REMINDER_DAYS_BEFORE', 3)
+        app.config.setdefault('REMINDER_HOUR', 9)
+        app.config.setdefault('REMINDER_HORIZON_DAYS', 7)
+        app.config.setdefault('REMINDER_CHECKPOINT_PATH', None)
+        app.config.setdefault('REMINDER_SYNC_INTERVAL', 60)
+        app.config.setdefault('REMINDER_SYNC_OVERLAP', 300)
+        app.config.setdefault('REMINDER_SCHEDULER_ENABLED', False)
+        app.config.setdefault('REMINDER_SCHEDULER_AUTOSTART', False)
+        app.extensions['reminder_scheduler'] = self
+        self.app = app
+
+        # Без автозапуска поток запускает сервер: gunicorn после fork
+        # одного воркера (gunicorn.conf.py) или run.py
+        if app.config['REMINDER_SCHEDULER_ENABLED'] and app.config['REMINDER_SCHEDULER_AUTOSTART']:
+            self.start()
+
+    @property
+    def is_loaded(self):
+        """Загружено ли окно расписания (иначе хуки роутов ничего не делают)."""
+        return self._loaded_until is not None
+
+    def on_reminder(self, handler):
+        """
+        Зарегистрировать обработчик напоминаний.
+
+        Обработчик получает словарь с данными подписки. Можно использовать
+        как декоратор.
+        """
+        self._handlers.append(handler)
+        return handler
+
+    def fire_time(self, next_billing_date):
+        """Момент срабатывания напоминания для даты списания (timestamp)."""
+        days_before = self.app.config['REMINDER_DAYS_BEFORE']
+        hour = self.app.config['REMINDER_HOUR']
+        remind_date = next_billing_date - timedelta(days=days_before)
+        return _to_timestamp(datetime(remind_date.year, remind_date.month, remind_date.day, hour))
+
+    # Изменения из роутов
+
+    def schedule(self, subscription):
+        """Поставить (или перепоставить) напоминание для подписки."""
+        if not self.is_loaded:
+            return
+        if not subscription.is_active or subscription.next_billing_date is None:
+            self.cancel(subscription.id)
+            return
+
+        fire_at = self.fire_time(subscription.next_billing_date)
+        with self._lock:
+            if fire_at > self._loaded_until or fire_at <= self._fired_until:
+                # Вне загруженного окна: подхватится дозагрузкой
+                self._entries.pop(subscription.id, None)
+                return
+            entry = self._entries.get(subscription.id)
+            if entry is not None and entry[0] == fire_at:
+                # Уже в расписании (повтор из sync_changes)
+                return
+            self._push(subscription.id, fire_at)
+            is_head = self._heap[0][0] == fire_at
+        if is_head:
+            self._wakeup.set()
+
+    def cancel(self, subscription_id):
+        """Отменить напоминание для подписки."""
+        if not self.is_loaded:
+            return
+        with self._lock:
+            self._entries.pop(subscription_id, None)
+            self._maybe_compact()
+
+    def _push(self, subscription_id, fire_at):
+        self._generation += 1
+        self._entries[subscription_id] = (fire_at, self._generation)
+        heapq.heappush(self._heap, (fire_at, subscription_id, self._generation))
+
+    def _maybe_compact(self):
+        """Пересобрать кучу, если устаревших элементов больше половины."""
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [
+                (fire_at, subscription_id, generation)
+                for subscription_id, (fire_at, generation) in self._entries.items()
+            ]
+            heapq.heapify(self._heap)
+
+    # Загрузка окна
+
+    def load(self, now=None):
+        """
+        Загрузить окно расписания.
+
+        Если есть checkpoint, состояние восстанавливается из него и
+        сканируется только диапазон после сохранённой границы окна.
+        """
+        now = now or datetime.utcnow()
+        now_ts = _to_timestamp(now)
+
+        with self._lock:
+            self._heap = []
+            self._entries = {}
+            if not self._restore_checkpoint():
+                self._loaded_until = now_ts
+                self._fired_until = now_ts
+                # Окно читается из БД целиком: изменения до now уже в нём
+                self._synced_at = now
+        self.extend_window(now)
+
+    def sync_changes(self, now=None):
+        """
+        Перепланировать подписки, изменённые после прошлой синхронизации.
+
+        Перечитываются строки с updated_at позже прошлой синхронизации
+        (минус REMINDER_SYNC_OVERLAP секунд: транзакция фиксируется позже,
+        чем проставлен updated_at, а часы воркеров расходятся) и
+        надгробия подписок, удалённых за то же время.
+
+        Returns:
+            int: Число перечитанных подписок и надгробий
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            since = self._synced_at
+        if since is None:
+            with self._lock:
+                self._synced_at = now
+            return 0
+        since -= timedelta(seconds=self.app.config['REMINDER_SYNC_OVERLAP'])
+
+        deleted = db.session.execute(
+            db.select(SubscriptionTombstone.subscription_id)
+            .where(SubscriptionTombstone.deleted_at > since)
+        ).scalars().all()
+        changed = db.session.execute(
+            db.select(Subscription.id, Subscription.is_active, Subscription.next_billing_date)
+            .where(Subscription.updated_at > since)
+        ).all()
+
+        # Сначала удаления: существующая строка важнее надгробия
+        for subscription_id in deleted:
+            self.cancel(subscription_id)
+        for subscription in changed:
+            self.schedule(subscription)
+        with self._lock:
+            self._synced_at = now
+        return len(deleted) + len(changed)
+
+    def extend_window(self, now=None):
+        """Дозагрузить подписки, напоминания по которым попадают в горизонт."""
+        now = now or datetime.utcnow()
+        horizon = _to_timestamp(now + timedelta(days=self.app.config['REMINDER_HORIZON_DAYS']))
+        days_before = self.app.config['REMINDER_DAYS_BEFORE']
+
+        with self._lock:
+            window_start = self._loaded_until
+        if horizon <= window_start:
+            return 0
+
+        # Диапазон дат списания, напоминания по которым попадают в (start, horizon]
+        first_date = (_from_timestamp(window_start) + timedelta(days=days_before)).date()
+        last_date = (_from_timestamp(horizon) + timedelta(days=days_before)).date()
+
+        rows = db.session.execute(
+            db.select(Subscription.id, Subscription.next_billing_date)
+            .where(Subscription.is_active.is_(True))
+            .where(Subscription.next_billing_date.between(first_date, last_date))
+        ).all()
+
+        loaded = 0
+        with self._lock:
+            for subscription_id, next_billing_date in rows:
+                fire_at = self.fire_time(next_billing_date)
+                if window_start < fire_at <= horizon and subscription_id not in self._entries:
+                    self._push(subscription_id, fire_at)
+                    loaded += 1
+            self._loaded_until = horizon
+        self._save_checkpoint()
+        return loaded
+
+    # Срабатывание
+
+    def run_pending(self, now=None):
+        """
+        Вызвать обработчики для всех наступивших напоминаний.
+
+        Перед вызовом подписки перечитываются из БД одним запросом, чтобы
+        не напоминать об удалённых, отключённых или перенесённых подписках.
+
+        Returns:
+            list: Словари сработавших напоминаний
+        """
+        now_ts = _to_timestamp(now or datetime.utcnow())
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now_ts:
+                fire_at, subscription_id, generation = heapq.heappop(self._heap)
+                entry = self._entries.get(subscription_id)
+                if entry is None or entry[1] != generation:
+                    continue
+                del self._entries[subscription_id]
+                due.append((subscription_id, fire_at))
+            self._fired_until = max(self._fired_until, now_ts)
+
+        if not due:
+            return []
+
+        subscriptions = {
+            sub.id: sub for sub in db.session.execute(
+                db.select(Subscription).where(Subscription.id.in_([sid for sid, _ in due]))
+            ).scalars()
+        }
+
+        events = []
+        for subscription_id, fire_at in due:
+            sub = subscriptions.get(subscription_id)
+            if sub is None or not sub.is_active or self.fire_time(sub.next_billing_date) != fire_at:
+                continue
+            events.append({
+                'subscription_id': sub.id,
+                'user_id': sub.user_id,
+                'name': sub.name,
+                'amount': float(sub.amount),
+                'next_billing_date': sub.next_billing_date.isoformat(),
+            })
+
+        handlers = self._handlers or [self._log_reminder]
+        for event in events:
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception as e:
+                    self.app.logger.error(f"Ошибка в обработчике напоминания: {e}")
+
+        self._save_checkpoint()
+        return events
+
+    def _log_reminder(self, event):
+        """Обработчик по умолчанию: записать напоминание в лог приложения."""
+        self.app.logger.info(
+            f"Напоминание: подписка {event['subscription_id']} пользователя "
+            f"{event['user_id']}, списание {event['next_billing_date']}"
+        )
+
+    def next_fire_time(self):
+        """Ближайший момент срабатывания (timestamp) или None."""
+        with self._lock:
+            while self._heap:
+                fire_at, subscription_id, generation = self._heap[0]
+                entry = self._entries.get(subscription_id)
+                if entry is not None and entry[1] == generation:
+                    return fire_at
+                heapq.heappop(self._heap)
+        return None
+
+    # Фоновый поток
+
+    def start(self):
+        """Запустить фоновый поток планировщика."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Остановить фоновый поток."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        with self.app.app_context():
+            refill_every = self.app.config['REMINDER_HORIZON_DAYS'] * 86400 / 2
+            sync_every = self.app.config['REMINDER_SYNC_INTERVAL']
+            while not self._stopping:
+                try:
+                    if not self.is_loaded:
+                        self.load()
+                    self.sync_changes()
+                    self.run_pending()
+                    if self._loaded_until - time.time() < refill_every:
+                        self.extend_window()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Ошибка планировщика напоминаний: {e}")
+                finally:
+                    # Не держим соединение из пула между срабатываниями
+                    db.session.remove()
+
+                if not self.is_loaded:
+                    timeout = 60  # повтор загрузки после ошибки БД
+                else:
+                    next_fire = self.next_fire_time()
+                    timeout = refill_every if next_fire is None else next_fire - time.time()
+                self._wakeup.wait(min(max(timeout, 0), refill_every, sync_every))
+                self._wakeup.clear()
+
+    # Checkpoint
+
+    def _save_checkpoint(self):
+        path = self.app.config['REMINDER_CHECKPOINT_PATH']
+        if not path:
+            return
+        with self._lock:
+            state = {
+                'loaded_until': self._loaded_until,
+                'fired_until': self._fired_until,
+                'synced_at': _to_timestamp(self._synced_at) if self._synced_at else None,
+                'entries': [
+                    [subscription_id, fire_at]
+                    for subscription_id, (fire_at, _) in self._entries.items()
+                ],
+            }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _restore_checkpoint(self):
+        path = self.app.config['REMINDER_CHECKPOINT_PATH']
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.app.logger.warning(f"Не удалось прочитать checkpoint напоминаний: {e}")
+            return False
+
+        for subscription_id, fire_at in state['entries']:
+            self._push(subscription_id, fire_at)
+        self._loaded_until = state['loaded_until']
+        self._fired_until = state['fired_until']
+        synced_at = state.get('synced_at')
+        # Checkpoint без отметки: изменения с его записи неизвестны, ближайший
+        # sync_changes() начнёт отсчёт заново
+        self._synced_at = _from_timestamp(synced_at) if synced_at else None
+        return True
+
+    # Метрики
+
+    def memory_usage(self):
+        """
+        Оценить память, занимаемую расписанием.
+
+        Returns:
+            dict: items, bytes и bytes_per_item (куча, словарь и их элементы)
+        """
+        with self._lock:
+            total = sys.getsizeof(self._heap) + sys.getsizeof(self._entries)
+            for item in self._heap:
+                total += sys.getsizeof(item) + sum(sys.getsizeof(v) for v in item)
+            for entry in self._entries.values():
+                # Ключ и timestamp разделяются с элементом кучи
+                total += sys.getsizeof(entry)
+            items = len(self._entries)
+        return {
+            'items': items,
+            'bytes': total,
+            'bytes_per_item': total / items if items else 0,
+        }
+
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,164 @@
+"""
+Сводный отчёт по выручке всей платформы.
+
+Диапазон users.id делится на чанки, каждый чанк агрегируется одним
+GROUP BY запросом в БД (по индексу subscriptions.user_id), чанки
+обрабатываются в пуле процессов, а частичные агрегаты затем сливаются.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import case, func
+
+from app.models import db, Subscription, User
+
+# Сколько месяцев в интервале списания: MRR = amount / months
+INTERVAL_MONTHS = {'monthly': 1, 'yearly': 12}
+
+
+def split_id_range(first_id, last_id, chunk_size):
+    """
+    Разбить диапазон id на непересекающиеся отрезки.
+
+    Returns:
+        list: Кортежи (first_id, last_id) включительно
+    """
+    return [
+        (start, min(start + chunk_size - 1, last_id))
+        for start in range(first_id, last_id + 1, chunk_size)
+    ]
+
+
+def aggregate_chunk(first_user_id, last_user_id, today, upcoming_days):
+    """
+    Посчитать частичный агрегат по пользователям из диапазона id.
+
+    Должна вызываться внутри контекста приложения.
+
+    Returns:
+        dict: mrr, by_interval, upcoming_charges, users и seconds
+    """
+    started = time.perf_counter()
+    upcoming_until = today + timedelta(days=upcoming_days)
+    is_upcoming = case(
+        (Subscription.next_billing_date.between(today, upcoming_until), 1),
+        else_=0,
+    )
+
+    rows = db.session.execute(
+        db.select(
+            Subscription.interval,
+            func.count(),
+            func.sum(Subscription.amount),
+            func.sum(is_upcoming),
+        )
+        .where(Subscription.user_id.between(first_user_id, last_user_id))
+        .where(Subscription.is_active.is_(True))
+        .group_by(Subscription.interval)
+    ).all()
+
+    partial = {
+        'mrr': Decimal('0'),
+        'by_interval': {},
+        'upcoming_charges': 0,
+        'users': (first_user_id, last_user_id),
+    }
+    for interval, count, total, upcoming in rows:
+        # Нормализация к месяцу после суммирования: одно деление на интервал
+        mrr = Decimal(str(total or 0)) / INTERVAL_MONTHS.get(interval, 1)
+        partial['by_interval'][interval] = {'count': count, 'mrr': mrr}
+        partial['mrr'] += mrr
+        partial['upcoming_charges'] += upcoming or 0
+    partial['seconds'] = time.perf_counter() - started
+    return partial
+
+
+def merge_partials(partials):
+    """Слить частичные агрегаты чанков в итоговый отчёт."""
+    report = {'mrr': Decimal('0'), 'by_interval': {}, 'upcoming_charges': 0}
+    for partial in partials:
+        report['mrr'] += partial['mrr']
+        report['upcoming_charges'] += partial['upcoming_charges']
+        for interval, stats in partial['by_interval'].items():
+            merged = report['by_interval'].setdefault(interval, {'count': 0, 'mrr': Decimal('0')})
+            merged['count'] += stats['count']
+            merged['mrr'] += stats['mrr']
+
+    report['mrr'] = report['mrr'].quantize(Decimal('0.01'))
+    for stats in report['by_interval'].values():
+        stats['mrr'] = stats['mrr'].quantize(Decimal('0.01'))
+    return report
+
+
+# Состояние процесса-воркера пула: своё приложение и свой пул соединений
+_worker_app_context = None
+
+
+def _init_worker(config_name):
+    global _worker_app_context
+    from app import create_app
+
+    app = create_app(config_name)
+    _worker_app_context = app.app_context()
+    _worker_app_context.push()
+    # Соединения, унаследованные от родителя через fork, не переиспользуем
+    db.engine.dispose(close=False)
+
+
+def _aggregate_chunk_in_worker(args):
+    try:
+        return aggregate_chunk(*args)
+    finally:
+        db.session.remove()
+
+
+def build_report(config_name='development', workers=1, chunk_size=10000,
+                 upcoming_days=7, today=None):
+    """
+    Построить отчёт по всей платформе.
+
+    Должна вызываться внутри контекста приложения. При workers == 1 чанки
+    считаются в текущем процессе (так работает и SQLite in-memory), иначе
+    каждый воркер пула поднимает своё приложение с конфигурацией config_name.
+
+    Args:
+        config_name: Конфигурация для воркеров пула
+        workers: Число процессов
+        chunk_size: Размер чанка по users.id
+        upcoming_days: Горизонт для подсчёта предстоящих списаний
+        today: Дата отчёта (по умолчанию сегодня)
+
+    Returns:
+        dict: Итоговый отчёт с таймингами по чанкам
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+
+    first_id, last_id = db.session.execute(db.select(func.min(User.id), func.max(User.id))).one()
+    chunks = split_id_range(first_id, last_id, chunk_size) if first_id is not None else []
+    tasks = [(first, last, today, upcoming_days) for first, last in chunks]
+
+    if workers == 1:
+        partials = [aggregate_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config_name,)) as pool:
+            partials = list(pool.map(_aggregate_chunk_in_worker, tasks))
+
+    report = merge_partials(partials)
+    wall_seconds = time.perf_counter() - started
+    chunk_seconds = sum(partial['seconds'] for partial in partials)
+    report['timing'] = {
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'chunk_seconds': chunk_seconds,
+        # Во сколько раз суммарная работа чанков больше wall time
+        'parallelism': chunk_seconds / wall_seconds if wall_seconds else 0,
+        'chunks': [
+            {'users': partial['users'], 'seconds': partial['seconds']}
+            for partial in partials
+        ],
+    }
+    return report
@@ -0,0 +1,113 @@
+"""
+Обновление схемы существующей БД до текущих моделей.
+
+db.create_all() создаёт только недостающие таблицы и индексы новых
+таблиц, но не добавляет колонки и индексы в уже существующие. В users и
+subscriptions появились колонки delta-синхронизации (change_seq,
+sync_floor_seq), версия строки (version) и updated_at: без них первый же
+запрос к старой БД падает. upgrade_schema() добавляет недостающие колонки
+и индексы, а старым подпискам раздаёт номера изменений, как если бы они
+были созданы по одной: иначе они не попали бы в ответы /changes с
+токеном. Повторный запуск ничего не меняет.
+"""
+import itertools
+
+from sqlalchemy import inspect
+
+from app.models import db, Subscription, User
+from app.services.sync import next_change_seq
+
+# Новые колонки существующих таблиц: (модель, колонка, значение для старых строк)
+_ADDED_COLUMNS = (
+    (User, 'change_seq', '0'),
+    (User, 'sync_floor_seq', '0'),
+    (Subscription, 'updated_at', None),
+    (Subscription, 'version', '1'),
+    (Subscription, 'change_seq', '0'),
+)
+
+# Номера изменений раздаются пачками по столько строк
+_BACKFILL_BATCH = 1000
+
+
+def _add_columns(connection):
+    inspector = inspect(connection)
+    added = []
+    for model, name, default in _ADDED_COLUMNS:
+        table = model.__table__
+        if name in {column['name'] for column in inspector.get_columns(table.name)}:
+            continue
+        column_type = table.c[name].type.compile(dialect=connection.dialect)
+        ddl = f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}'
+        if default is not None:
+            ddl += f' NOT NULL DEFAULT {default}'
+        connection.exec_driver_sql(ddl)
+        added.append(f'{table.name}.{name}')
+    return added
+
+
+def _create_indexes(connection):
+    created = []
+    existing = {index['name'] for index in inspect(connection).get_indexes(Subscription.__tablename__)}
+    for index in Subscription.__table__.indexes:
+        if index.name not in existing:
+            index.create(connection)
+            created.append(index.name)
+    if connection.dialect.name == 'postgresql' and 'ix_subscriptions_name_trgm' not in existing:
+        connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        connection.exec_driver_sql(
+            'CREATE INDEX IF NOT EXISTS ix_subscriptions_name_trgm '
+            'ON subscriptions USING gin (name gin_trgm_ops)'
+        )
+        created.append('ix_subscriptions_name_trgm')
+    return created
+
+
+def _backfill_change_seq():
+    """Раздать номера изменений подпискам с change_seq = 0 (по порядку id)."""
+    rows = db.session.execute(
+        db.select(Subscription.user_id, Subscription.id)
+        .where(Subscription.change_seq == 0)
+        .order_by(Subscription.user_id, Subscription.id)
+    ).all()
+    numbered = 0
+    for user_id, group in itertools.groupby(rows, key=lambda row: row.user_id):
+        ids = [row.id for row in group]
+        for start in range(0, len(ids), _BACKFILL_BATCH):
+            batch = ids[start:start + _BACKFILL_BATCH]
+            first_seq = next_change_seq(user_id, len(batch)) - len(batch) + 1
+            db.session.execute(
+                db.update(Subscription.__table__)
+                .where(Subscription.__table__.c.id == db.bindparam('subscription_id'))
+                # updated_at не трогаем (иначе сработал бы onupdate)
+                .values(change_seq=db.bindparam('seq'),
+                        updated_at=Subscription.__table__.c.updated_at),
+                [{'subscription_id': subscription_id, 'seq': seq}
+                 for seq, subscription_id in enumerate(batch, first_seq)],
+            )
+        numbered += len(ids)
+    return numbered
+
+
+def upgrade_schema():
+    """
+    Добавить недостающие колонки и индексы и заполнить их для старых строк.
+
+    Выполняется одной транзакцией после db.create_all().
+
+    Returns:
+        dict: added (колонки), indexes (созданные индексы), backfilled
+        (подписки, получившие номер изменения)
+    """
+    connection = db.session.connection()
+    added = _add_columns(connection)
+    indexes = _create_indexes(connection)
+    db.session.execute(
+        db.update(Subscription)
+        .where(Subscription.updated_at.is_(None))
+        .values(updated_at=db.func.coalesce(Subscription.created_at, db.func.now()))
+        .execution_options(synchronize_session=False)
+    )
+    backfilled = _backfill_change_seq()
+    db.session.commit()
+    return {'added': added, 'indexes': indexes, 'backfilled': backfilled}
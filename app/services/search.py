@@ -0,0 +1,235 @@
+"""
+Поиск подписок по названию.
+
+На PostgreSQL поиск выполняется в БД через pg_trgm (GIN индекс
+ix_subscriptions_name_trgm). На остальных СУБД (SQLite) используется
+in-process индекс триграмм: для пользователя один раз загружаются пары
+(id, name), строится инвертированный индекс, а дальше API роуты
+поддерживают его в актуальном состоянии инкрементально.
+
+Ранжирование совпадает по смыслу с pg_trgm: подстрока важнее, дальше
+доля триграмм запроса, найденных в названии (аналог word_similarity),
+и общее сходство строк (similarity). Это даёт устойчивость к опечаткам.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import func, literal
+
+from app.models import db, Subscription
+
+# Порог, как pg_trgm.word_similarity_threshold по умолчанию
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    """
+    Множество триграмм строки в нормализации pg_trgm.
+
+    Не буквенно-цифровые символы считаются разделителями слов, каждое
+    слово приводится к нижнему регистру и дополняется двумя пробелами
+    слева и одним справа.
+    """
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class UserNgramIndex:
+    """Инвертированный индекс триграмм названий подписок одного пользователя."""
+
+    def __init__(self, rows):
+        self.built_at = time.monotonic()
+        self._names = {}
+        self._grams = {}
+        self._postings = {}
+        for subscription_id, name in rows:
+            self.add(subscription_id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, subscription_id, name):
+        """Добавить или обновить название подписки."""
+        self.remove(subscription_id)
+        grams = trigrams(name)
+        self._names[subscription_id] = name.lower()
+        self._grams[subscription_id] = len(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(subscription_id)
+
+    def remove(self, subscription_id):
+        """Удалить подписку из индекса."""
+        name = self._names.pop(subscription_id, None)
+        if name is None:
+            return
+        del self._grams[subscription_id]
+        for gram in trigrams(name):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(subscription_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, query, limit):
+        """
+        Найти подписки, похожие на запрос.
+
+        Returns:
+            list: Пары (subscription_id, score) по убыванию score
+        """
+        query_lower = query.lower()
+        query_grams = trigrams(query)
+
+        shared = Counter()
+        for gram in query_grams:
+            posting = self._postings.get(gram)
+            if posting:
+                shared.update(posting)
+
+        if len(query_lower) < 3:
+            # Короткие подстроки могут не дать общих триграмм
+            for subscription_id, name in self._names.items():
+                if query_lower in name and subscription_id not in shared:
+                    shared[subscription_id] = 0
+
+        scored = []
+        for subscription_id, common in shared.items():
+            word_similarity = common / len(query_grams) if query_grams else 0
+            is_substring = query_lower in self._names[subscription_id]
+            if is_substring or word_similarity >= WORD_SIMILARITY_THRESHOLD:
+                similarity = common / (len(query_grams) + self._grams[subscription_id] - common)
+                scored.append((is_substring, word_similarity, similarity, -subscription_id))
+
+        scored.sort(reverse=True)
+        return [(-item[3], item[1]) for item in scored[:limit]]
+
+
+class SubscriptionSearchIndex:
+    """
+    LRU-кэш индексов триграмм по пользователям.
+
+    Индекс пользователя пересобирается не реже раза в max_age секунд,
+    чтобы изменения, сделанные другими воркерами, тоже становились видны.
+    """
+
+    def __init__(self, max_users=1000, max_age=300):
+        self.max_users = max_users
+        self.max_age = max_age
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def invalidate(self, user_id):
+        """Сбросить индекс пользователя (после массового изменения подписок)."""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def _get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at < self.max_age:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        rows = db.session.execute(
+            db.select(Subscription.id, Subscription.name)
+            .where(Subscription.user_id == user_id)
+            .where(Subscription.is_active.is_(True))
+        ).all()
+        index = UserNgramIndex(rows)
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def search(self, user_id, query, limit):
+        index = self._get(user_id)
+        with self._lock:
+            return index.search(query, limit)
+
+    def upsert(self, subscription):
+        """Обновить подписку в индексе, если индекс пользователя загружен."""
+        with self._lock:
+            index = self._indexes.get(subscription.user_id)
+            if index is None:
+                return
+            if subscription.is_active:
+                index.add(subscription.id, subscription.name)
+            else:
+                index.remove(subscription.id)
+
+    def remove(self, user_id, subscription_id):
+        """Удалить подписку из индекса, если индекс пользователя загружен."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                index.remove(subscription_id)
+
+
+search_index = SubscriptionSearchIndex()
+
+
+def _search_postgresql(user_id, query, limit):
+    is_substring = Subscription.name.icontains(query, autoescape=True)
+    score = func.word_similarity(query, Subscription.name)
+    rows = db.session.execute(
+        db.select(Subscription, score)
+        .where(Subscription.user_id == user_id)
+        .where(Subscription.is_active.is_(True))
+        .where(is_substring | literal(query).op('<%')(Subscription.name))
+        .order_by(
+            is_substring.desc(),
+            score.desc(),
+            func.similarity(Subscription.name, query).desc(),
+            Subscription.id,
+        )
+        .limit(limit)
+    ).all()
+    return [(subscription, float(score)) for subscription, score in rows]
+
+
+def _search_ngram_index(user_id, query, limit):
+    matches = search_index.search(user_id, query, limit)
+    if not matches:
+        return []
+    subscriptions = {
+        sub.id: sub for sub in db.session.execute(
+            db.select(Subscription).where(Subscription.id.in_([sid for sid, _ in matches]))
+        ).scalars()
+    }
+    return [
+        (subscriptions[subscription_id], score)
+        for subscription_id, score in matches
+        if subscription_id in subscriptions
+    ]
+
+
+def search_subscriptions(user_id, query, limit=20):
+    """
+    Найти активные подписки пользователя по названию.
+
+    Args:
+        user_id: ID пользователя
+        query: Строка поиска (подстрока или название с опечатками)
+        limit: Максимальное число результатов
+
+    Returns:
+        list: Пары (Subscription, score) по убыванию релевантности
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgresql(user_id, query, limit)
+    return _search_ngram_index(user_id, query, limit)
@@ -0,0 +1,198 @@
+"""
+Профиль SQLite для небольших инсталляций без PostgreSQL.
+
+SQLite допускает одного писателя на файл. При параллельных записях из
+потоков воркера (создание подписки, запись аудита) с настройками по
+умолчанию транзакции конкурируют за блокировку и получают "database is
+locked". Здесь:
+
+- каждому новому соединению задаются PRAGMA из SQLITE_PRAGMAS (WAL:
+  читатели не блокируют писателя и друг друга, synchronous=NORMAL,
+  кэш страниц, mmap, busy_timeout);
+- записи роутов (регистрация, подписки, импорт, аудит) выполняются
+  одним потоком-писателем. Поток берёт
+  из очереди до SQLITE_WRITER_BATCH заданий, выполняет каждое в своей
+  точке сохранения (ошибка одного задания не откатывает остальные) и
+  фиксирует их одним COMMIT: на пачку приходится один fsync.
+
+Чтения по-прежнему идут из потоков запросов параллельно. Без
+SQLITE_WRITER_ENABLED (PostgreSQL, тесты) задания выполняются сразу в
+сессии вызывающего потока.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+
+from app.models import db
+from app.services.deadlines import DeadlineExceeded, mark_deadline_exceeded
+
+
+class SQLiteWriter:
+    """Очередь записей в SQLite с групповой фиксацией."""
+
+    def __init__(self, app=None):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'commits': 0}
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_PRAGMAS', {})
+        app.config.setdefault('SQLITE_WRITER_ENABLED', False)
+        app.config.setdefault('SQLITE_WRITER_BATCH', 64)
+        app.config.setdefault('SQLITE_WRITER_TIMEOUT', 5)
+        app.extensions['sqlite_writer'] = self
+        self.app = app
+
+        pragmas = app.config['SQLITE_PRAGMAS']
+        with app.app_context():
+            engine = db.engine
+        if pragmas and engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', lambda connection, record: _apply_pragmas(connection, pragmas))
+
+    @property
+    def enabled(self):
+        return current_app.config['SQLITE_WRITER_ENABLED']
+
+    def submit(self, fn, *args):
+        """
+        Поставить задание fn(*args) в очередь писателя.
+
+        fn выполняется в сессии потока-писателя и должна возвращать
+        простые данные, а не объекты ORM этой сессии.
+
+        Returns:
+            Future: результат fn после COMMIT пачки
+        """
+        if self._thread is None:
+            # Поток запускается при первой записи, то есть уже в воркере
+            # после fork, а не в мастере gunicorn
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='sqlite-writer', daemon=True
+                    )
+                    self._thread.start()
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def run(self, fn, *args):
+        """
+        Выполнить запись и дождаться фиксации.
+
+        Без очереди fn выполняется и фиксируется в текущей сессии. С
+        очередью ожидание ограничено остатком дедлайна запроса или
+        SQLITE_WRITER_TIMEOUT секундами.
+
+        Raises:
+            DeadlineExceeded: если задание не успело начаться
+        """
+        if not self.enabled:
+            try:
+                result = fn(*args)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+
+        future = self.submit(fn, *args)
+        timeout = current_app.config['SQLITE_WRITER_TIMEOUT']
+        expires_at = g.get('deadline') if has_app_context() else None
+        if expires_at is not None:
+            timeout = min(timeout, max(0.0, expires_at - time.monotonic()))
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.cancel():
+                mark_deadline_exceeded()
+                raise DeadlineExceeded()
+            # Задание уже выполняется: его результат будет зафиксирован
+            return future.result()
+
+    def stop(self, timeout=5):
+        """Дождаться выполнения поставленных заданий и остановить поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _next_batch(self, limit):
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        while len(batch) < limit:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Остановка после текущей пачки
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            limit = self.app.config['SQLITE_WRITER_BATCH']
+            while True:
+                batch = self._next_batch(limit)
+                if batch is None:
+                    break
+                self._execute(batch)
+
+    def _execute(self, batch):
+        results = []
+        try:
+            # Блокировка записи берётся сразу, а не при первой записи после
+            # чтений внутри задания
+            db.session.execute(db.text('BEGIN IMMEDIATE'))
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        result = fn(*args)
+                except Exception as e:
+                    results.append((future, None, e))
+                else:
+                    results.append((future, result, None))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.error(f"Ошибка пачки записей SQLite: {e}")
+            for fn, args, future in batch:
+                if future.running():
+                    future.set_exception(e)
+            return
+        finally:
+            db.session.remove()
+
+        self.stats['jobs'] += len(results)
+        self.stats['commits'] += 1
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+sqlite_writer = SQLiteWriter()
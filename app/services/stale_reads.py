@@ -0,0 +1,193 @@
+"""
+Устаревшие данные для чтения при недоступной БД (stale-while-revalidate).
+
+Роут с декоратором @stale_reads.serve_stale запоминает последний
+успешный ответ каждого пользователя (сериализованное тело и тип; ключ -
+пользователь из сессии, путь с параметрами и Accept; ETag ответа
+сохраняется вместе с телом). Если автомат
+защиты БД открыт или запрос упал из-за недоступности БД, пользователь
+получает сохранённый ответ с заголовками Age и Warning: 110 вместо
+ожидания таймаута. Ответы, отданные устаревшими, перезапрашиваются в
+фоновом потоке, как только автомат закрывается.
+
+Ответы хранятся в памяти воркера, не дольше STALE_READS_MAX_AGE секунд
+и не больше STALE_READS_MAX_BYTES байт в сумме (старые вытесняются).
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, session
+from flask_login import login_user
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.models import db, User
+from app.services.circuit_breaker import CircuitOpenError, circuit_breaker
+
+STALE_WARNING = '110 - "Response is Stale"'
+
+
+class _Entry:
+    __slots__ = ('body', 'content_type', 'etag', 'stored_at', 'view', 'view_args')
+
+    def __init__(self, response, view, view_args):
+        self.body = response.get_data()
+        self.content_type = response.content_type
+        self.etag = response.headers.get('ETag')
+        self.stored_at = time.time()
+        self.view = view
+        self.view_args = view_args
+
+
+class StaleReadCache:
+    """Последние ответы роутов чтения по пользователям."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_age=86400):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.app = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._pending = set()
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.stats = {'stored': 0, 'served': 0, 'missed': 0, 'refreshed': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._bytes = 0
+
+    def init_app(self, app):
+        app.config.setdefault('STALE_READS_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('STALE_READS_MAX_AGE', 86400)
+        self.max_bytes = app.config['STALE_READS_MAX_BYTES']
+        self.max_age = app.config['STALE_READS_MAX_AGE']
+        app.extensions['stale_reads'] = self
+        self.app = app
+        self.clear()
+        circuit_breaker.on_close(self.schedule_refresh)
+
+    def serve_stale(self, view):
+        """
+        Декоратор роута чтения: при недоступной БД отдать последний ответ.
+
+        Ставится над @deadline и @login_required: отменённый по дедлайну
+        запрос (503) тоже заменяется сохранённым ответом.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = session.get('_user_id')
+            if user_id is None or not circuit_breaker.enabled:
+                return view(*args, **kwargs)
+
+            key = (user_id, request.full_path, request.headers.get('Accept', ''))
+            if circuit_breaker.is_open:
+                return self._serve(key)
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except (CircuitOpenError, OperationalError, PoolTimeoutError) as e:
+                if isinstance(e, PoolTimeoutError):
+                    # Ожидание свободного соединения пула не доходит до
+                    # событий движка, но означает то же: БД не отвечает
+                    circuit_breaker.record_failure()
+                db.session.rollback()
+                return self._serve(key)
+
+            if response.status_code == 503 and g.get('deadline_exceeded'):
+                return self._serve(key, fallback=response)
+            if response.status_code == 200 and not response.is_streamed:
+                self._store(key, _Entry(response, view, kwargs))
+            return response
+        return wrapper
+
+    def _store(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+            self.stats['stored'] += 1
+
+    def _serve(self, key, fallback=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.stored_at > self.max_age:
+                del self._entries[key]
+                self._bytes -= len(entry.body)
+                entry = None
+            if entry is None:
+                self.stats['missed'] += 1
+            else:
+                self._pending.add(key)
+                self.stats['served'] += 1
+        if entry is None:
+            return fallback if fallback is not None else circuit_breaker.unavailable()
+
+        response = current_app.response_class(entry.body, content_type=entry.content_type)
+        if entry.etag is not None:
+            response.headers['ETag'] = entry.etag
+        response.headers['Age'] = str(int(now - entry.stored_at))
+        response.headers['Warning'] = STALE_WARNING
+        response.vary.add('Accept')
+        return response
+
+    def schedule_refresh(self):
+        """Перезапросить в фоне ответы, отданные устаревшими."""
+        with self._lock:
+            if not self._pending or self._refreshing or self.app is None:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_pending, name='stale-reads-refresh', daemon=True).start()
+
+    def _refresh_pending(self):
+        try:
+            with self.app.app_context():
+                while not circuit_breaker.is_open:
+                    with self._lock:
+                        if not self._pending:
+                            break
+                        key = self._pending.pop()
+                        entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    try:
+                        self._refresh(key, entry)
+                    except Exception as e:
+                        self.app.logger.warning(f"Не удалось обновить устаревший ответ: {e}")
+                    finally:
+                        db.session.remove()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh(self, key, entry):
+        user_id, path, accept = key
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            with self._lock:
+                removed = self._entries.pop(key, None)
+                if removed is not None:
+                    self._bytes -= len(removed.body)
+            return
+
+        headers = {'Accept': accept} if accept else {}
+        with self.app.test_request_context(path, headers=headers):
+            login_user(user)
+            response = self.app.make_response(entry.view(**entry.view_args))
+            if response.status_code == 200 and not response.is_streamed:
+                self._store(key, _Entry(response, entry.view, entry.view_args))
+                self.stats['refreshed'] += 1
+
+
+stale_reads = StaleReadCache()
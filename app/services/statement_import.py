@@ -0,0 +1,380 @@
+"""
+Импорт подписок из банковских выписок (CSV и OFX).
+
+Импорт идёт в два шага. validate_statement() в потоке запроса читает
+файл потоком, проверяет записи теми же правилами, что и при создании
+подписки, и складывает годные строки во временный файл (в памяти до
+IMPORT_SPOOL_MEMORY байт, дальше на диске). load_statement() загружает
+их пачками по IMPORT_CHUNK_SIZE, каждую одной командой: COPY в
+PostgreSQL, executemany в остальных БД. В памяти одновременно находятся
+только текущая пачка и не больше IMPORT_MAX_ERRORS ошибок, поэтому
+размер файла на память не влияет.
+
+Без писателя SQLite все пачки идут в одной транзакции. С писателем
+каждая пачка - отдельное короткое задание: писатель не читает файл из
+сокета клиента, держа BEGIN IMMEDIATE, и остальные записи воркера не
+ждут весь импорт.
+
+CSV: строка заголовка с колонками name, amount, interval и
+next_billing_date (порядок любой, лишние колонки игнорируются),
+разделитель ',' или ';', сумма с точкой или запятой.
+
+OFX: каждая транзакция списания (STMTTRN с отрицательной TRNAMT)
+становится ежемесячной подпиской: название - NAME (или MEMO), сумма -
+модуль TRNAMT, следующее списание - через месяц после DTPOSTED.
+"""
+import calendar
+import csv
+import io
+import itertools
+import re
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+
+from app.models import db, AuditLog, Subscription
+from app.services import outbox
+from app.services.sqlite_writer import sqlite_writer
+from app.services.sync import next_change_seq
+from app.utils.validators import validate_date, validate_subscription_interval
+
+CSV_COLUMNS = ('name', 'amount', 'interval', 'next_billing_date')
+
+# Предел Numeric(10, 2): строка больше него прервала бы всю транзакцию
+MAX_AMOUNT = Decimal('99999999.99')
+
+_COPY_COLUMNS = (
+    'user_id', 'name', 'amount', 'interval', 'next_billing_date', 'is_active',
+    'created_at', 'updated_at', 'version', 'change_seq',
+)
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_OFX_MAX_TOKEN = 1 << 20
+
+
+class ImportFormatError(ValueError):
+    """Файл нельзя разобрать: неизвестный формат, нет нужных колонок."""
+
+
+def detect_format(head, mimetype='', filename=''):
+    """
+    Определить формат по типу, расширению или первым байтам файла.
+
+    Returns:
+        str: 'csv' или 'ofx'
+    """
+    filename = (filename or '').lower()
+    if mimetype in ('application/x-ofx', 'application/ofx') or filename.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    if mimetype in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    head = head.lstrip(b'\xef\xbb\xbf \t\r\n').upper()
+    if head.startswith((b'OFXHEADER', b'<?XML', b'<OFX')):
+        return 'ofx'
+    return 'csv'
+
+
+def read_csv(stream, encoding='utf-8'):
+    """
+    Записи CSV файла.
+
+    Yields:
+        tuple: (номер записи, словарь колонок CSV_COLUMNS со строками)
+
+    Raises:
+        ImportFormatError: если нет заголовка или нужных колонок
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig' if encoding == 'utf-8' else encoding,
+                            newline='')
+    header_line = text.readline(64 * 1024)
+    if not header_line.strip():
+        raise ImportFormatError('Пустой файл')
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+
+    header = [column.strip().lower() for column in next(reader)]
+    missing = [column for column in CSV_COLUMNS if column not in header]
+    if missing:
+        raise ImportFormatError(f"Нет колонок: {', '.join(missing)}")
+    positions = {column: header.index(column) for column in CSV_COLUMNS}
+
+    for number, row in enumerate(reader, 1):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield number, {
+            column: row[position] if position < len(row) else ''
+            for column, position in positions.items()
+        }
+
+
+def _add_month(day):
+    year, month = divmod(day.year * 12 + day.month, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _ofx_record(tags):
+    amount = tags.get('TRNAMT', '')
+    # Списания в выписке отрицательные; поступление даст ошибку суммы
+    amount = amount[1:] if amount.startswith('-') else f'-{amount}' if amount else ''
+    posted = tags.get('DTPOSTED', '')[:8]
+    try:
+        next_billing_date = _add_month(datetime.strptime(posted, '%Y%m%d').date()).isoformat()
+    except ValueError:
+        next_billing_date = posted
+    return {
+        'name': tags.get('NAME') or tags.get('MEMO', ''),
+        'amount': amount,
+        'interval': 'monthly',
+        'next_billing_date': next_billing_date,
+    }
+
+
+def read_ofx(stream, encoding='utf-8', chunk_size=64 * 1024):
+    """
+    Транзакции списания OFX файла (SGML OFX 1.x и XML OFX 2.x).
+
+    Файл читается кусками по chunk_size символов; переносы строк не
+    нужны, незакрытый тег переносится в следующий кусок.
+
+    Yields:
+        tuple: (номер транзакции, словарь колонок CSV_COLUMNS)
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding)
+    buffer, record, number, seen_ofx = '', None, 0, False
+    while True:
+        chunk = text.read(chunk_size)
+        buffer += chunk
+        if chunk:
+            cut = buffer.rfind('<')
+            if cut <= 0:
+                if len(buffer) > _OFX_MAX_TOKEN:
+                    raise ImportFormatError('Не OFX файл')
+                continue
+            data, buffer = buffer[:cut], buffer[cut:]
+        else:
+            data, buffer = buffer, ''
+
+        for closing, tag, value in _OFX_TAG.findall(data):
+            tag = tag.upper()
+            if tag == 'OFX':
+                seen_ofx = True
+            elif tag == 'STMTTRN':
+                if record is not None:
+                    number += 1
+                    yield number, _ofx_record(record)
+                record = None if closing else {}
+            elif record is not None and not closing and value.strip():
+                record[tag] = value.strip()
+        if not chunk:
+            break
+    if not seen_ofx:
+        raise ImportFormatError('Не OFX файл')
+
+
+def validate_row(record):
+    """
+    Проверить запись правилами создания подписки.
+
+    Returns:
+        tuple: (значения для вставки или None, список ошибок)
+    """
+    errors = []
+
+    name = (record.get('name') or '').strip()
+    if not name:
+        errors.append('Название подписки обязательно')
+    elif len(name) > 200:
+        errors.append('Название подписки слишком длинное (максимум 200 символов)')
+
+    amount = (record.get('amount') or '').strip().replace(' ', '').replace(',', '.')
+    if not amount:
+        errors.append('Сумма обязательна')
+    else:
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            errors.append('Некорректная сумма')
+        else:
+            if not amount.is_finite() or amount <= 0:
+                errors.append('Сумма должна быть положительным числом')
+            elif amount > MAX_AMOUNT:
+                errors.append('Слишком большая сумма')
+            else:
+                amount = amount.quantize(Decimal('0.01'))
+
+    interval = (record.get('interval') or '').strip().lower()
+    if not validate_subscription_interval(interval):
+        errors.append("Интервал должен быть 'monthly' или 'yearly'")
+
+    is_valid_date, next_billing_date = validate_date((record.get('next_billing_date') or '').strip())
+    if not is_valid_date:
+        errors.append('Некорректная дата следующего списания (формат: YYYY-MM-DD)')
+
+    if errors:
+        return None, errors
+    return {
+        'name': name,
+        'amount': amount,
+        'interval': interval,
+        'next_billing_date': next_billing_date,
+    }, []
+
+
+def _copy_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in _COPY_COLUMNS])
+    buffer.seek(0)
+    raw = db.session.connection().connection.driver_connection
+    with raw.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY subscriptions ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def _load_chunk(user_id, rows, audit):
+    """
+    Вставить пачку проверенных строк; номера изменений - одним UPDATE.
+
+    Записи аудита (по одной 'import' на подписку) копируются из
+    вставленных строк одним INSERT ... SELECT в той же транзакции.
+    """
+    last_seq = next_change_seq(user_id, len(rows))
+    first_seq = last_seq - len(rows) + 1
+    now = datetime.utcnow()
+    for change_seq, row in enumerate(rows, first_seq):
+        row.update(user_id=user_id, is_active=True, created_at=now, updated_at=now,
+                   version=1, change_seq=change_seq)
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        _copy_rows(rows)
+    else:
+        db.session.execute(Subscription.__table__.insert(), rows)
+
+    inserted_rows = (
+        db.select(Subscription.id)
+        .where(Subscription.user_id == user_id)
+        .where(Subscription.change_seq.between(first_seq, last_seq))
+    )
+    db.session.execute(
+        db.insert(AuditLog).from_select(
+            ['user_id', 'action', 'entity_type', 'entity_id', 'timestamp', 'ip_address', 'user_agent'],
+            inserted_rows.with_only_columns(
+                Subscription.user_id, db.literal('import'), db.literal('subscription'),
+                Subscription.id, db.literal(now), db.literal(audit['ip_address'], db.String),
+                db.literal(audit['user_agent'], db.String),
+            ),
+        )
+    )
+
+    if current_app.config['OUTBOX_ENDPOINTS']:
+        # Снимки строк вне сессии: карта идентичности не растёт с файлом
+        inserted = db.session.execute(
+            db.select(*Subscription.__table__.columns)
+            .where(Subscription.user_id == user_id)
+            .where(Subscription.change_seq.between(first_seq, last_seq))
+        ).mappings()
+        outbox.enqueue_many('subscription.created', [Subscription(**row) for row in inserted])
+    return first_seq, last_seq
+
+
+def validate_statement(records):
+    """
+    Проверить записи выписки и сложить годные строки во временный файл.
+
+    Выполняется в потоке запроса до записи в БД: файл дочитывается из
+    сокета клиента здесь, а не внутри транзакции.
+
+    Args:
+        records: Итератор (номер, запись) из read_csv() или read_ofx()
+
+    Returns:
+        tuple: (итог для load_statement(): imported=0, failed, errors (до
+        IMPORT_MAX_ERRORS пар {"row": номер, "errors": [...]}),
+        errors_truncated, first_change_seq/last_change_seq=None;
+        временный файл строк, который закрывает вызывающий)
+    """
+    config = current_app.config
+    max_errors = config['IMPORT_MAX_ERRORS']
+    result = {
+        'imported': 0, 'failed': 0, 'errors': [], 'errors_truncated': False,
+        'first_change_seq': None, 'last_change_seq': None,
+    }
+    spool = tempfile.SpooledTemporaryFile(
+        config['IMPORT_SPOOL_MEMORY'], mode='w+', encoding='utf-8', newline=''
+    )
+    writer = csv.writer(spool)
+    try:
+        for number, record in records:
+            values, errors = validate_row(record)
+            if values is not None:
+                writer.writerow([values['name'], values['amount'], values['interval'],
+                                 values['next_billing_date'].isoformat()])
+                continue
+            result['failed'] += 1
+            if len(result['errors']) < max_errors:
+                result['errors'].append({'row': number, 'errors': errors})
+            else:
+                result['errors_truncated'] = True
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return result, spool
+
+
+def _spooled_chunks(spool, chunk_size):
+    reader = csv.reader(spool)
+    while True:
+        chunk = list(itertools.islice(reader, chunk_size))
+        if not chunk:
+            break
+        yield [
+            {'name': name, 'amount': Decimal(amount), 'interval': interval,
+             'next_billing_date': date.fromisoformat(next_billing_date)}
+            for name, amount, interval, next_billing_date in chunk
+        ]
+
+
+def _count_loaded(result, count, first_seq, last_seq):
+    result['imported'] += count
+    result['first_change_seq'] = result['first_change_seq'] or first_seq
+    result['last_change_seq'] = last_seq
+
+
+def load_statement(user_id, spool, result, request_obj=None):
+    """
+    Загрузить строки из validate_statement() пачками по IMPORT_CHUNK_SIZE.
+
+    result обновляется по мере фиксации: imported и диапазон номеров
+    изменений first_change_seq/last_change_seq относятся только к
+    зафиксированным пачкам, в том числе если загрузка прервалась ошибкой
+    (с писателем SQLite пачки до ошибки остаются в БД).
+
+    Args:
+        spool: Временный файл строк из validate_statement()
+        result: Итог из validate_statement()
+        request_obj: Объект Flask request для IP и User-Agent записей аудита
+    """
+    audit = {'ip_address': None, 'user_agent': None}
+    if request_obj is not None:
+        audit = {
+            'ip_address': request_obj.remote_addr,
+            'user_agent': request_obj.headers.get('User-Agent', '')[:255],
+        }
+    pending = []
+    for rows in _spooled_chunks(spool, current_app.config['IMPORT_CHUNK_SIZE']):
+        if sqlite_writer.enabled:
+            # Каждая пачка - своё задание писателя со своим COMMIT
+            _count_loaded(result, len(rows), *sqlite_writer.run(_load_chunk, user_id, rows, audit))
+        else:
+            pending.append((len(rows), *_load_chunk(user_id, rows, audit)))
+    if pending:
+        db.session.commit()
+        for loaded in pending:
+            _count_loaded(result, *loaded)
@@ -0,0 +1,174 @@
+"""
+Delta-синхронизация подписок.
+
+У каждого пользователя есть счётчик изменений users.change_seq. Любая
+запись подписки в той же транзакции увеличивает счётчик (блокируя строку
+пользователя, что упорядочивает конкурентные записи) и сохраняет новое
+значение в subscriptions.change_seq, а удаление оставляет надгробие.
+Клиент передаёт последний полученный токен и получает только то, что
+изменилось после него, поэтому стоимость синхронизации зависит от числа
+изменений, а не от размера коллекции.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.models import db, Subscription, SubscriptionTombstone, User
+
+
+class StaleSyncToken(Exception):
+    """Токен старше удалённых надгробий: нужна полная пересинхронизация."""
+
+
+def next_change_seq(user_id, count=1):
+    """
+    Увеличить счётчик изменений пользователя в текущей транзакции.
+
+    Args:
+        count: Сколько номеров занять (пакетная загрузка получает
+            номера с (результат - count + 1) по результат)
+
+    Returns:
+        int: Новое значение счётчика
+    """
+    return db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(change_seq=User.change_seq + count)
+        .returning(User.change_seq)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def add_tombstone(user_id, subscription_id, change_seq):
+    """Записать надгробие удалённой подписки в текущей транзакции."""
+    db.session.execute(db.insert(SubscriptionTombstone).values(
+        user_id=user_id,
+        subscription_id=subscription_id,
+        change_seq=change_seq,
+        deleted_at=datetime.utcnow(),
+    ))
+
+
+def parse_token(token):
+    """
+    Разобрать токен синхронизации.
+
+    Returns:
+        int или None: Номер изменения или None, если токен некорректен
+    """
+    if token in (None, ''):
+        return 0
+    try:
+        value = int(token)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def get_changes(user_id, since, limit=500):
+    """
+    Изменения подписок пользователя после номера since.
+
+    Изменённые строки и надгробия сливаются в порядке change_seq, поэтому
+    постраничная выдача не теряет и не переставляет события.
+
+    Returns:
+        dict: changed (список Subscription), deleted (список id),
+        events (пары (change_seq, Subscription или id) по порядку),
+        next (номер для следующего запроса) и has_more
+
+    Raises:
+        StaleSyncToken: если since старше удалённых надгробий
+    """
+    # Счётчик читается до строк: всё, что закоммитят позже, придёт в
+    # следующем запросе
+    current_seq, floor_seq = db.session.execute(
+        db.select(User.change_seq, User.sync_floor_seq).where(User.id == user_id)
+    ).one()
+    if 0 < since < floor_seq:
+        raise StaleSyncToken()
+
+    query = db.select(Subscription).where(Subscription.user_id == user_id)
+    if since > 0:
+        query = query.where(Subscription.change_seq > since)
+    # Полный снимок (since = 0) включает и строки без номера изменения
+    # (change_seq = 0, БД до обновления схемы)
+    changed = db.session.execute(
+        query.order_by(Subscription.change_seq).limit(limit + 1)
+    ).scalars().all()
+
+    deleted = []
+    if since > 0:
+        deleted = db.session.execute(
+            db.select(SubscriptionTombstone.subscription_id, SubscriptionTombstone.change_seq)
+            .where(SubscriptionTombstone.user_id == user_id)
+            .where(SubscriptionTombstone.change_seq > since)
+            .order_by(SubscriptionTombstone.change_seq)
+            .limit(limit + 1)
+        ).all()
+
+    events = sorted(
+        [(sub.change_seq, sub) for sub in changed] +
+        [(seq, subscription_id) for subscription_id, seq in deleted],
+        key=lambda event: event[0],
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    if has_more:
+        next_seq = events[-1][0]
+    else:
+        next_seq = max([current_seq, since] + [seq for seq, _ in events])
+
+    return {
+        'changed': [item for _, item in events if isinstance(item, Subscription)],
+        'deleted': [item for _, item in events if not isinstance(item, Subscription)],
+        'events': events,
+        'next': next_seq,
+        'has_more': has_more,
+    }
+
+
+def current_change_seq(user_id):
+    """Текущее значение счётчика изменений пользователя."""
+    return db.session.execute(
+        db.select(User.change_seq).where(User.id == user_id)
+    ).scalar_one()
+
+
+def compact_tombstones(retention_days=30, now=None):
+    """
+    Удалить надгробия старше срока хранения.
+
+    Для затронутых пользователей поднимается sync_floor_seq, и клиенты с
+    более старыми токенами получат требование полной пересинхронизации.
+
+    Returns:
+        int: Число удалённых надгробий
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    expired = (
+        db.select(
+            SubscriptionTombstone.user_id,
+            func.max(SubscriptionTombstone.change_seq).label('floor_seq'),
+        )
+        .where(SubscriptionTombstone.deleted_at < cutoff)
+        .group_by(SubscriptionTombstone.user_id)
+    )
+
+    for user_id, floor_seq in db.session.execute(expired).all():
+        db.session.execute(
+            db.update(User)
+            .where(User.id == user_id)
+            .where(User.sync_floor_seq < floor_seq)
+            .values(sync_floor_seq=floor_seq)
+            .execution_options(synchronize_session=False)
+        )
+    removed = db.session.execute(
+        db.delete(SubscriptionTombstone)
+        .where(SubscriptionTombstone.deleted_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return removed
@@ -1,38 +1,169 @@
 // API базовый URL
 const API_BASE = '/api';
 
+// Подписки, отображаемые в таблице: id -> подписка
+const subscriptionsById = new Map();
+
+// Лента изменений (server-sent events)
+let changeFeed = null;
+// Id последнего события - токен синхронизации для переподключения
+let lastEventId = null;
+// Пауза перед новым подключением, если сервер отказал в ленте (мс)
+const FEED_RETRY_MIN = 5000;
+const FEED_RETRY_MAX = 300000;
+let feedRetryDelay = FEED_RETRY_MIN;
+// Пока ленты нет, список догоняется опросом /changes (мс)
+const POLL_INTERVAL = 30000;
+let pollTimer = null;
+
 // Загрузка подписок при загрузке страницы
 document.addEventListener('DOMContentLoaded', function() {
     if (document.getElementById('subscriptionsTableBody')) {
-        loadSubscriptions();
+        loadSubscriptions().then(connectChangeFeed);
     }
 });
 
-// Загрузка списка подписок
+// Загрузка списка подписок: снимок /changes вместе с токеном, от
+// которого лента продолжает без пропусков
 async function loadSubscriptions() {
     const tbody = document.getElementById('subscriptionsTableBody');
     if (!tbody) return;
 
     try {
-        const response = await fetch(`${API_BASE}/subscriptions`);
-        
-        if (!response.ok) {
-            if (response.status === 401) {
-                window.location.href = '/login';
-                return;
-            }
-            throw new Error('Ошибка загрузки подписок');
-        }
-
-        const data = await response.json();
-        displaySubscriptions(data.subscriptions);
+        const loaded = new Map();
+        const token = await fetchChanges('', sub => {
+            if (sub.is_active) loaded.set(sub.id, sub);
+            else loaded.delete(sub.id);
+        });
+        subscriptionsById.clear();
+        loaded.forEach((sub, id) => subscriptionsById.set(id, sub));
+        lastEventId = token;
+        renderSubscriptions();
     } catch (error) {
+        if (error.status === 401) {
+            window.location.href = '/login';
+            return;
+        }
         console.error('Ошибка:', error);
         tbody.innerHTML = '<tr><td colspan="5" class="loading">Ошибка загрузки данных</td></tr>';
         showError('Не удалось загрузить подписки');
     }
 }
 
+// Изменения после токена since ('' - полный снимок) постранично;
+// удаления передаются в apply как неактивные подписки. Возвращает токен
+async function fetchChanges(since, apply) {
+    let token = since;
+    for (;;) {
+        const query = `since=${encodeURIComponent(token)}&limit=1000`;
+        const response = await fetch(`${API_BASE}/subscriptions/changes?${query}`);
+        if (!response.ok) {
+            const error = new Error('Ошибка загрузки изменений');
+            error.status = response.status;
+            throw error;
+        }
+        const data = await response.json();
+        data.changed.forEach(apply);
+        data.deleted.forEach(id => apply({ id, is_active: false }));
+        token = data.next;
+        if (!data.has_more) return token;
+    }
+}
+
+// Применить изменение подписки к списку в памяти
+function applySubscription(sub) {
+    if (sub.is_active) {
+        const known = subscriptionsById.get(sub.id);
+        // События могут прийти позже ответа на собственный запрос
+        if (known && known.version > sub.version) return;
+        subscriptionsById.set(sub.id, sub);
+    } else {
+        subscriptionsById.delete(sub.id);
+    }
+    renderSubscriptions();
+}
+
+function removeSubscription(id) {
+    subscriptionsById.delete(id);
+    renderSubscriptions();
+}
+
+// Подписка на ленту изменений: другие вкладки и устройства
+function connectChangeFeed() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    if (changeFeed) return;
+
+    const query = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : '';
+    changeFeed = new EventSource(`${API_BASE}/subscriptions/events${query}`);
+    const tracked = handler => event => {
+        lastEventId = event.lastEventId || lastEventId;
+        handler(JSON.parse(event.data));
+    };
+    changeFeed.addEventListener('upsert', tracked(applySubscription));
+    changeFeed.addEventListener('delete', tracked(data => removeSubscription(data.id)));
+    changeFeed.addEventListener('open', () => {
+        feedRetryDelay = FEED_RETRY_MIN;
+        stopPolling();
+    });
+    changeFeed.addEventListener('resync', () => {
+        // Токен устарел: перезагружаем список и открываем поток заново
+        changeFeed.close();
+        changeFeed = null;
+        lastEventId = null;
+        loadSubscriptions().then(connectChangeFeed);
+    });
+    changeFeed.addEventListener('error', () => {
+        // Ответ не 200 (503 - в воркере заняты все места под ленты):
+        // браузер сам не переподключается. До следующей попытки с растущей
+        // паузой список догоняется опросом /changes
+        if (changeFeed.readyState !== EventSource.CLOSED) return;
+        changeFeed = null;
+        startPolling();
+        const delay = feedRetryDelay * (0.5 + Math.random());
+        feedRetryDelay = Math.min(feedRetryDelay * 2, FEED_RETRY_MAX);
+        setTimeout(connectChangeFeed, delay);
+    });
+}
+
+function startPolling() {
+    if (pollTimer === null) pollTimer = setInterval(pollChanges, POLL_INTERVAL);
+}
+
+function stopPolling() {
+    if (pollTimer === null) return;
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+// Один опрос: изменения после последнего токена
+async function pollChanges() {
+    if (!lastEventId) {
+        await loadSubscriptions();
+        return;
+    }
+    try {
+        lastEventId = await fetchChanges(lastEventId, applySubscription);
+    } catch (error) {
+        if (error.status === 410) {
+            // Токен устарел: нужен полный снимок
+            lastEventId = null;
+            await loadSubscriptions();
+        } else {
+            console.error('Ошибка:', error);
+        }
+    }
+}
+
+// Отрисовка подписок из памяти
+function renderSubscriptions() {
+    const subscriptions = Array.from(subscriptionsById.values())
+        .sort((a, b) => a.id - b.id);
+    displaySubscriptions(subscriptions);
+}
+
 // Отображение подписок в таблице
 function displaySubscriptions(subscriptions) {
     const tbody = document.getElementById('subscriptionsTableBody');
@@ -179,7 +310,7 @@ async function handleSubscriptionSubmit(e) {
         }
 
         hideModal();
-        loadSubscriptions();
+        applySubscription(data);
         showSuccess(isEdit ? 'Подписка обновлена' : 'Подписка добавлена');
     } catch (error) {
         console.error('Ошибка:', error);
@@ -203,7 +334,7 @@ async function deleteSubscription(id) {
             throw new Error(data.error || 'Ошибка при удалении подписки');
         }
 
-        loadSubscriptions();
+        removeSubscription(id);
         showSuccess('Подписка удалена');
     } catch (error) {
         console.error('Ошибка:', error);
@@ -0,0 +1,84 @@
+"""
+JSON провайдер Flask на orjson.
+
+Decimal, date и datetime сериализуются напрямую, без преобразования
+каждого поля в to_dict(). Вывод побайтно совпадает со стандартным
+провайдером Flask (ensure_ascii, sort_keys, компактные разделители):
+Decimal - как float, даты - в ISO 8601, символы вне ASCII - escape
+последовательностями \\uXXXX. Совпадение float проверено для денежных
+сумм и долей; числа, которые repr() пишет в экспоненциальной форме
+(1e-05, 1e+16), orjson записывает иначе. Без orjson используется
+стандартный json с теми же правилами.
+"""
+import decimal
+import json
+import re
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость: стандартный json
+    orjson = None
+
+# orjson сам экранирует управляющие символы, кавычку и обратную косую черту;
+# json.dumps(ensure_ascii=True) дополнительно экранирует всё начиная с DEL.
+# Отрицание короткого диапазона компилируется в десятки раз быстрее
+# диапазона до U+10FFFF (~5 мс при импорте)
+_NON_ASCII = re.compile('[^\x00-\x7e]')
+
+
+def _escape_char(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    code -= 0x10000
+    return f'\\u{0xd800 | (code >> 10):04x}\\u{0xdc00 | (code & 0x3ff):04x}'
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+def _stdlib_dumps(obj, **kwargs):
+    kwargs.setdefault('default', _default)
+    kwargs.setdefault('ensure_ascii', True)
+    kwargs.setdefault('sort_keys', True)
+    return json.dumps(obj, **kwargs)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON провайдер приложения: orjson с побайтной совместимостью."""
+
+    default = staticmethod(_default)
+
+    def dumps_bytes(self, obj):
+        """Компактный JSON в байтах (ASCII), как у стандартного провайдера."""
+        if orjson is not None:
+            try:
+                data = orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS)
+            except TypeError:
+                # Не-строковые ключи, целые больше 64 бит и т.п.
+                pass
+            else:
+                if data.isascii():
+                    return data
+                return _NON_ASCII.sub(_escape_char, data.decode()).encode()
+        return _stdlib_dumps(obj, separators=(',', ':')).encode()
+
+    def dumps(self, obj, **kwargs):
+        # Формат app.json.dumps() у Flask - с пробелами после разделителей;
+        # компактный вывод для ответов - dumps_bytes()
+        return _stdlib_dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is None and self._app.debug:
+            # Форматированный вывод в режиме отладки - как у Flask
+            return super().response(obj)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,60 @@
+"""
+Скрипт переноса старых записей аудита в колоночные сегменты и поиска по ним.
+
+Примеры:
+    # cron, раз в сутки
+    python archive_audit_logs.py export --older-than-days 90
+
+    # расследование: записи пользователя за период (JSON по строке)
+    python archive_audit_logs.py scan --user-id 42 --since 2025-01-01 --until 2025-02-01
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+from app import create_app
+from app.services.audit_archive import AuditArchive, archive_audit_logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Холодное хранилище записей аудита')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--directory', help='каталог сегментов (по умолчанию AUDIT_ARCHIVE_DIR)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='перенести старые записи в новый сегмент')
+    export.add_argument('--older-than-days', type=int)
+    export.add_argument('--chunk-size', type=int, default=10000)
+    export.add_argument('--pause', type=float, default=0.05,
+                        help='Пауза между пачками удаления, сек')
+
+    scan = commands.add_parser('scan', help='найти записи в сегментах')
+    scan.add_argument('--user-id', type=int)
+    scan.add_argument('--since', type=datetime.fromisoformat)
+    scan.add_argument('--until', type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
+    directory = args.directory or app.config['AUDIT_ARCHIVE_DIR']
+
+    if args.command == 'scan':
+        for record in AuditArchive(directory).scan(args.user_id, args.since, args.until):
+            print(json.dumps(record, default=str, ensure_ascii=False))
+        return
+
+    with app.app_context():
+        result = archive_audit_logs(
+            directory,
+            older_than_days=args.older_than_days or app.config['AUDIT_ARCHIVE_AFTER_DAYS'],
+            block_rows=app.config['AUDIT_ARCHIVE_BLOCK_ROWS'],
+            chunk_size=args.chunk_size,
+            pause=args.pause,
+        )
+    print(f"Выгружено: {result['rows']}, удалено из таблицы: {result['deleted']}")
+    if result['path'] is not None:
+        print(f"Сегмент: {result['path']} ({result['bytes'] / 2**20:.1f} МБ)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Скрипт переноса неактивных подписок в архив.
+
+Пример (cron, раз в сутки):
+    python archive_subscriptions.py --older-than-days 90 --chunk-size 1000
+"""
+import argparse
+import os
+
+from app import create_app
+from app.services.archive import archive_inactive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перенос неактивных подписок в архив')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--older-than-days', type=int, default=90)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.05,
+                        help='Пауза между пачками, сек')
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
+    with app.app_context():
+        moved = archive_inactive(args.older_than_days, args.chunk_size, args.pause)
+    print(f"Перенесено в архив: {moved}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Горячая таблица подписок до и после переноса неактивных строк в архив.
+
+Создаёт 100 000 подписок, 70% из которых давно неактивны, и сравнивает
+размер таблицы subscriptions с индексами и задержку списка подписок
+(GET /api/subscriptions) до и после archive_inactive().
+
+Запуск:
+    python -m benchmarks.bench_archive
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import create_app
+from app.models import db, Subscription
+from app.services.archive import archive_inactive
+from benchmarks.common import format_timing, seed_user, timeit
+
+TOTAL = 100_000
+LIST_USER_SUBSCRIPTIONS = 1_000
+
+
+def hot_table_size():
+    """Размер subscriptions и её индексов в байтах: (таблица, индексы)."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.session.execute(text(
+            "SELECT pg_relation_size('subscriptions'), pg_indexes_size('subscriptions')"
+        )).one()
+    rows = db.session.execute(text(
+        "SELECT d.name, sum(d.pgsize) FROM dbstat d "
+        "JOIN sqlite_master m ON m.name = d.name "
+        "WHERE m.tbl_name = 'subscriptions' GROUP BY d.name"
+    )).all()
+    table = sum(size for name, size in rows if name == 'subscriptions')
+    return table, sum(size for name, size in rows if name != 'subscriptions')
+
+
+def list_latency(client):
+    return timeit(lambda: client.get('/api/subscriptions'), repeat=100)
+
+
+def report(label, client):
+    with client.application.app_context():
+        rows = db.session.query(Subscription).count()
+        table, indexes = hot_table_size()
+    timing = list_latency(client)
+    print(f"{label:<6} {rows:>7} строк, таблица {table / 1024:,.0f} КБ, индексы {indexes / 1024:,.0f} КБ")
+    print(f"       список: {format_timing(timing)}")
+
+
+def main():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed_user('bulk', TOTAL - LIST_USER_SUBSCRIPTIONS)
+        user_id = seed_user('target', LIST_USER_SUBSCRIPTIONS, seed=7)
+        db.session.execute(
+            db.update(Subscription)
+            .where(Subscription.id % 10 < 7)
+            .values(is_active=False, updated_at=datetime.utcnow() - timedelta(days=365))
+        )
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+    report('До:', client)
+
+    with app.app_context():
+        started = time.perf_counter()
+        moved = archive_inactive(older_than_days=90, chunk_size=1000)
+        elapsed = time.perf_counter() - started
+        print(f"Перенесено {moved} строк за {elapsed:.2f} с ({moved / elapsed:,.0f} строк/с, пачки по 1000)")
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite не возвращает освобождённые страницы без VACUUM
+            db.session.remove()
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('VACUUM')
+
+    report('После:', client)
+
+
+if __name__ == '__main__':
+    main()
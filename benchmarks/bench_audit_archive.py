@@ -0,0 +1,127 @@
+"""
+Холодное хранилище аудита: размер и скорость поиска против живой таблицы.
+
+Файловая SQLite заполняется --rows записями аудита --users пользователей за
+год. Сравниваются:
+
+- размер: таблица audit_logs с индексами (dbstat) и сегменты после
+  выгрузки;
+- поиск записей пользователя за 30 дней (индекс по user_id против блоков
+  сегмента) и всех записей за один день (индекс по timestamp против
+  полного просмотра оглавления и колонок времени).
+
+Запуск:
+    python -m benchmarks.bench_audit_archive --rows 1000000 --users 10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from app.models import db, AuditLog
+from app.services.audit_archive import AuditArchive, archive_audit_logs
+from benchmarks.common import format_timing, timeit
+from config import TestingConfig
+
+_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'okhttp/4.12.0',
+)
+
+
+def seed(rows, users, now, seed=42):
+    rng = random.Random(seed)
+    ips = [f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}' for _ in range(users)]
+    batch = []
+    for i in range(rows):
+        user = rng.randrange(users)
+        batch.append({
+            'user_id': user + 1,
+            'action': rng.choices(('create', 'update', 'delete', 'restore'), (5, 10, 3, 1))[0],
+            'entity_type': 'subscription',
+            'entity_id': rng.randint(1, rows),
+            'timestamp': now - timedelta(days=91, seconds=rng.randint(0, 365 * 86400)),
+            'ip_address': ips[user],
+            'user_agent': _AGENTS[user % len(_AGENTS)],
+        })
+        if len(batch) == 10_000:
+            db.session.execute(db.insert(AuditLog), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(AuditLog), batch)
+    db.session.commit()
+
+
+def table_size():
+    return db.session.execute(db.text(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+        "(SELECT name FROM sqlite_schema WHERE tbl_name = 'audit_logs')"
+    )).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Колоночный архив аудита против таблицы')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--block-rows', type=int, default=4096)
+    args = parser.parse_args()
+
+    now = datetime(2026, 6, 1)
+    user_id = 42
+    start, end = now - timedelta(days=200), now - timedelta(days=170)
+    day_start, day_end = now - timedelta(days=150), now - timedelta(days=149)
+
+    with tempfile.TemporaryDirectory() as directory:
+        TestingConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        app = create_app('testing', blueprints=())
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.rows, args.users, now)
+            print(f"{args.rows:,} записей, {args.users:,} пользователей: "
+                  f"заполнение {time.perf_counter() - started:.1f} с")
+
+            live_bytes = table_size()
+            table = AuditLog.__table__
+            by_user = (
+                db.select(table).where(table.c.user_id == user_id)
+                .where(table.c.timestamp >= start).where(table.c.timestamp < end)
+            )
+            by_day = db.select(table).where(table.c.timestamp >= day_start).where(table.c.timestamp < day_end)
+            user_rows = len(db.session.execute(by_user).all())
+            day_rows = len(db.session.execute(by_day).all())
+            live_user = timeit(lambda: db.session.execute(by_user).mappings().all(), repeat=50)
+            live_day = timeit(lambda: db.session.execute(by_day).mappings().all(), repeat=10)
+
+            started = time.perf_counter()
+            result = archive_audit_logs(os.path.join(directory, 'segments'), older_than_days=90,
+                                        block_rows=args.block_rows, now=now)
+            export_seconds = time.perf_counter() - started
+            db.engine.dispose()
+
+        archive = AuditArchive(os.path.join(directory, 'segments'))
+        assert len(list(archive.scan(user_id, start, end))) == user_rows
+        assert len(list(archive.scan(start=day_start, end=day_end))) == day_rows
+        cold_user = timeit(lambda: list(archive.scan(user_id, start, end)), repeat=50)
+        cold_day = timeit(lambda: list(archive.scan(start=day_start, end=day_end)), repeat=10)
+        archive.close()
+
+    print(f"  выгрузка: {export_seconds:.1f} с ({result['rows'] / export_seconds:,.0f} строк/с), "
+          f"удалено {result['deleted']:,}")
+    print(f"  размер: таблица с индексами {live_bytes / 2**20:.1f} МБ, "
+          f"сегменты {result['bytes'] / 2**20:.1f} МБ (в {live_bytes / result['bytes']:.1f} раза меньше)")
+    print(f"  пользователь за 30 дней ({user_rows} строк):")
+    print(f"    таблица   {format_timing(live_user)}")
+    print(f"    сегменты  {format_timing(cold_user)}")
+    print(f"  все пользователи за день ({day_rows} строк):")
+    print(f"    таблица   {format_timing(live_day)}")
+    print(f"    сегменты  {format_timing(cold_day)}")
+
+
+if __name__ == '__main__':
+    main()
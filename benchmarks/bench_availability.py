@@ -0,0 +1,90 @@
+"""
+Фильтры Блума для проверки занятости имени и email.
+
+1. Построение фильтров для --users синтетических пользователей (по
+   умолчанию 10M, без БД): время, память, фактическая доля ложных
+   срабатываний и время проверки.
+2. GET /availability на SQLite с --db-users пользователями: свободное
+   значение (ответ из фильтра) и занятое (фильтр + запрос по индексу)
+   против двух запросов User, которые делает регистрация.
+
+Запуск:
+    python -m benchmarks.bench_availability --users 10000000
+"""
+import argparse
+import resource
+import time
+
+from app import create_app
+from app.models import db, User
+from app.services.availability import BloomFilter
+from benchmarks.common import format_timing, timeit
+
+
+def bench_build(users, error_rate):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    usernames = BloomFilter(users, error_rate)
+    emails = BloomFilter(users, error_rate)
+    # Пачками, как при чтении из БД (yield_per)
+    for start in range(0, users, 10_000):
+        batch = range(start, min(start + 10_000, users))
+        usernames.update([f'user{i}' for i in batch])
+        emails.update([f'user{i}@example.com' for i in batch])
+    elapsed = time.perf_counter() - started
+    # Пиковый RSS процесса (КБ в Linux): кроме битовых массивов, ничего не копится
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+
+    probes = 1_000_000
+    started = time.perf_counter()
+    false_positives = sum(f'free{i}' in usernames for i in range(probes))
+    lookup = (time.perf_counter() - started) / probes
+
+    print(f"{users:,} пользователей, целевая доля ложных срабатываний {error_rate:.1%}")
+    print(f"  построение: {elapsed:.1f} с ({users / elapsed:,.0f} пользователей/с)")
+    print(f"  память: {(usernames.memory_usage + emails.memory_usage) / 2**20:.1f} МБ "
+          f"(рост пикового RSS {rss_growth / 2**20:.1f} МБ), хешей на значение {usernames.hashes}")
+    print(f"  ложные срабатывания: {false_positives / probes:.2%}, "
+          f"проверка {lookup * 1e6:.2f} мкс")
+
+
+def bench_endpoint(db_users):
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+            for i in range(db_users)
+        ])
+        db.session.commit()
+        elapsed = app.extensions['availability_index'].build()
+    print(f"\nSQLite, {db_users:,} пользователей: построение из БД {elapsed:.2f} с")
+
+    client = app.test_client()
+
+    def db_checks(username, email):
+        with app.app_context():
+            User.query.filter_by(username=username).first()
+            User.query.filter_by(email=email).first()
+
+    print(f"  /availability, свободно: "
+          f"{format_timing(timeit(lambda: client.get('/availability?username=free&email=free@example.com')))}")
+    print(f"  /availability, занято:   "
+          f"{format_timing(timeit(lambda: client.get('/availability?username=user7&email=user7@example.com')))}")
+    print(f"  два запроса User:         "
+          f"{format_timing(timeit(lambda: db_checks('free', 'free@example.com')))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Фильтры Блума для /availability')
+    parser.add_argument('--users', type=int, default=10_000_000)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--db-users', type=int, default=100_000)
+    args = parser.parse_args()
+
+    bench_build(args.users, args.error_rate)
+    bench_endpoint(args.db_users)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Пропускная способность списка подписок с ?fields= и без.
+
+Сравнивает полный ответ GET /api/subscriptions (все колонки, ORM объекты,
+to_dict) с запросом только id, name, amount и next_billing_date
+(SELECT нужных колонок, строки без ORM) на разных размерах списка.
+
+Запуск:
+    python -m benchmarks.bench_fields
+"""
+from app import create_app
+from app.models import db
+from benchmarks.common import DATASET_SIZES, format_timing, seed_user, timeit
+
+SPARSE = 'id,name,amount,next_billing_date'
+
+
+def main():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        users = {n: seed_user(f'user{n}', n) for n in DATASET_SIZES}
+
+    for n, user_id in users.items():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+        repeat = max(3, 200_000 // n)
+        rows = len(client.get('/api/subscriptions').get_json()['subscriptions'])
+
+        full = timeit(lambda: client.get('/api/subscriptions'), repeat=repeat)
+        sparse = timeit(lambda: client.get(f'/api/subscriptions?fields={SPARSE}'), repeat=repeat)
+        full_size = len(client.get('/api/subscriptions').get_data())
+        sparse_size = len(client.get(f'/api/subscriptions?fields={SPARSE}').get_data())
+
+        print(f"{rows} строк:")
+        print(f"  все поля:     {format_timing(full)}, {rows / full['p50'] * 1000:,.0f} строк/с, "
+              f"{full_size / 1024:,.0f} КБ")
+        print(f"  ?fields=...:  {format_timing(sparse)}, {rows / sparse['p50'] * 1000:,.0f} строк/с, "
+              f"{sparse_size / 1024:,.0f} КБ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Форматы и сжатие списков на 10 000 строк.
+
+Для списка подписок и записей аудита измеряет время кодирования и размер
+ответа в каждом формате (JSON строками, колоночный JSON, MessagePack
+строками и колонками, если установлен msgpack), без сжатия и со сжатием
+gzip/brotli (если установлен) с настройками из конфигурации.
+
+Запуск:
+    python -m benchmarks.bench_formats
+"""
+import gzip
+import random
+
+from app import create_app
+from app.services import formats
+from app.services.queries import AUDIT_LOG_FIELDS, SUBSCRIPTION_FIELDS
+from benchmarks.bench_json import make_audit_logs, make_subscriptions
+from benchmarks.common import timeit
+
+ROWS = 10_000
+
+
+def bench(app, key, items, fields):
+    rows = [item.to_dict() for item in items]
+    config = app.config
+    compressors = [('gzip', lambda data: gzip.compress(
+        data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0))]
+    if formats.brotli is not None:
+        compressors.append(('br', lambda data: formats.brotli.compress(
+            data, quality=config['COMPRESS_BROTLI_QUALITY'])))
+
+    print(f"{key}, {ROWS} строк:")
+    for mimetype in formats.available_formats():
+        headers = {'Accept': mimetype}
+        with app.test_request_context(headers=headers):
+            encode = lambda: formats.list_response(key, rows, fields).get_data()
+            timing = timeit(encode, repeat=20)
+            data = encode()
+        line = f"  {mimetype:<48} {len(data) / 1024:>8,.0f} КБ, {timing['p50']:>7.1f} мс"
+        for name, compress in compressors:
+            ctiming = timeit(lambda: compress(data), repeat=5)
+            line += f" | {name}: {len(compress(data)) / 1024:>6,.0f} КБ, +{ctiming['p50']:.1f} мс"
+        print(line)
+
+
+def main():
+    app = create_app('testing')
+    rng = random.Random(1)
+    bench(app, 'subscriptions', make_subscriptions(ROWS, rng), SUBSCRIPTION_FIELDS)
+    bench(app, 'audit_logs', make_audit_logs(ROWS), AUDIT_LOG_FIELDS)
+    if formats.msgpack is None:
+        print('msgpack не установлен: форматы MessagePack пропущены')
+    if formats.brotli is None:
+        print('brotli не установлен: сжатие brotli пропущено')
+
+
+if __name__ == '__main__':
+    main()
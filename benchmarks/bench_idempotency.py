@@ -0,0 +1,49 @@
+"""
+Задержка запросов с Idempotency-Key.
+
+Сравнивает POST /api/subscriptions без ключа, с новым ключом (резерв и
+сохранение ответа в idempotency_keys) и повтор существующего ключа
+(ответ из таблицы без выполнения роута).
+
+Запуск:
+    python -m benchmarks.bench_idempotency
+"""
+from app import create_app
+from app.models import db, User
+from app.services.idempotency import idempotency_store
+from benchmarks.common import format_timing, timeit
+
+
+def bench_requests():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+    payload = {'name': 'Netflix', 'amount': 499, 'interval': 'monthly',
+               'next_billing_date': '2026-12-01'}
+    counter = iter(range(10**9))
+    plain = timeit(lambda: client.post('/api/subscriptions', json=payload), repeat=500)
+    first = timeit(lambda: client.post('/api/subscriptions', json=payload,
+                                       headers={'Idempotency-Key': f'k{next(counter)}'}), repeat=500)
+    replay = timeit(lambda: client.post('/api/subscriptions', json=payload,
+                                        headers={'Idempotency-Key': 'k0'}), repeat=500)
+    print(f"POST без ключа:     {format_timing(plain)}")
+    print(f"POST первый запрос: {format_timing(first)}")
+    print(f"POST повтор:        {format_timing(replay)}")
+    print(f"Статистика хранилища: {idempotency_store.stats}")
+
+
+def main():
+    bench_requests()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Импорт выписки: пропускная способность и память.
+
+1. POST /api/subscriptions/import с CSV из --rows строк (файл на диске,
+   тело читается потоком) на файловой SQLite: строк в секунду и рост
+   пикового RSS процесса. Файлы растущего размера показывают, что
+   память от размера файла не зависит.
+2. Та же загрузка построчно через POST /api/subscriptions (--baseline-rows
+   строк) - как импортировал бы клиент без пакетного эндпоинта.
+
+Запуск:
+    python -m benchmarks.bench_import --rows 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import create_app
+from app.models import db, Subscription
+from benchmarks.common import random_name, seed_user
+from config import TestingConfig
+
+
+def write_csv(path, rows, seed=42):
+    rng = random.Random(seed)
+    today = date.today()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('name,amount,interval,next_billing_date\n')
+        for i in range(rows):
+            amount = f'{rng.uniform(50, 5000):.2f}' if i % 100 else 'n/a'
+            f.write(f"{random_name(rng)},{amount},{rng.choice(('monthly', 'yearly'))},"
+                    f"{today + timedelta(days=rng.randint(0, 365))}\n")
+    return os.path.getsize(path)
+
+
+def build_client(directory):
+    TestingConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user_id = seed_user('bench', 0)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    return app, client
+
+
+def bench_import(client, path):
+    size = os.path.getsize(path)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/api/subscriptions/import', input_stream=f, content_length=size,
+                               content_type='text/csv')
+    elapsed = time.perf_counter() - started
+    # Пиковый RSS (КБ в Linux) растёт, только если импорт держит больше прежнего пика
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+    result = response.get_json()
+    rows = result['imported'] + result['failed']
+    print(f"  {rows:>9,} строк, {size / 2**20:6.1f} МБ: {elapsed:6.1f} с, "
+          f"{rows / elapsed:9,.0f} строк/с, ошибок {result['failed']:,}, "
+          f"рост пикового RSS {rss_growth / 2**20:.1f} МБ")
+
+
+def bench_per_row(client, rows, seed=42):
+    rng = random.Random(seed)
+    today = date.today()
+    started = time.perf_counter()
+    for _ in range(rows):
+        client.post('/api/subscriptions', json={
+            'name': random_name(rng), 'amount': round(rng.uniform(50, 5000), 2),
+            'interval': 'monthly',
+            'next_billing_date': (today + timedelta(days=rng.randint(0, 365))).isoformat(),
+        })
+    elapsed = time.perf_counter() - started
+    print(f"  построчно POST /api/subscriptions: {rows:,} строк, {rows / elapsed:,.0f} строк/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Импорт выписки CSV')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--baseline-rows', type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app, client = build_client(directory)
+        print('POST /api/subscriptions/import (SQLite):')
+        for rows in (args.rows // 100, args.rows // 10, args.rows):
+            path = os.path.join(directory, f'statement-{rows}.csv')
+            write_csv(path, rows)
+            bench_import(client, path)
+            os.remove(path)
+        bench_per_row(client, args.baseline_rows)
+        with app.app_context():
+            total = db.session.execute(db.select(db.func.count(Subscription.id))).scalar()
+            db.engine.dispose()
+        print(f"  всего подписок в БД: {total:,}")
+
+
+if __name__ == '__main__':
+    main()
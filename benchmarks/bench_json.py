@@ -0,0 +1,97 @@
+"""
+Сериализация больших списков подписок и записей аудита.
+
+Сравнивает прежний путь (to_dict с float()/isoformat() по полям и
+стандартный провайдер Flask) с FastJSONProvider (нативные Decimal/date в
+to_dict и orjson): время построения ответа и пик выделенной памяти
+(tracemalloc). Объекты строятся в памяти, без БД.
+
+Запуск:
+    python -m benchmarks.bench_json
+"""
+import random
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.models import AuditLog, Subscription
+from benchmarks.common import format_timing, random_name, timeit
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def legacy_subscription_dict(sub):
+    """to_dict() до перехода на нативные типы."""
+    data = sub.to_dict()
+    data['amount'] = float(sub.amount)
+    for field in ('next_billing_date', 'created_at', 'updated_at'):
+        data[field] = data[field].isoformat()
+    return data
+
+
+def legacy_audit_dict(log):
+    data = log.to_dict()
+    data['timestamp'] = log.timestamp.isoformat()
+    return data
+
+
+def make_subscriptions(n, rng):
+    now = datetime(2026, 1, 1)
+    return [
+        Subscription(
+            id=i, user_id=1, name=random_name(rng),
+            amount=Decimal(f'{rng.uniform(50, 5000):.2f}'),
+            interval='monthly', next_billing_date=date(2026, 1, 1) + timedelta(days=i % 365),
+            is_active=True, created_at=now, updated_at=now + timedelta(microseconds=i), version=1,
+        )
+        for i in range(n)
+    ]
+
+
+def make_audit_logs(n):
+    start = datetime(2026, 1, 1)
+    return [
+        AuditLog(
+            id=i, user_id=1, action='update', entity_type='subscription', entity_id=i,
+            timestamp=start + timedelta(seconds=i, microseconds=i), ip_address='127.0.0.1',
+            user_agent='Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0',
+        )
+        for i in range(n)
+    ]
+
+
+def measure(fn):
+    timing = timeit(fn, repeat=5)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timing, peak
+
+
+def compare(app, label, items, key, legacy_dict):
+    legacy_provider = DefaultJSONProvider(app)
+    legacy = lambda: legacy_provider.response({key: [legacy_dict(item) for item in items]})
+    fast = lambda: app.json.response({key: [item.to_dict() for item in items]})
+    assert legacy().get_data() == fast().get_data()
+
+    for name, fn in (('stdlib', legacy), ('orjson', fast)):
+        timing, peak = measure(fn)
+        print(f"{label:<24} {name}: {format_timing(timing)}, пик памяти {peak / 2**20:.1f} МБ")
+
+
+def main():
+    app = create_app('testing')
+    rng = random.Random(1)
+    with app.test_request_context():
+        for n in SIZES:
+            compare(app, f'{n} подписок', make_subscriptions(n, rng), 'subscriptions',
+                    legacy_subscription_dict)
+            compare(app, f'{n} записей аудита', make_audit_logs(n), 'audit_logs', legacy_audit_dict)
+
+
+if __name__ == '__main__':
+    main()
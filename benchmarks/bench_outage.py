@@ -0,0 +1,120 @@
+"""
+Задержка чтений во время отключения БД: с автоматом защиты и без него.
+
+Несколько потоков (как потоки gthread воркера) читают список подписок
+(GET /api/subscriptions) своих пользователей. Посередине прогона файловая
+SQLite на --outage секунд "отключается": пул соединений закрывается, а
+каталог с файлом БД переименовывается, и каждое новое подключение
+падает с "unable to open database file" (как отказ PostgreSQL в
+соединении; SQLite отказывает сразу, без connect_timeout).
+
+Для каждого режима выводятся p50/p99 задержки и ответы по статусам до,
+во время и после отключения:
+
+- off: автомат выключен, каждый запрос пытается подключиться к БД и
+  получает 500;
+- on: после CIRCUIT_BREAKER_FAILURES ошибок запросы сразу получают
+  последний ответ с заголовком Warning.
+
+Запуск:
+    python -m benchmarks.bench_outage --threads 8 --outage 3
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from app import create_app
+from app.models import db
+from app.services.circuit_breaker import circuit_breaker
+from app.services.stale_reads import stale_reads
+from benchmarks.common import seed_user
+from config import TestingConfig
+
+
+def percentile(samples, share):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * share))] * 1000 if samples else 0.0
+
+
+def run(enabled, threads, outage, subscriptions):
+    with tempfile.TemporaryDirectory() as root:
+        directory = os.path.join(root, 'db')
+        os.mkdir(directory)
+        path = os.path.join(directory, 'bench.db')
+        TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        TestingConfig.SQLALCHEMY_ENGINE_OPTIONS = {
+            'connect_args': {'check_same_thread': False},
+            'pool_size': threads,
+        }
+        TestingConfig.CIRCUIT_BREAKER_ENABLED = enabled
+        TestingConfig.CIRCUIT_BREAKER_RESET_TIMEOUT = 1
+        TestingConfig.PROPAGATE_EXCEPTIONS = False
+        app = create_app('testing')
+        # Трассировки 500 во время отключения не нужны в выводе
+        app.logger.disabled = True
+        with app.app_context():
+            db.create_all()
+            user_ids = [seed_user(f'bench{i}', subscriptions, seed=i) for i in range(threads)]
+
+        phase = ['before']
+        latencies = defaultdict(list)
+        statuses = defaultdict(Counter)
+        stop = threading.Event()
+
+        def worker(user_id):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(user_id)
+            while not stop.is_set():
+                current = phase[0]
+                started = time.perf_counter()
+                response = client.get('/api/subscriptions')
+                latencies[current].append(time.perf_counter() - started)
+                stale = ' stale' if 'Warning' in response.headers else ''
+                statuses[current][f'{response.status_code}{stale}'] += 1
+
+        workers = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+        for thread in workers:
+            thread.start()
+        time.sleep(1)
+
+        phase[0] = 'outage'
+        with app.app_context():
+            db.engine.dispose()
+        os.rename(directory, directory + '.down')
+        time.sleep(outage)
+        os.rename(directory + '.down', directory)
+        phase[0] = 'after'
+        time.sleep(2)
+        stop.set()
+        for thread in workers:
+            thread.join()
+
+        with app.app_context():
+            db.engine.dispose()
+        circuit_breaker.reset()
+        stale_reads.clear()
+        return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Чтения во время отключения БД')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--outage', type=float, default=3)
+    parser.add_argument('--subscriptions', type=int, default=50)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        latencies, statuses = run(enabled, args.threads, args.outage, args.subscriptions)
+        print(f"автомат {'on' if enabled else 'off'}:")
+        for name in ('before', 'outage', 'after'):
+            samples = latencies[name]
+            print(f"  {name:7} {len(samples):6} запросов, p50 {percentile(samples, 0.5):8.1f} мс, "
+                  f"p99 {percentile(samples, 0.99):8.1f} мс, {dict(statuses[name])}")
+
+
+if __name__ == '__main__':
+    main()
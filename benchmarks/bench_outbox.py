@@ -0,0 +1,96 @@
+"""
+Стоимость записи в outbox и пропускная способность доставки.
+
+Измеряет задержку POST /api/subscriptions без получателей и с одним
+получателем (запись события в той же транзакции), затем скорость
+доставки очереди локальным получателям пачками разного размера.
+
+Запуск:
+    python -m benchmarks.bench_outbox
+"""
+import time
+from datetime import datetime
+
+from app import create_app
+from app.models import db, OutboxEvent, User
+from app.services.outbox import LocalWebhookReceiver, OutboxDispatcher, outbox_lag
+from benchmarks.common import format_timing, timeit
+
+ENDPOINTS = 4
+EVENTS_PER_ENDPOINT = 5000
+
+
+def bench_requests(app, endpoints):
+    app.config['OUTBOX_ENDPOINTS'] = endpoints
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = '1'
+    payload = {'name': 'Netflix', 'amount': 499, 'interval': 'monthly',
+               'next_billing_date': '2026-12-01'}
+    return timeit(lambda: client.post('/api/subscriptions', json=payload), repeat=500)
+
+
+def seed_events(receivers):
+    now = datetime.utcnow()
+    rows = [
+        {
+            'endpoint': receiver.url,
+            'event_type': 'subscription.updated',
+            'user_id': 1,
+            'subscription_id': i % 1000,
+            'change_seq': i,
+            'payload': '{"id":1,"name":"Netflix","amount":499.0}',
+            'created_at': now,
+            'next_attempt_at': now,
+        }
+        for receiver in receivers
+        for i in range(EVENTS_PER_ENDPOINT)
+    ]
+    db.session.execute(db.delete(OutboxEvent))
+    db.session.execute(db.insert(OutboxEvent), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def bench_delivery(app, batch_size):
+    receivers = [LocalWebhookReceiver(delay=0.002) for _ in range(ENDPOINTS)]
+    for receiver in receivers:
+        receiver.__enter__()
+    try:
+        total = seed_events(receivers)
+        app.config['OUTBOX_BATCH_SIZE'] = batch_size
+        dispatcher = OutboxDispatcher(app)
+        started = time.perf_counter()
+        delivered = 0
+        max_lag = 0.0
+        while delivered < total:
+            delivered += dispatcher.run_once()
+            max_lag = max([max_lag] + list(outbox_lag().values()))
+        elapsed = time.perf_counter() - started
+        dispatcher.close()
+        print(f"пачка {batch_size:>4}: {total / elapsed:,.0f} событий/с, "
+              f"{dispatcher.stats['batches']} запросов, максимальное отставание {max_lag:.2f} с")
+    finally:
+        for receiver in receivers:
+            receiver.__exit__(None, None, None)
+
+
+def main():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@example.com', password_hash='x'))
+        db.session.commit()
+
+        off = bench_requests(app, [])
+        with LocalWebhookReceiver() as receiver:
+            on = bench_requests(app, [receiver.url])
+        print(f"POST без outbox:   {format_timing(off)}")
+        print(f"POST с outbox:     {format_timing(on)}")
+
+        for batch_size in (1, 10, 100, 500):
+            bench_delivery(app, batch_size)
+
+
+if __name__ == '__main__':
+    main()
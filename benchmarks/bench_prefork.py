@@ -0,0 +1,165 @@
+"""
+Время запуска и память воркеров с предзагрузкой приложения и без неё.
+
+Моделирует запуск N воркеров gunicorn тремя способами:
+
+- spawn: каждый воркер - новый интерпретатор, сам импортирует и создаёт
+  приложение (gunicorn без preload_app);
+- fork: приложение создаётся в мастере, воркеры получают его через fork
+  (preload_app);
+- fork+freeze: то же с gc.collect() и gc.freeze() перед fork
+  (gunicorn.conf.py).
+
+Каждый воркер выполняет --requests запросов GET /api/subscriptions, после
+чего все воркеры, ещё живые, снимают /proc/self/smaps_rollup. Pss делит
+общие страницы между процессами, Private - страницы, принадлежащие только
+воркеру. Время запуска - от старта мастера до первого ответа последнего
+воркера. Каждый режим запускается в отдельном процессе, чтобы импорт
+приложения в мастере входил в замер.
+
+Запуск (Linux):
+    python -m benchmarks.bench_prefork --workers 4 --requests 500
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('spawn', 'fork', 'fork+freeze')
+
+_app = None
+
+
+def memory_kb():
+    """Rss, Pss и Private (clean + dirty) текущего процесса в КБ."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def load_app(database_path):
+    from config import TestingConfig
+    from app import create_app
+
+    TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+    return create_app('testing')
+
+
+def seed(database_path, subscriptions):
+    from app.models import db
+    from benchmarks.common import seed_user
+
+    app = load_app(database_path)
+    with app.app_context():
+        db.create_all()
+        return seed_user('bench', subscriptions)
+
+
+def worker(mode, database_path, user_id, requests, results, barrier, done):
+    if mode == 'spawn':
+        app = load_app(database_path)
+    else:
+        from app.models import db
+
+        app = _app
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    client.get('/api/subscriptions')
+    first_response = time.time()
+    for _ in range(requests - 1):
+        client.get('/api/subscriptions')
+
+    barrier.wait()
+    results.put(dict(memory_kb(), first_response=first_response))
+    done.wait()
+
+
+def run_mode(mode, database_path, user_id, workers, requests):
+    """Выполняется в отдельном процессе: запустить воркеры и собрать замеры."""
+    global _app
+    started = time.time()
+    if mode == 'spawn':
+        context = multiprocessing.get_context('spawn')
+    else:
+        context = multiprocessing.get_context('fork')
+        _app = load_app(database_path)
+        if mode == 'fork+freeze':
+            gc.collect()
+            gc.freeze()
+
+    results, barrier, done = context.Queue(), context.Barrier(workers), context.Event()
+    processes = [
+        context.Process(target=worker, args=(mode, database_path, user_id, requests,
+                                             results, barrier, done))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+
+    return {
+        'boot': max(sample['first_response'] for sample in samples) - started,
+        'rss': sum(sample['rss'] for sample in samples) / workers,
+        'pss': sum(sample['pss'] for sample in samples) / workers,
+        'private': sum(sample['private'] for sample in samples) / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Память и запуск воркеров с preload')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--subscriptions', type=int, default=100)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--user-id', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        result = run_mode(args.mode, args.database, args.user_id, args.workers, args.requests)
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'bench.db')
+        user_id = seed(database_path, args.subscriptions)
+        print(f"{args.workers} воркеров, {args.requests} запросов на воркер")
+        print(f"{'режим':>12} {'запуск':>9} {'RSS':>10} {'PSS':>10} {'Private':>10}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_prefork', '--mode', mode,
+                 '--database', database_path, '--user-id', str(user_id),
+                 '--workers', str(args.workers), '--requests', str(args.requests)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:>12} {result['boot'] * 1000:>7.0f}мс "
+                f"{result['rss'] / 1024:>7.1f} МБ {result['pss'] / 1024:>7.1f} МБ "
+                f"{result['private'] / 1024:>7.1f} МБ"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Накладные расходы rate limiter.
+
+Измеряет стоимость consume() для хранилища в памяти и для общего
+mmap-файла, а также прирост задержки HTTP запроса к API при включённом
+лимитере.
+
+Запуск:
+    python -m benchmarks.bench_rate_limit
+"""
+import os
+import random
+import tempfile
+
+from app import create_app
+from app.models import db, User
+from app.services.rate_limit import MemoryBucketStore, SharedBucketStore, rate_limiter
+from benchmarks.common import format_timing, timeit
+
+
+def bench_store(name, store):
+    rng = random.Random(1)
+    keys = [f'api.get_subscriptions:user:{i}' for i in range(10_000)]
+    timing = timeit(lambda: store.consume(rng.choice(keys), 100, 1000), repeat=20_000)
+    print(f"{name:<20} consume(): {format_timing(timing)}")
+
+
+def bench_requests(enabled):
+    app = create_app('testing')
+    app.config['RATELIMIT_ENABLED'] = enabled
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    rate_limiter.store = MemoryBucketStore()
+    app.config['RATELIMIT_API'] = '1000000/second'
+    return timeit(lambda: client.get('/api/subscriptions'), repeat=2000)
+
+
+def main():
+    bench_store('память', MemoryBucketStore())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SharedBucketStore(os.path.join(tmp, 'buckets.bin'))
+        bench_store('mmap-файл', store)
+        store.close()
+
+    off = bench_requests(enabled=False)
+    on = bench_requests(enabled=True)
+    print(f"GET /api/subscriptions без лимитера: {format_timing(off)}")
+    print(f"GET /api/subscriptions с лимитером:  {format_timing(on)}")
+    print(f"Накладные расходы на запрос (p50): {(on['p50'] - off['p50']) * 1000:.1f} мкс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Бенчмарк поиска подписок по названию.
+
+Запуск:
+    python -m benchmarks.bench_search
+
+На SQLite измеряется in-process индекс триграмм: время построения индекса
+пользователя (первый запрос) и задержка тёплых запросов. С
+DATABASE_URL=postgresql://... и --config development измеряется pg_trgm.
+"""
+import argparse
+import random
+import time
+
+from app import create_app
+from app.models import db
+from app.services.search import search_index, search_subscriptions
+from benchmarks.common import DATASET_SIZES, format_timing, random_name, seed_user, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--config', default='testing')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        rng = random.Random(7)
+        for size in DATASET_SIZES:
+            user_id = seed_user(f'bench{size}', size)
+            queries = [random_name(rng).split()[0].lower() for _ in range(20)]
+            queries += ['netflx premim', 'spotfy', 'kinopoisk 12']
+
+            search_index.clear()
+            started = time.perf_counter()
+            search_subscriptions(user_id, 'warmup', 20)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            timing = timeit(lambda: search_subscriptions(user_id, rng.choice(queries), 20))
+            print(f"{size:>7} подписок: построение индекса {build_ms:.1f} мс, поиск {format_timing(timing)}")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Смешанная нагрузка на файловую SQLite: настройки по умолчанию и профиль sqlite.
+
+Несколько потоков (как потоки gthread воркера) выполняют запросы API:
+--write-share из них создают подписку (POST /api/subscriptions, плюс запись
+аудита), остальные читают список подписок. Сравниваются:
+
+- default: SQLite с настройками по умолчанию (rollback journal, запись из
+  потоков запросов);
+- sqlite: профиль SQLiteConfig (WAL, PRAGMA, очередь писателя с групповой
+  фиксацией).
+
+Выводится пропускная способность, задержка записей и чтений и ответы с
+ошибкой по типам: запись, ждущая блокировку БД дольше бюджета роута,
+получает 503, "database is locked" - 500.
+
+Запуск:
+    python -m benchmarks.bench_sqlite_writes --threads 8 --requests 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from app import create_app
+from app.models import db
+from app.services.sqlite_writer import sqlite_writer
+from benchmarks.common import seed_user
+from config import SQLiteConfig, TestingConfig
+
+
+def build_app(profile, database_path):
+    if profile == 'sqlite':
+        SQLiteConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        SQLiteConfig.RATELIMIT_ENABLED = False
+        SQLiteConfig.RATELIMIT_STORAGE_PATH = None
+        return create_app('sqlite')
+    TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+    return create_app('testing')
+
+
+def percentile(samples, share):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * share))] * 1000 if samples else 0.0
+
+
+def run(profile, threads, requests, write_share, subscriptions):
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(profile, os.path.join(directory, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            user_id = seed_user('bench', subscriptions)
+
+        latencies = {'read': [], 'write': []}
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(user_id)
+            for i in range(requests):
+                started = time.perf_counter()
+                if rng.random() < write_share:
+                    kind = 'write'
+                    response = client.post('/api/subscriptions', json={
+                        'name': f'Bench {seed}-{i}', 'amount': 100, 'interval': 'monthly',
+                        'next_billing_date': '2030-01-01',
+                    })
+                else:
+                    kind = 'read'
+                    response = client.get('/api/subscriptions')
+                latencies[kind].append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors.append(f'{kind} {response.status_code}')
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        sqlite_writer.stop()
+        with app.app_context():
+            db.engine.dispose()
+
+    total = threads * requests
+    print(
+        f"{profile:>8}: {total / elapsed:7.0f} запр/с, "
+        f"запись p50 {percentile(latencies['write'], 0.5):6.1f} мс "
+        f"p99 {percentile(latencies['write'], 0.99):7.1f} мс, "
+        f"чтение p99 {percentile(latencies['read'], 0.99):6.1f} мс, "
+        f"ошибки {dict(Counter(errors)) or 0}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Смешанная нагрузка на SQLite')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--write-share', type=float, default=0.3)
+    parser.add_argument('--subscriptions', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.threads} потоков x {args.requests} запросов, записей {args.write_share:.0%}")
+    for profile in ('default', 'sqlite'):
+        run(profile, args.threads, args.requests, args.write_share, args.subscriptions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Память на одного подключённого клиента ленты изменений.
+
+Открывает N простаивающих SSE потоков (каждый в своём потоке, как при
+gthread воркере) и сравнивает RSS процесса и аллокации Python до и после.
+
+Запуск:
+    python -m benchmarks.bench_sse_memory --clients 2000
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+
+from app import create_app
+from app.models import db, User
+from app.services.events import change_notifier
+
+
+def rss_kb():
+    """Текущий RSS процесса в КБ (Linux)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='сколько секунд ждать подключения всех клиентов')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    # Предел лент воркера снят: меряется память самих потоков
+    app.config.update(EVENTS_HEARTBEAT_INTERVAL=3600, EVENTS_STREAM_TIMEOUT=3600,
+                      EVENTS_MAX_STREAMS=args.clients)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    threading.stack_size(256 * 1024)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+    def open_stream():
+        response = client.get('/api/subscriptions/events', buffered=False)
+        for _ in response.response:
+            pass
+
+    tracemalloc.start()
+    rss_before = rss_kb()
+    traced_before = tracemalloc.get_traced_memory()[0]
+
+    for _ in range(args.clients):
+        threading.Thread(target=open_stream, daemon=True).start()
+    expires_at = time.monotonic() + args.timeout
+    while change_notifier.waiting() < args.clients:
+        if time.monotonic() >= expires_at:
+            raise SystemExit(f"За {args.timeout:g} с подключились "
+                             f"{change_notifier.waiting()} из {args.clients} клиентов")
+        time.sleep(0.05)
+
+    rss_per_client = (rss_kb() - rss_before) * 1024 / args.clients
+    traced_per_client = (tracemalloc.get_traced_memory()[0] - traced_before) / args.clients
+    print(f"Клиентов: {args.clients}")
+    print(f"RSS на клиента: {rss_per_client / 1024:.1f} КБ (включая стек потока)")
+    print(f"Python-аллокации на клиента: {traced_per_client / 1024:.1f} КБ")
+
+
+if __name__ == '__main__':
+    main()
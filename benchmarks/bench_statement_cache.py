@@ -0,0 +1,60 @@
+"""
+Python-накладные расходы горячих запросов до и после реестра запросов.
+
+Сравнивает построение запроса на каждый вызов (Query.filter_by, get_or_404,
+order_by/limit, Session.get) с заранее построенными statement из
+app.services.queries. Данных в таблицах мало, поэтому время почти целиком
+состоит из Python-работы SQLAlchemy.
+
+Запуск:
+    python -m benchmarks.bench_statement_cache
+"""
+from app import create_app
+from app.models import db, AuditLog, Subscription, User
+from app.services.queries import (
+    active_subscriptions_by_user, recent_audit_logs_by_user, reset_statement_cache_stats,
+    statement_cache_stats, subscription_by_id, user_by_id
+)
+from benchmarks.common import format_timing, seed_user, timeit
+
+
+def main():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user_id = seed_user('bench', 10)
+        subscription_id = db.session.execute(db.select(Subscription.id).limit(1)).scalar_one()
+
+        def run(fn):
+            def call():
+                fn()
+                # Как в начале нового запроса: пустая identity map
+                db.session.expunge_all()
+            return call
+
+        cases = [
+            ('get_subscriptions',
+             lambda: Subscription.query.filter_by(user_id=user_id, is_active=True).all(),
+             lambda: db.session.execute(active_subscriptions_by_user(), {'user_id': user_id}).scalars().all()),
+            ('get_subscription',
+             lambda: Subscription.query.get_or_404(subscription_id),
+             lambda: db.session.execute(subscription_by_id(), {'subscription_id': subscription_id}).scalar_one()),
+            ('get_audit_logs',
+             lambda: AuditLog.query.filter_by(user_id=user_id).order_by(AuditLog.timestamp.desc()).limit(100).all(),
+             lambda: db.session.execute(recent_audit_logs_by_user(), {'user_id': user_id}).scalars().all()),
+            ('load_user',
+             lambda: db.session.get(User, user_id),
+             lambda: db.session.execute(user_by_id(), {'user_id': user_id}).scalar_one()),
+        ]
+
+        reset_statement_cache_stats()
+        for name, before, after in cases:
+            old = timeit(run(before), repeat=3000)
+            new = timeit(run(after), repeat=3000)
+            print(f"{name:<18} до:    {format_timing(old)}")
+            print(f"{'':<18} после: {format_timing(new)} ({old['mean'] / new['mean']:.2f}x)")
+        print(f"Метрики кэша: {statement_cache_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Общие утилиты бенчмарков: синтетические данные и замеры времени.
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.models import db, Subscription, User
+
+# Размеры синтетических наборов данных (подписок на пользователя)
+DATASET_SIZES = (1_000, 10_000, 100_000)
+
+_WORDS = (
+    'Yandex', 'Music', 'Netflix', 'Spotify', 'Premium', 'Family', 'Kinopoisk',
+    'Cloud', 'Storage', 'Office', 'Plus', 'Pro', 'Games', 'News', 'Fitness',
+    'Telegram', 'VPN', 'Books', 'Audio', 'Video', 'Drive', 'Mail', 'Team',
+)
+
+
+def random_name(rng):
+    """Случайное название подписки из 2-3 слов и номера."""
+    words = rng.sample(_WORDS, rng.randint(2, 3))
+    return f"{' '.join(words)} {rng.randint(1, 9999)}"
+
+
+def seed_user(username, subscriptions, seed=42):
+    """
+    Создать пользователя с заданным числом подписок.
+
+    Вставка идёт пачками через executemany, без ORM unit of work.
+
+    Returns:
+        int: ID пользователя
+    """
+    rng = random.Random(seed)
+    user = User(username=username, email=f'{username}@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+
+    today = date.today()
+    rows = [
+        {
+            'user_id': user.id,
+            'name': random_name(rng),
+            'amount': round(rng.uniform(50, 5000), 2),
+            'interval': rng.choice(('monthly', 'yearly')),
+            'next_billing_date': today + timedelta(days=rng.randint(0, 365)),
+            'is_active': rng.random() > 0.1,
+        }
+        for _ in range(subscriptions)
+    ]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(Subscription), rows[start:start + 5000])
+    db.session.commit()
+    return user.id
+
+
+def timeit(fn, repeat=200):
+    """
+    Выполнить fn repeat раз.
+
+    Returns:
+        dict: p50, p99 и mean в миллисекундах
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50': samples[len(samples) // 2],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'mean': statistics.fmean(samples),
+    }
+
+
+def format_timing(timing):
+    return f"p50 {timing['p50']:.3f} мс, p99 {timing['p99']:.3f} мс, mean {timing['mean']:.3f} мс"
@@ -0,0 +1,36 @@
+"""
+Сборка статических файлов: минификация, хеш содержимого в имени, .gz/.br.
+
+Запускается при сборке образа (Dockerfile) и после изменения app/static;
+результат читается приложением при старте (ASSETS_DIR/manifest.json).
+
+Пример:
+    python build_assets.py
+    python build_assets.py --output /srv/assets
+"""
+import argparse
+import os
+
+from app.services.assets import build_assets
+from config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборка статических файлов')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--source', default=os.path.join(os.path.dirname(__file__), 'app', 'static'))
+    parser.add_argument('--output', help='каталог сборки (по умолчанию ASSETS_DIR)')
+    args = parser.parse_args()
+
+    # Сборке не нужны ни БД, ни приложение: только каталог из конфигурации
+    output = args.output or config[args.config].ASSETS_DIR
+    for name, result in build_assets(args.source, output).items():
+        sizes = ', '.join(
+            f"{encoding} {result[encoding]:,}" for encoding in ('gzip', 'br') if result[encoding]
+        )
+        print(f"{name} -> {result['path']}: {result['source_bytes']:,} -> {result['bytes']:,} байт"
+              f"{f' ({sizes})' if sizes else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Скрипт периодической очистки надгробий delta-синхронизации.
+
+Пример (cron, раз в сутки):
+    python compact_tombstones.py --retention-days 30
+"""
+import argparse
+import os
+
+from app import create_app
+from app.services.sync import compact_tombstones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Очистка старых надгробий удалённых подписок')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--retention-days', type=int, default=30)
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
+    with app.app_context():
+        removed = compact_tombstones(args.retention_days)
+    print(f"Удалено надгробий: {removed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,128 @@
 Конфигурация приложения для различных окружений.
 """
 import os
+import tempfile
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Загружаем переменные окружения из .env файла
+# Загружаем переменные окружения из .env файла (python-dotenv
+# импортируется, только если файл есть: в контейнере его обычно нет)
 basedir = Path(__file__).parent.absolute()
-load_dotenv(basedir / '.env')
+if (basedir / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(basedir / '.env')
 
 
 class Config:
     """Базовый класс конфигурации."""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Напоминания о предстоящих списаниях
+    REMINDER_SCHEDULER_ENABLED = os.environ.get('REMINDER_SCHEDULER_ENABLED') == '1'
+    # 1 - поток запускается в create_app. По умолчанию выключено: create_app
+    # вызывают и скрипты (outbox_worker.py, архивация, create_tables.py,
+    # процессы revenue_report), и каждый запустил бы свой планировщик с
+    # дублями напоминаний. Поток запускают только сервер: gunicorn в одном
+    # воркере (gunicorn.conf.py) и run.py
+    REMINDER_SCHEDULER_AUTOSTART = os.environ.get('REMINDER_SCHEDULER_AUTOSTART', '0') == '1'
+    REMINDER_DAYS_BEFORE = int(os.environ.get('REMINDER_DAYS_BEFORE', 3))
+    REMINDER_HORIZON_DAYS = 7
+    # Как часто воркер планировщика перечитывает изменённые подписки и
+    # насколько раньше прошлой синхронизации (секунды)
+    REMINDER_SYNC_INTERVAL = 60
+    REMINDER_SYNC_OVERLAP = 300
+    REMINDER_CHECKPOINT_PATH = os.environ.get('REMINDER_CHECKPOINT_PATH') or \
+        str(basedir / 'reminders_checkpoint.json')
+
+    # Лента изменений (server-sent events)
+    EVENTS_HEARTBEAT_INTERVAL = 15
+    EVENTS_STREAM_TIMEOUT = 300
+    EVENTS_RETRY_MS = 3000
+    # Лента держит поток gthread, поэтому живых лент на хост всего
+    # EVENTS_MAX_STREAMS * WEB_CONCURRENCY (по умолчанию половина
+    # GUNICORN_THREADS, 2 на воркер): это горстка вкладок, а не тысячи.
+    # Остальные получают 503 и опрашивают /changes (app.js)
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS',
+                                            max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 2)))
+    EVENTS_RETRY_AFTER = 30
+
+    # Ограничение частоты запросов. Без пути к файлу корзины хранятся
+    # в памяти каждого воркера отдельно.
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH')
+    RATELIMIT_API = '300/minute'
+    # Одновременных проверок пароля на машину, а не на воркер: предел
+    # общий через RATELIMIT_STORAGE_PATH, без него делится на
+    # RATELIMIT_WORKERS (WEB_CONCURRENCY) воркеров
+    RATELIMIT_AUTH_CONCURRENCY = os.cpu_count() or 1
+    RATELIMIT_AUTH_MAX_WAIT = 0.5
+
+    # Профилирование запросов API: заголовок X-Profile с токеном или
+    # случайная доля запросов. Без токена и доли профилировщик отключён.
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_INTERVAL = 0.005
+    PROFILER_OUTPUT_DIR = os.environ.get('PROFILER_OUTPUT_DIR') or str(basedir / 'profiles')
+
+    # Сжатие ответов API (gzip; brotli, если установлен)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_GZIP_LEVEL = 4
+    COMPRESS_BROTLI_QUALITY = 4
+
+    # Бюджеты задержки роутов (@deadline): остаток бюджета передаётся
+    # в БД как statement_timeout
+    DEADLINES_ENABLED = True
+
+    # Idempotency-Key для POST /api/subscriptions: сколько хранить первый
+    # ответ (таблица idempotency_keys), сколько ждать выполняющийся
+    # дубликат и как часто проверять его ответ из другого воркера
+    IDEMPOTENCY_TTL = 86400
+    IDEMPOTENCY_WAIT = 10
+    IDEMPOTENCY_POLL_INTERVAL = 0.05
+    # Резерв без сохранённого ответа старше стольких секунд забирает повтор
+    IDEMPOTENCY_LEASE = 30
+
+    # Outbox: адреса получателей изменений подписок (через запятую) и
+    # параметры доставки (outbox_worker.py)
+    OUTBOX_ENDPOINTS = [url for url in os.environ.get('OUTBOX_ENDPOINTS', '').split(',') if url]
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_CONCURRENCY = 4
+    OUTBOX_TIMEOUT = 5
+    OUTBOX_RETRY_BASE = 1
+    OUTBOX_RETRY_MAX = 300
+    OUTBOX_POLL_INTERVAL = 1
+    OUTBOX_RETENTION_HOURS = 24
+
+    # Импорт выписок (POST /api/subscriptions/import): предельный размер
+    # файла, строк в пачке загрузки, ошибок в ответе; проверенные строки
+    # держатся в памяти до IMPORT_SPOOL_MEMORY байт, дальше во временном файле
+    IMPORT_MAX_BYTES = 256 * 1024 * 1024
+    IMPORT_CHUNK_SIZE = 1000
+    IMPORT_SPOOL_MEMORY = 4 * 1024 * 1024
+    IMPORT_MAX_ERRORS = 1000
+
+    # Холодное хранилище аудита (archive_audit_logs.py): записи старше
+    # AUDIT_ARCHIVE_AFTER_DAYS дней переносятся в сегменты в каталоге
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or str(basedir / 'audit_archive')
+    AUDIT_ARCHIVE_AFTER_DAYS = 90
+    AUDIT_ARCHIVE_BLOCK_ROWS = 4096
+
+    # Автомат защиты БД: после CIRCUIT_BREAKER_FAILURES ошибок доступности
+    # подряд запросы к БД отклоняются сразу, через RESET_TIMEOUT секунд -
+    # проба. Роуты чтения тем временем отдают последние ответы
+    # (не старше STALE_READS_MAX_AGE секунд) с заголовком Warning
+    CIRCUIT_BREAKER_ENABLED = True
+    CIRCUIT_BREAKER_FAILURES = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT = 10
+    STALE_READS_MAX_BYTES = 64 * 1024 * 1024
+    STALE_READS_MAX_AGE = 86400
+
+    # Собранные статические файлы (build_assets.py): имена с хешем
+    # содержимого, отдаются под ASSETS_URL_PATH с кешем на ASSETS_MAX_AGE
+    ASSETS_DIR = os.environ.get('ASSETS_DIR') or str(basedir / 'build' / 'assets')
+    ASSETS_URL_PATH = '/assets'
+    ASSETS_MAX_AGE = 365 * 86400
     
     @staticmethod
     def init_app(app):
@@ -33,6 +143,13 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI =  'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    REMINDER_SCHEDULER_ENABLED = False
+    REMINDER_CHECKPOINT_PATH = None
+    RATELIMIT_ENABLED = False
+    OUTBOX_ENDPOINTS = []
+    PROFILER_TOKEN = None
+    PROFILER_SAMPLE_RATE = 0.0
+    CIRCUIT_BREAKER_ENABLED = False
 
 
 class ProductionConfig(Config):
@@ -40,6 +157,33 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'postgresql://localhost/subscriptions_db'
+    # Общие для всех воркеров gunicorn корзины rate limiter
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'subscriptions-ratelimit.bin')
+
+
+class SQLiteConfig(ProductionConfig):
+    """
+    Production на встроенной SQLite (небольшие инсталляции без PostgreSQL).
+
+    Рассчитан на один процесс gunicorn с потоками (WEB_CONCURRENCY=1):
+    записи создания подписок и аудита идут через очередь одного писателя.
+    """
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{basedir / 'subscriptions.db'}"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # В WAL режиме NORMAL не теряет целостность при сбое, только
+        # последние транзакции при отключении питания
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,  # 64 МБ
+        'mmap_size': 268435456,  # 256 МБ
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    }
+    SQLITE_WRITER_ENABLED = True
+    SQLITE_WRITER_BATCH = 64
+    SQLITE_WRITER_TIMEOUT = 5
 
 
 # Словарь конфигураций для удобного доступа
@@ -47,6 +191,7 @@ config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
     'production': ProductionConfig,
+    'sqlite': SQLiteConfig,
     'default': DevelopmentConfig
 }
 
@@ -1,22 +1,43 @@
 """
-Скрипт для создания таблиц в базе данных.
+Скрипт для создания таблиц в базе данных и обновления схемы существующей.
+
+Недостающие таблицы создаёт db.create_all(); в уже существующие таблицы
+добавляются новые колонки и индексы (app.services.schema), старые строки
+получают значения новых колонок. Повторный запуск безопасен.
+
+Пример:
+    python create_tables.py
+    python create_tables.py --config production
 """
+import argparse
+import os
 import sys
 from app import create_app
 from app.models import db
+from app.services.schema import upgrade_schema
 
 def create_tables():
-    """Создать все таблицы в базе данных."""
-    app = create_app('development')
+    """Создать все таблицы в базе данных и обновить существующие."""
+    parser = argparse.ArgumentParser(description='Создание и обновление таблиц')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
     
     with app.app_context():
         try:
             db.create_all()
+            report = upgrade_schema()
             print("Таблицы успешно созданы!")
+            if report['added'] or report['indexes']:
+                print(f"Добавлены колонки: {', '.join(report['added']) or '-'}; "
+                      f"индексы: {', '.join(report['indexes']) or '-'}")
+            if report['backfilled']:
+                print(f"Номера изменений получили подписок: {report['backfilled']}")
         except Exception as e:
+            db.session.rollback()
             print(f"Ошибка при создании таблиц: {e}", file=sys.stderr)
             sys.exit(1)
 
 if __name__ == '__main__':
     create_tables()
-
@@ -0,0 +1,89 @@
+"""
+Конфигурация gunicorn для production (gunicorn -c gunicorn.conf.py).
+
+Приложение создаётся один раз в мастер-процессе (preload_app) до запуска
+воркеров, поэтому импорт Flask, SQLAlchemy и моделей и сборка
+приложения не повторяются в каждом воркере, а их память делится между
+процессами через copy-on-write. Чтобы сборщик мусора не разделял
+страницы, записывая в заголовки объектов, собранные при загрузке объекты
+переносятся в постоянное поколение (gc.freeze) перед первым fork.
+
+После fork воркер забывает унаследованные соединения пула БД и, если
+планировщик напоминаний включён, запускает его только в одном воркере.
+Воркеры перезапускаются после max_requests запросов (со случайным
+разбросом, чтобы не все сразу), дожидаясь завершения текущих запросов.
+"""
+import gc
+import os
+
+# Планировщик напоминаний - фоновый поток; в мастере он бы не пережил fork,
+# даже если автозапуск включён в окружении
+os.environ['REMINDER_SCHEDULER_AUTOSTART'] = '0'
+
+
+def _cpu_count():
+    """Число доступных процессу CPU (учитывает ограничение контейнера по cpuset)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = True
+
+# gthread: поток на запрос, длинные потоки SSE не блокируют воркер целиком
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * _cpu_count() + 1))
+# Приложение делит пределы на число воркеров (RATELIMIT_WORKERS)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = 30
+timeout = 30
+keepalive = 5
+# Heartbeat воркеров в памяти, а не на overlay файловой системе контейнера.
+# В каталоге только временные файлы heartbeat, которые gunicorn создаёт
+# через mkstemp и сразу удаляет: предсказуемых имён нет
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None  # nosec B108
+
+accesslog = '-'
+
+
+def when_ready(server):
+    """Приложение загружено, воркеры ещё не запущены."""
+    app = server.app.wsgi()
+    try:
+        # Фильтры доступности имён строятся один раз и делятся воркерами
+        with app.app_context():
+            app.extensions['availability_index'].build()
+    except Exception as e:
+        server.log.warning(f"Фильтры доступности будут построены в воркерах: {e}")
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"gc.freeze: {gc.get_freeze_count()} объектов в постоянном поколении")
+
+
+def pre_fork(server, worker):
+    """Назначить воркер, в котором будет работать планировщик напоминаний."""
+    owner = getattr(server, 'reminder_worker', None)
+    worker.runs_reminders = owner is None or owner not in server.WORKERS.values()
+    if worker.runs_reminders:
+        server.reminder_worker = worker
+
+
+def post_fork(server, worker):
+    from app.models import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        # Соединения, открытые в мастере, принадлежат ему: не закрываем их,
+        # а только выбрасываем из пула воркера
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    if worker.runs_reminders and app.config['REMINDER_SCHEDULER_ENABLED']:
+        app.extensions['reminder_scheduler'].start()
+        server.log.info(f"Планировщик напоминаний запущен в воркере {worker.pid}")
@@ -0,0 +1,42 @@
+"""
+Воркер доставки событий outbox во внешние сервисы.
+
+Запускается одним процессом на базу (порядок событий подписки
+гарантируется только при одном воркере):
+    python outbox_worker.py
+    python outbox_worker.py --once
+"""
+import argparse
+import logging
+import os
+
+from app import create_app
+from app.services.outbox import OutboxDispatcher, outbox_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Доставка событий изменений подписок (outbox)')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--once', action='store_true', help='Один проход доставки и выход')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    app = create_app(args.config, blueprints=())
+    with app.app_context():
+        dispatcher = OutboxDispatcher(app)
+        try:
+            if args.once:
+                delivered = dispatcher.run_once()
+                print(f"Доставлено событий: {delivered}")
+                for endpoint, lag in outbox_lag().items():
+                    print(f"{endpoint}: отставание {lag:.1f} с")
+            else:
+                dispatcher.run_forever(app.config['OUTBOX_POLL_INTERVAL'])
+        except KeyboardInterrupt:
+            dispatcher.stop()
+        finally:
+            dispatcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Скрипт периодической очистки просроченных ключей Idempotency-Key.
+
+Пример (cron, раз в час):
+    python purge_idempotency_keys.py
+"""
+import argparse
+import os
+
+from app import create_app
+from app.services.idempotency import idempotency_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Очистка просроченных ключей Idempotency-Key')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
+    with app.app_context():
+        removed = idempotency_store.purge_expired()
+    print(f"Удалено ключей: {removed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Скрипт ночного отчёта по выручке всей платформы.
+
+Пример:
+    python revenue_report.py --workers 8 --chunk-size 50000
+"""
+import argparse
+import json
+import os
+
+from app import create_app
+from app.services.revenue_report import build_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отчёт по MRR и предстоящим списаниям')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--upcoming-days', type=int, default=7)
+    args = parser.parse_args()
+
+    app = create_app(args.config, blueprints=())
+    with app.app_context():
+        report = build_report(
+            config_name=args.config,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            upcoming_days=args.upcoming_days,
+        )
+
+    timing = report.pop('timing')
+    for chunk in timing['chunks']:
+        first_id, last_id = chunk['users']
+        print(f"users {first_id}-{last_id}: {chunk['seconds'] * 1000:.1f} мс")
+    print(
+        f"Воркеров: {timing['workers']}, wall: {timing['wall_seconds']:.2f} с, "
+        f"сумма по чанкам: {timing['chunk_seconds']:.2f} с, "
+        f"параллелизм: {timing['parallelism']:.2f}x"
+    )
+    print(json.dumps(report, default=str, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
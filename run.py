@@ -9,5 +9,9 @@ config_name = os.environ.get('FLASK_ENV', 'development')
 app = create_app(config_name)
 
 if __name__ == '__main__':
+    # Планировщик напоминаний - только в процессе, который обслуживает
+    # запросы, а не в наблюдателе перезагрузчика Werkzeug
+    if app.config['REMINDER_SCHEDULER_ENABLED'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        app.extensions['reminder_scheduler'].start()
     app.run(debug=True, host='0.0.0.0', port=8000)
 
@@ -0,0 +1,155 @@
+"""
+Профиль холодного старта приложения.
+
+Каждый замер - свежий интерпретатор (как новый воркер или запуск тестов):
+
+- фазы: импорт Flask/SQLAlchemy, импорт пакета app, create_app(), первый
+  запрос (компиляция шаблона, первое соединение с БД), медиана по --runs
+  запускам;
+- профиль python -X importtime: самые дорогие модули по собственному
+  времени импорта и сумма по пакетам верхнего уровня.
+
+Пример:
+    python startup_profile.py --config production --runs 5 --top 25
+"""
+import argparse
+import json
+import os
+import statistics
+# Запускается только текущий интерпретатор (sys.executable), см. _python
+import subprocess  # nosec B404
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+basedir = Path(__file__).parent.absolute()
+
+# Выполняется в отдельном процессе: argv - конфигурация и путь запроса
+_PHASES_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import flask, flask_login, flask_sqlalchemy
+libraries = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({
+    'libraries': libraries - started,
+    'app_import': imported - libraries,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'status': status,
+}))
+'''
+
+_MODULES_SCRIPT = '''
+import json, sys
+from app import create_app
+create_app(sys.argv[1], **json.loads(sys.argv[2]))
+print(json.dumps(sorted(sys.modules)))
+'''
+
+PHASES = ('libraries', 'app_import', 'create_app', 'first_request')
+
+
+def _python(*args):
+    # argv фиксирован: текущий интерпретатор и код/флаги, собранные этим
+    # скриптом, без оболочки
+    return subprocess.run(  # nosec B603
+        [sys.executable, *args], cwd=basedir, capture_output=True, text=True, check=True
+    )
+
+
+def measure_startup(config_name='testing', path='/login', runs=3):
+    """
+    Медианные фазы холодного старта в секундах.
+
+    Returns:
+        dict: PHASES, own (app_import + create_app + first_request),
+        total (время жизни процесса, включая запуск интерпретатора)
+        и status первого ответа
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = json.loads(_python('-c', _PHASES_SCRIPT, config_name, path).stdout)
+        result['total'] = time.perf_counter() - started
+        result['own'] = result['app_import'] + result['create_app'] + result['first_request']
+        samples.append(result)
+    phases = {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in (*PHASES, 'own', 'total')
+    }
+    phases['status'] = samples[-1]['status']
+    return phases
+
+
+def startup_modules(config_name='testing', **create_app_kwargs):
+    """Модули, загруженные после create_app(config_name, **create_app_kwargs)."""
+    return set(json.loads(
+        _python('-c', _MODULES_SCRIPT, config_name, json.dumps(create_app_kwargs)).stdout
+    ))
+
+
+def parse_importtime(output):
+    """
+    Разобрать вывод python -X importtime.
+
+    Returns:
+        list: словари module, self_us, cumulative_us, depth в порядке вывода
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # Строка заголовка
+        modules.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return modules
+
+
+def import_profile(config_name='testing'):
+    """Профиль импорта при create_app(config_name)."""
+    script = f'from app import create_app; create_app({config_name!r})'
+    return parse_importtime(_python('-X', 'importtime', '-c', script).stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Профиль холодного старта')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--path', default='/login', help='путь первого запроса')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    phases = measure_startup(args.config, args.path, args.runs)
+    print(f"Холодный старт ({args.config}, медиана {args.runs} запусков, GET {args.path} -> "
+          f"{phases['status']}):")
+    for key in (*PHASES, 'own', 'total'):
+        print(f"  {key:<14} {phases[key] * 1000:7.1f} мс")
+
+    modules = import_profile(args.config)
+    print(f"\nСамые дорогие модули (собственное время импорта):")
+    for module in sorted(modules, key=lambda m: m['self_us'], reverse=True)[:args.top]:
+        print(f"  {module['self_us'] / 1000:7.1f} мс  {module['module']}")
+
+    packages = Counter()
+    for module in modules:
+        packages[module['module'].split('.')[0]] += module['self_us']
+    print(f"\nПо пакетам (всего {sum(packages.values()) / 1000:.1f} мс, {len(modules)} модулей):")
+    for package, self_us in packages.most_common(args.top):
+        print(f"  {self_us / 1000:7.1f} мс  {package}")
+
+
+if __name__ == '__main__':
+    main()
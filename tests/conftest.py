@@ -11,6 +11,8 @@ from sqlalchemy.pool import StaticPool
 
 from app import create_app, db
 from app.models import User
+from app.services.availability import availability_index
+from app.services.search import search_index
 
 
 def _sqlite_engine_options(uri: str):
@@ -45,6 +47,8 @@ def reset_database(app):
         db.session.remove()
         db.drop_all()
         db.create_all()
+    search_index.clear()
+    availability_index.clear()
     yield
     with app.app_context():
         db.session.remove()
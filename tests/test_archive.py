@@ -0,0 +1,63 @@
+"""
+Тесты для архива неактивных подписок.
+"""
+from datetime import date, datetime, timedelta
+
+from app.models import db, ArchivedSubscription, Subscription
+from app.services.archive import archive_inactive
+
+
+def _add(user, name, is_active, updated_days_ago):
+    subscription = Subscription(
+        user_id=user.id,
+        name=name,
+        amount=100,
+        interval="monthly",
+        next_billing_date=date(2026, 12, 1),
+        is_active=is_active,
+    )
+    db.session.add(subscription)
+    db.session.flush()
+    db.session.execute(
+        db.update(Subscription)
+        .where(Subscription.id == subscription.id)
+        .values(updated_at=datetime.utcnow() - timedelta(days=updated_days_ago))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return subscription.id
+
+
+def test_archive_moves_only_old_inactive_rows_in_chunks(user):
+    old_ids = [_add(user, f"Old {i}", False, 200) for i in range(5)]
+    recent = _add(user, "Recent", False, 10)
+    active = _add(user, "Active", True, 200)
+
+    assert archive_inactive(older_than_days=90, chunk_size=2) == 5
+
+    hot_ids = db.session.execute(db.select(Subscription.id)).scalars().all()
+    assert sorted(hot_ids) == [recent, active]
+    archived_ids = db.session.execute(db.select(ArchivedSubscription.id)).scalars().all()
+    assert sorted(archived_ids) == old_ids
+
+
+def test_get_falls_back_to_archive_and_restore(authenticated_client, user):
+    subscription_id = _add(user, "Old", False, 200)
+    archive_inactive(older_than_days=90)
+
+    response = authenticated_client.get(f"/api/subscriptions/{subscription_id}")
+    assert response.status_code == 200
+    assert response.get_json()["name"] == "Old"
+
+    response = authenticated_client.patch(f"/api/subscriptions/{subscription_id}", json={"name": "Renamed"})
+    assert response.status_code == 409
+
+    response = authenticated_client.post(f"/api/subscriptions/{subscription_id}/restore")
+    assert response.status_code == 200
+    assert response.get_json()["id"] == subscription_id
+    assert db.session.query(ArchivedSubscription).count() == 0
+
+    response = authenticated_client.patch(f"/api/subscriptions/{subscription_id}", json={"name": "Renamed"})
+    assert response.status_code == 200
+    assert response.get_json()["name"] == "Renamed"
+    assert authenticated_client.post(f"/api/subscriptions/{subscription_id}/restore").status_code == 404
@@ -0,0 +1,121 @@
+"""
+Тесты для сборки статических файлов и их отдачи с долгим кешем.
+"""
+import gzip
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import brotli
+import pytest
+
+from app import create_app
+from app.services.assets import assets, build_assets, minify_css, minify_js
+from config import TestingConfig
+
+STATIC = Path(__file__).resolve().parent.parent / 'app' / 'static'
+
+
+def test_minify_js_keeps_strings_and_line_breaks():
+    source = (
+        "// комментарий\n"
+        "const a = 'строка  с // пробелами' /* блок */ + \"x\"\n"
+        "const html = `\n    <td>${ a + `вложенный ${1}` }</td>\n`\n"
+        "let b = a\n"
+        "(function () { return /[/]\\/ +/g.test(b) })()\n"
+        "c = a - -1 / 2; d = a + +b\n"
+    )
+    assert minify_js(source) == (
+        "const a='строка  с // пробелами'+\"x\"\n"
+        "const html=`\n    <td>${ a + `вложенный ${1}` }</td>\n`\n"
+        "let b=a\n"
+        "(function(){return/[/]\\/ +/g.test(b)})()\n"
+        "c=a- -1/2;d=a+ +b\n"
+    )
+
+
+def test_minify_css():
+    source = (
+        "/* тема */\n.nav a:hover,\n.nav > li {\n    font-family: 'Segoe  UI', sans-serif;\n"
+        "    margin: 0 auto;\n}\n@media (max-width: 768px) {\n    .a .b { color: #fff; }\n}\n"
+    )
+    assert minify_css(source) == (
+        ".nav a:hover,.nav>li{font-family:'Segoe  UI',sans-serif;margin:0 auto}"
+        "@media (max-width:768px){.a .b{color:#fff}}\n"
+    )
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='нужен node')
+def test_minified_app_js_is_valid(tmp_path):
+    path = tmp_path / 'app.min.js'
+    path.write_text(minify_js((STATIC / 'js' / 'app.js').read_text(encoding='utf-8')), encoding='utf-8')
+    subprocess.run(['node', '--check', str(path)], check=True)
+
+
+def test_build_writes_hashed_precompressed_files(tmp_path):
+    report = build_assets(STATIC, tmp_path)
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert set(manifest) == {'css/style.css', 'js/app.js'}
+
+    hashed = tmp_path / manifest['js/app.js']
+    assert hashed.name.startswith('app.') and hashed.suffix == '.js'
+    data = hashed.read_bytes()
+    assert report['js/app.js']['bytes'] == len(data) < report['js/app.js']['source_bytes']
+    assert gzip.decompress((tmp_path / (manifest['js/app.js'] + '.gz')).read_bytes()) == data
+    assert brotli.decompress((tmp_path / (manifest['js/app.js'] + '.br')).read_bytes()) == data
+    assert report['js/app.js']['br'] < report['js/app.js']['gzip']
+
+    # Повторная сборка без изменений даёт те же имена и байты
+    gz = (tmp_path / (manifest['js/app.js'] + '.gz')).read_bytes()
+    build_assets(STATIC, tmp_path)
+    assert json.loads((tmp_path / 'manifest.json').read_text()) == manifest
+    assert (tmp_path / (manifest['js/app.js'] + '.gz')).read_bytes() == gz
+
+
+@pytest.fixture
+def assets_client(tmp_path, monkeypatch):
+    build_assets(STATIC, tmp_path)
+    monkeypatch.setattr(TestingConfig, 'ASSETS_DIR', str(tmp_path))
+    app = create_app('testing')
+    yield app.test_client(), json.loads((tmp_path / 'manifest.json').read_text())
+    assets.load(TestingConfig.ASSETS_DIR)
+
+
+def test_pages_link_hashed_assets_served_immutable(assets_client):
+    client, manifest = assets_client
+    page = client.get('/login').get_data(as_text=True)
+    assert f"/assets/{manifest['css/style.css']}" in page
+    assert f"/assets/{manifest['js/app.js']}" in page
+
+    url = f"/assets/{manifest['css/style.css']}"
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'Accept-Encoding' in response.vary
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 86400
+    plain = gzip.decompress(response.get_data())
+    response.close()
+
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == plain
+    response.close()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == plain
+    response.close()
+
+    assert client.get('/assets/css/style.css').status_code == 404
+    assert client.get('/assets/manifest.json').status_code == 404
+
+
+def test_without_build_falls_back_to_static(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'ASSETS_DIR', str(tmp_path / 'missing'))
+    app = create_app('testing')
+    page = app.test_client().get('/login').get_data(as_text=True)
+    assert '/static/css/style.css' in page
+    assets.load(TestingConfig.ASSETS_DIR)
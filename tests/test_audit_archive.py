@@ -0,0 +1,111 @@
+"""
+Тесты для колоночного архива записей аудита.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, AuditLog, User
+from app.services import audit_archive
+from app.services.audit_archive import AuditArchive, AuditSegment, archive_audit_logs
+
+NOW = datetime(2026, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def audit_rows(db_session):
+    users = [User(username=f"user{i}", email=f"user{i}@example.com", password_hash="x") for i in range(3)]
+    db_session.add_all(users)
+    db_session.flush()
+    rows = []
+    for day in range(200):
+        for position, user in enumerate([*users, None]):
+            rows.append({
+                "user_id": user.id if user else None,
+                "action": ("create", "update", "delete")[(day + position) % 3],
+                "entity_type": "subscription" if user else "user",
+                "entity_id": day * 10 + position,
+                "timestamp": NOW - timedelta(days=day, minutes=position, microseconds=day),
+                "ip_address": None if day % 7 == 0 else f"10.0.0.{position}",
+                "user_agent": "Mozilla/5.0" if position else None,
+            })
+    db_session.execute(db.insert(AuditLog), rows)
+    db_session.commit()
+    return [user.id for user in users]
+
+
+def _table_rows(db_session, *criteria):
+    records = db_session.execute(db.select(AuditLog).where(*criteria)).scalars()
+    return sorted((record.to_dict() for record in records), key=lambda record: record["id"])
+
+
+def test_export_moves_old_rows_to_segment(db_session, audit_rows, tmp_path):
+    cutoff = NOW - timedelta(days=90)
+    expected = _table_rows(db_session, AuditLog.timestamp < cutoff)
+
+    result = archive_audit_logs(tmp_path, older_than_days=90, block_rows=64, chunk_size=100, now=NOW)
+    assert result["rows"] == result["deleted"] == len(expected) == 110 * 4
+    assert result["path"].exists()
+    assert db_session.query(AuditLog).filter(AuditLog.timestamp < cutoff).count() == 0
+    assert db_session.query(AuditLog).count() == 90 * 4
+
+    archived = sorted(AuditArchive(tmp_path).scan(), key=lambda record: record["id"])
+    assert archived == expected
+
+    with AuditSegment(result["path"]) as segment:
+        assert len(segment.meta["blocks"]) == 7
+        assert segment.meta["max_id"] == max(record["id"] for record in expected)
+
+    # Повторный запуск без новых старых записей не создаёт сегментов
+    assert archive_audit_logs(tmp_path, older_than_days=90, now=NOW)["path"] is None
+    assert AuditArchive(tmp_path).stats()["segments"] == 1
+
+
+def test_scan_by_user_and_time_range(db_session, audit_rows, tmp_path):
+    expected_all = _table_rows(db_session, AuditLog.timestamp < NOW - timedelta(days=30))
+    archive_audit_logs(tmp_path, older_than_days=30, block_rows=16, now=NOW)
+    archive = AuditArchive(tmp_path)
+
+    user_id = audit_rows[1]
+    start, end = NOW - timedelta(days=120), NOW - timedelta(days=60)
+    expected = [
+        record for record in expected_all
+        if record["user_id"] == user_id and start <= record["timestamp"] < end
+    ]
+    found = list(archive.scan(user_id, start, end))
+    assert found == sorted(expected, key=lambda record: record["timestamp"])
+    assert len(found) == 60
+
+    anyone = sorted(archive.scan(start=start, end=end), key=lambda record: record["id"])
+    assert anyone == [record for record in expected_all if start <= record["timestamp"] < end]
+    assert list(archive.scan(user_id=10**6)) == []
+    assert list(archive.scan(start=NOW)) == []
+
+
+def test_interrupted_export_is_not_duplicated(db_session, audit_rows, tmp_path, monkeypatch):
+    original = audit_archive._delete_archived_rows
+
+    def crash(*args):
+        raise RuntimeError("процесс убит после записи сегмента")
+
+    monkeypatch.setattr(audit_archive, "_delete_archived_rows", crash)
+    with pytest.raises(RuntimeError):
+        archive_audit_logs(tmp_path, older_than_days=90, now=NOW)
+    assert db_session.query(AuditLog).count() == 200 * 4
+
+    # Повтор день спустя: сначала дочищаются строки записанного сегмента
+    monkeypatch.setattr(audit_archive, "_delete_archived_rows", original)
+    result = archive_audit_logs(tmp_path, older_than_days=90, now=NOW + timedelta(days=1))
+    assert result["rows"] == 4
+    assert result["deleted"] == 111 * 4
+
+    ids = [record["id"] for record in AuditArchive(tmp_path).scan()]
+    assert len(ids) == len(set(ids)) == 111 * 4
+    assert AuditArchive(tmp_path).stats()["segments"] == 2
+
+
+def test_segment_rejects_foreign_file(tmp_path):
+    path = tmp_path / "audit-broken.seg"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        AuditSegment(path)
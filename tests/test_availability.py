@@ -0,0 +1,68 @@
+"""
+Тесты для проверки занятости имени пользователя и email.
+"""
+import pytest
+from sqlalchemy import event
+
+from app.models import db
+from app.services.availability import BloomFilter, availability_index
+
+
+@pytest.fixture
+def statements(app):
+    """Число SQL запросов, выполненных во время теста."""
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f'user{i}')
+
+    assert all(f'user{i}' in bloom for i in range(10_000))
+    false_positives = sum(f'other{i}' in bloom for i in range(10_000))
+    assert false_positives < 300
+
+
+def test_availability(client, user):
+    response = client.get('/availability?username=testuser&email=TEST@example.com')
+    assert response.status_code == 200
+    assert response.get_json() == {'username': False, 'email': False}
+    assert response.headers['Cache-Control'] == 'no-store'
+
+    response = client.get('/availability?username=newcomer')
+    assert response.get_json() == {'username': True}
+
+    assert client.get('/availability').status_code == 400
+
+
+def test_free_value_answered_without_database(client, user, statements):
+    client.get('/availability?username=testuser')
+    statements.clear()
+
+    response = client.get('/availability?username=newcomer&email=newcomer@example.com')
+    assert response.get_json() == {'username': True, 'email': True}
+    assert statements == []
+
+
+def test_registration_updates_filter(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'AVAILABILITY_REFRESH_INTERVAL', 3600)
+    assert client.get('/availability?username=newcomer').get_json() == {'username': True}
+
+    response = client.post('/register', json={
+        'username': 'newcomer', 'email': 'Newcomer@example.com', 'password': 'Password123!',
+    })
+    assert response.status_code == 201
+    assert availability_index.usernames.count == 1
+
+    response = client.get('/availability?username=newcomer&email=Newcomer@example.com')
+    assert response.get_json() == {'username': False, 'email': False}
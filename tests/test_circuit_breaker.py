@@ -0,0 +1,253 @@
+"""
+Тесты для автомата защиты БД и устаревших ответов при её недоступности.
+
+Отключение БД моделируется на файловой SQLite: пул соединений
+закрывается, а каталог с файлом БД переименовывается, и новые
+подключения падают с "unable to open database file", как при отказе
+сервера в соединении. Возврат каталога - перезапуск БД.
+"""
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, Subscription, User
+from app.services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitOpenError, _is_query_failure, circuit_breaker,
+)
+from app.services.stale_reads import STALE_WARNING, stale_reads
+from config import TestingConfig
+
+BUSY_TIMEOUT = 0.2
+RESET_TIMEOUT = 0.3
+
+
+class Outage:
+    """Недоступный файл SQLite на время "отключения" БД."""
+
+    def __init__(self, app, directory):
+        self.app = app
+        self.directory = directory
+        self.path = directory / 'app.db'
+        self.down = False
+
+    def start(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.rename(self.directory.with_name('db-down'))
+        self.down = True
+
+    def stop(self):
+        self.directory.with_name('db-down').rename(self.directory)
+        self.down = False
+
+
+class Lock:
+    """Эксклюзивная блокировка файла SQLite: БД отвечает, но занята."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute('BEGIN EXCLUSIVE')
+
+    def release(self):
+        self.connection.rollback()
+        self.connection.close()
+
+
+@pytest.fixture
+def outage_app(tmp_path, monkeypatch):
+    directory = tmp_path / 'db'
+    directory.mkdir()
+    path = directory / 'app.db'
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{path}")
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_ENGINE_OPTIONS',
+                        {'connect_args': {'timeout': BUSY_TIMEOUT}}, raising=False)
+    monkeypatch.setattr(TestingConfig, 'CIRCUIT_BREAKER_ENABLED', True)
+    monkeypatch.setattr(TestingConfig, 'CIRCUIT_BREAKER_RESET_TIMEOUT', RESET_TIMEOUT)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user = User(username='outage', email='outage@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        for name in ('Netflix', 'Spotify'):
+            db.session.add(Subscription(user_id=user.id, name=name, amount=100, interval='monthly',
+                                        next_billing_date=date(2026, 7, 1)))
+        db.session.commit()
+        app.config['TEST_USER_ID'] = user.id
+    app.outage = Outage(app, directory)
+    yield app
+    if app.outage.down:
+        app.outage.stop()
+    circuit_breaker.reset()
+    stale_reads.clear()
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def outage_client(outage_app):
+    client = outage_app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(outage_app.config['TEST_USER_ID'])
+        sess['_fresh'] = True
+    return client
+
+
+def _timed(call):
+    started = time.perf_counter()
+    response = call()
+    return response, time.perf_counter() - started
+
+
+def _names(response):
+    return sorted(sub['name'] for sub in response.get_json()['subscriptions'])
+
+
+def test_outage_serves_stale_reads_and_fails_writes_fast(outage_app, outage_client):
+    fresh = outage_client.get('/api/subscriptions')
+    assert fresh.status_code == 200
+    assert 'Warning' not in fresh.headers
+
+    connects = []
+    with outage_app.app_context():
+        # insert=True: счётчик срабатывает раньше проверки автомата
+        event.listen(db.engine, 'do_connect', lambda *args: connects.append(1), insert=True)
+
+    outage_app.outage.start()
+    latencies = []
+    for _ in range(30):
+        response, elapsed = _timed(lambda: outage_client.get('/api/subscriptions'))
+        assert response.status_code == 200
+        assert response.headers['Warning'] == STALE_WARNING
+        assert response.get_data() == fresh.get_data()
+        latencies.append(elapsed)
+    assert circuit_breaker.state == OPEN
+
+    # К БД обращаются только первые запросы, пока автомат закрыт
+    failures = outage_app.config['CIRCUIT_BREAKER_FAILURES']
+    assert len(connects) == failures
+    tail = sorted(latencies[failures:])
+    assert tail[int(len(tail) * 0.99)] < 0.05
+
+    response, elapsed = _timed(lambda: outage_client.post('/api/subscriptions', json={
+        'name': 'Новая', 'amount': 10, 'interval': 'monthly', 'next_billing_date': '2026-07-01'}))
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert elapsed < 0.05
+
+    # Данных другого запроса нет в памяти: сразу 503, а не ожидание БД
+    response, elapsed = _timed(lambda: outage_client.get('/api/subscriptions?fields=name'))
+    assert response.status_code == 503
+    assert elapsed < 0.05
+
+
+def test_breaker_closes_after_restart_and_refreshes_stale_data(outage_app, outage_client):
+    json_only = {'Accept': 'application/json'}
+    assert _names(outage_client.get('/api/subscriptions')) == ['Netflix', 'Spotify']
+    assert _names(outage_client.get('/api/subscriptions', headers=json_only)) == ['Netflix', 'Spotify']
+    outage_app.outage.start()
+    for _ in range(outage_app.config['CIRCUIT_BREAKER_FAILURES']):
+        assert 'Warning' in outage_client.get('/api/subscriptions').headers
+    assert circuit_breaker.state == OPEN
+    assert 'Warning' in outage_client.get('/api/subscriptions', headers=json_only).headers
+
+    # БД перезапущена, и за время отключения данные изменились
+    outage_app.outage.stop()
+    with sqlite3.connect(outage_app.outage.path) as connection:
+        connection.execute("UPDATE subscriptions SET name = 'Кинопоиск' WHERE name = 'Netflix'")
+
+    time.sleep(RESET_TIMEOUT)
+    response = outage_client.get('/api/subscriptions')
+    assert response.status_code == 200
+    assert 'Warning' not in response.headers
+    assert _names(response) == ['Spotify', 'Кинопоиск']
+    assert circuit_breaker.state == CLOSED
+
+    # Оба ответа, отданные устаревшими, обновлены в фоне после закрытия
+    # автомата: при следующем отключении они уже содержат новые данные
+    deadline = time.monotonic() + 2
+    while stale_reads.stats['refreshed'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stale_reads.stats['refreshed'] == 2
+    outage_app.outage.start()
+    response = outage_client.get('/api/subscriptions', headers=json_only)
+    assert response.headers['Warning'] == STALE_WARNING
+    assert _names(response) == ['Spotify', 'Кинопоиск']
+
+
+def test_other_user_reads_served_stale(outage_app, outage_client):
+    subscription_id = outage_client.get('/api/subscriptions').get_json()['subscriptions'][0]['id']
+    paths = [f'/api/subscriptions/{subscription_id}', '/api/subscriptions/changes?since=0',
+             '/api/subscriptions/search?q=net', '/api/audit_logs', '/subscriptions']
+    fresh = {path: outage_client.get(path) for path in paths}
+    assert all(response.status_code == 200 for response in fresh.values())
+
+    outage_app.outage.start()
+    for _ in range(outage_app.config['CIRCUIT_BREAKER_FAILURES']):
+        outage_client.get('/api/subscriptions')
+    assert circuit_breaker.state == OPEN
+    for path in paths:
+        response = outage_client.get(path)
+        assert response.status_code == 200, path
+        assert response.headers['Warning'] == STALE_WARNING
+        assert response.get_data() == fresh[path].get_data()
+    assert outage_client.get(paths[0]).headers['ETag'] == fresh[paths[0]].headers['ETag']
+
+
+def test_half_open_lets_single_probe_through():
+    circuit_breaker.reset()
+    circuit_breaker.failure_threshold, circuit_breaker.reset_timeout = 2, 0.05
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CLOSED
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CLOSED
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == OPEN
+    assert not circuit_breaker.allow()
+
+    time.sleep(0.06)
+    assert circuit_breaker.allow()
+    assert circuit_breaker.state == HALF_OPEN
+    other = []
+    thread = threading.Thread(target=lambda: other.append(circuit_breaker.allow()))
+    thread.start()
+    thread.join()
+    assert other == [False]
+    assert circuit_breaker.allow()
+
+    # Неудачная проба снова открывает автомат
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker._check()
+    circuit_breaker.reset()
+
+
+def test_disabled_breaker_does_not_touch_requests(authenticated_client):
+    for _ in range(10):
+        circuit_breaker.record_failure()
+    response = authenticated_client.get('/api/subscriptions')
+    assert response.status_code == 200
+    assert 'Warning' not in response.headers
+    circuit_breaker.reset()
+
+
+def test_lock_timeouts_and_cancelled_queries_do_not_open_breaker(outage_app, outage_client):
+    assert outage_client.get('/api/subscriptions').status_code == 200
+    lock = Lock(outage_app.outage.path)
+    try:
+        for _ in range(outage_app.config['CIRCUIT_BREAKER_FAILURES'] + 1):
+            outage_client.get('/api/subscriptions')
+    finally:
+        lock.release()
+    assert circuit_breaker.state == CLOSED
+
+    assert _is_query_failure(sqlite3.OperationalError('interrupted'))
+    assert not _is_query_failure(sqlite3.OperationalError('unable to open database file'))
@@ -0,0 +1,99 @@
+"""
+Тесты для оптимистической блокировки подписок (If-Match / версии).
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, Subscription
+
+
+@pytest.fixture
+def subscription_id(db_session, user):
+    subscription = Subscription(
+        user_id=user.id,
+        name="Netflix",
+        amount=999,
+        interval="monthly",
+        next_billing_date=date(2024, 12, 1),
+    )
+    db_session.add(subscription)
+    db_session.commit()
+    return subscription.id
+
+
+@pytest.fixture
+def statements(app):
+    """Список SQL запросов к таблице subscriptions, выполненных во время теста."""
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if 'subscriptions' in statement:
+            executed.append(statement.split()[0].upper())
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_patch_single_round_trip(authenticated_client, subscription_id, statements):
+    response = authenticated_client.patch(
+        f"/api/subscriptions/{subscription_id}",
+        json={"amount": 1099},
+        headers={"If-Match": '"1"'},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+    assert statements == ["UPDATE"]
+
+
+def test_patch_stale_version(authenticated_client, subscription_id):
+    authenticated_client.patch(f"/api/subscriptions/{subscription_id}", json={"name": "First"})
+
+    response = authenticated_client.patch(
+        f"/api/subscriptions/{subscription_id}",
+        json={"name": "Second"},
+        headers={"If-Match": '"1"'},
+    )
+
+    assert response.status_code == 412
+    assert response.get_json()["version"] == 2
+    assert db.session.get(Subscription, subscription_id).name == "First"
+
+
+def test_patch_not_found_and_forbidden(authenticated_client, db_session):
+    foreign = Subscription(user_id=9999, name="Чужая", amount=10, interval="monthly",
+                           next_billing_date=date(2024, 12, 1))
+    db_session.add(foreign)
+    db_session.commit()
+
+    assert authenticated_client.patch("/api/subscriptions/12345", json={"name": "X"}).status_code == 404
+    assert authenticated_client.patch(f"/api/subscriptions/{foreign.id}", json={"name": "X"}).status_code == 403
+    assert authenticated_client.delete(f"/api/subscriptions/{foreign.id}").status_code == 403
+
+
+def test_delete_with_if_match(authenticated_client, subscription_id, statements):
+    response = authenticated_client.delete(
+        f"/api/subscriptions/{subscription_id}",
+        headers={"If-Match": '"7"'},
+    )
+    assert response.status_code == 412
+
+    del statements[:]
+    response = authenticated_client.delete(
+        f"/api/subscriptions/{subscription_id}",
+        headers={"If-Match": '"1"'},
+    )
+    assert response.status_code == 200
+    assert statements == ["DELETE"]
+
+
+def test_get_returns_etag(authenticated_client, subscription_id):
+    response = authenticated_client.get(f"/api/subscriptions/{subscription_id}")
+
+    assert response.headers["ETag"] == '"1"'
@@ -0,0 +1,67 @@
+"""
+Тесты для дедлайнов запросов.
+"""
+from sqlalchemy import text
+
+from app.models import db
+from app.services.deadlines import deadline, deadline_metrics
+
+# Бесконечный рекурсивный запрос: завершается только отменой
+SLOW_QUERY = text(
+    'WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter) '
+    'SELECT count(*) FROM counter'
+)
+
+
+def _exceeded(path):
+    return deadline_metrics()['exceeded'].get(path, 0)
+
+
+def test_every_route_declares_budget(app):
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.startswith(('api.', 'auth.')):
+            view = app.view_functions[rule.endpoint]
+            assert getattr(view, 'deadline_ms', None), rule.endpoint
+
+
+def test_slow_query_is_cancelled_with_503(app):
+    @deadline(50)
+    def slow_view():
+        db.session.execute(SLOW_QUERY).scalar()
+        return 'ok'
+
+    before = _exceeded('/slow')
+    with app.test_request_context('/slow'):
+        body, status, headers = slow_view()
+
+    assert status == 503
+    assert headers['Retry-After'] == '1'
+    assert _exceeded('/slow') == before + 1
+    # Сессия пригодна для следующих запросов
+    assert db.session.execute(text('SELECT 1')).scalar() == 1
+
+
+def test_swallowed_cancellation_still_returns_503(app):
+    @deadline(50)
+    def careless_view():
+        try:
+            db.session.execute(SLOW_QUERY).scalar()
+        except Exception:
+            return 'Ошибка', 500
+        return 'ok'
+
+    with app.test_request_context('/careless'):
+        _, status, _ = careless_view()
+    assert status == 503
+
+
+def test_budget_does_not_outlive_view(app):
+    @deadline(50)
+    def fast_view():
+        return 'ok'
+
+    with app.test_request_context('/fast'):
+        assert fast_view() == 'ok'
+        # Запросы после роута (потоковые ответы) не ограничены бюджетом
+        db.session.rollback()
+        assert db.session.execute(text('SELECT 1')).scalar() == 1
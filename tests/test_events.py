@@ -0,0 +1,112 @@
+"""
+Тесты для ленты изменений (server-sent events).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.events import ChangeNotifier, format_event, stream_slots
+from app.services.sync import compact_tombstones
+
+
+@pytest.fixture
+def short_stream(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTS_HEARTBEAT_INTERVAL', 0.05)
+    monkeypatch.setitem(app.config, 'EVENTS_STREAM_TIMEOUT', 0.2)
+
+
+def _create(client, name):
+    return client.post("/api/subscriptions", json={
+        "name": name,
+        "amount": 100,
+        "interval": "monthly",
+        "next_billing_date": "2024-12-01",
+    }).get_json()["id"]
+
+
+def test_format_event():
+    assert format_event('{"id": 1}', event='delete', event_id=7) == \
+        'id: 7\nevent: delete\ndata: {"id": 1}\n\n'
+
+
+def test_notifier_wakes_waiter():
+    notifier = ChangeNotifier()
+    result = {}
+
+    def waiter():
+        started = time.monotonic()
+        result['woken'] = notifier.wait(1, since=3, timeout=5)
+        result['elapsed'] = time.monotonic() - started
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while notifier.waiting() == 0:
+        time.sleep(0.001)
+    notifier.notify(1, 3)  # не новее since: ожидание продолжается
+    notifier.notify(1, 4)
+    thread.join()
+
+    assert result['woken'] is True
+    assert result['elapsed'] < 1
+    assert notifier.waiting() == 0
+
+
+def test_stream_resumes_from_last_event_id(authenticated_client, short_stream):
+    first = _create(authenticated_client, "First")
+    second = _create(authenticated_client, "Second")
+    authenticated_client.delete(f"/api/subscriptions/{first}")
+
+    response = authenticated_client.get(
+        "/api/subscriptions/events",
+        headers={"Last-Event-ID": "1"},
+    )
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert body.startswith("retry: ")
+    assert 'id: 2\nevent: upsert\ndata: ' in body
+    assert f'"id":{second}' in body.replace(' ', '')
+    assert 'id: 3\nevent: delete\n' in body
+    assert ": heartbeat" in body
+
+
+def test_stream_without_last_event_id_starts_at_current_state(authenticated_client, short_stream):
+    _create(authenticated_client, "Existing")
+
+    body = authenticated_client.get("/api/subscriptions/events").get_data(as_text=True)
+
+    assert "event:" not in body
+    assert ": heartbeat" in body
+
+
+def test_stream_requests_resync_for_stale_token(authenticated_client, short_stream):
+    subscription_id = _create(authenticated_client, "Old")
+    authenticated_client.delete(f"/api/subscriptions/{subscription_id}")
+    compact_tombstones(retention_days=0, now=datetime.utcnow() + timedelta(seconds=1))
+
+    body = authenticated_client.get(
+        "/api/subscriptions/events",
+        headers={"Last-Event-ID": "1"},
+    ).get_data(as_text=True)
+
+    assert "event: resync" in body
+
+
+def test_streams_per_worker_are_capped(app, authenticated_client, short_stream, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTS_MAX_STREAMS', 1)
+    first = authenticated_client.get("/api/subscriptions/events", buffered=False)
+    assert first.status_code == 200
+
+    refused = authenticated_client.get("/api/subscriptions/events")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == str(app.config['EVENTS_RETRY_AFTER'])
+
+    # Закрытие потока освобождает место, даже если он не читался
+    first.close()
+    assert stream_slots.open == 0
+    second = authenticated_client.get("/api/subscriptions/events")
+    assert second.status_code == 200
+    second.get_data()
+    assert stream_slots.open == 0
@@ -0,0 +1,58 @@
+"""
+Тесты для ?fields= (sparse fieldsets).
+"""
+from sqlalchemy import event
+
+from app.models import db
+
+
+def _create(client, name):
+    response = client.post("/api/subscriptions", json={
+        "name": name,
+        "amount": 100,
+        "interval": "monthly",
+        "next_billing_date": "2026-12-01",
+    })
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def _selects(client, url):
+    statements = []
+    listener = lambda conn, cursor, sql, *args: statements.append(sql)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return response, [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def test_list_selects_only_requested_columns(authenticated_client):
+    _create(authenticated_client, "Netflix")
+
+    response, selects = _selects(authenticated_client, "/api/subscriptions?fields=name,id,amount")
+    assert response.status_code == 200
+    assert response.get_json() == {"subscriptions": [{"amount": 100.0, "id": 1, "name": "Netflix"}]}
+    listing = [sql for sql in selects if "FROM subscriptions" in sql]
+    assert len(listing) == 1
+    assert "created_at" not in listing[0] and "interval" not in listing[0]
+
+
+def test_single_subscription_and_audit_fields(authenticated_client):
+    subscription_id = _create(authenticated_client, "Netflix")
+
+    response = authenticated_client.get(f"/api/subscriptions/{subscription_id}?fields=name,version")
+    assert response.get_json() == {"name": "Netflix", "version": 1}
+    assert response.headers["ETag"] == '"1"'
+
+    response = authenticated_client.get("/api/audit_logs?fields=action,entity_id")
+    assert response.get_json() == {"audit_logs": [{"action": "create", "entity_id": subscription_id}]}
+
+
+def test_unknown_fields_are_rejected(authenticated_client):
+    response = authenticated_client.get("/api/subscriptions?fields=name,password_hash")
+    assert response.status_code == 400
+    assert "password_hash" in response.get_json()["error"]
+    assert authenticated_client.get("/api/audit_logs?fields=").status_code == 400
+    assert authenticated_client.get("/api/subscriptions/1?fields=user").status_code == 400
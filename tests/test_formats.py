@@ -0,0 +1,77 @@
+"""
+Тесты для согласования формата списков и сжатия ответов.
+"""
+import gzip
+
+import brotli
+import msgpack
+
+from app.services import formats
+
+
+def _create(client, name):
+    response = client.post("/api/subscriptions", json={
+        "name": name,
+        "amount": 100,
+        "interval": "monthly",
+        "next_billing_date": "2026-12-01",
+    })
+    assert response.status_code == 201
+
+
+def test_columnar_json_list(authenticated_client):
+    _create(authenticated_client, "Netflix")
+    _create(authenticated_client, "Spotify")
+    rows = authenticated_client.get("/api/subscriptions").get_json()["subscriptions"]
+
+    response = authenticated_client.get("/api/subscriptions", headers={"Accept": formats.COLUMNAR_JSON})
+    assert response.status_code == 200
+    assert response.mimetype == formats.COLUMNAR_JSON
+    assert "Accept" in response.vary
+    data = response.get_json(force=True)
+    assert data["count"] == 2
+    assert data["subscriptions"]["name"] == [row["name"] for row in rows]
+    assert data["subscriptions"]["amount"] == [100.0, 100.0]
+
+
+def test_unsupported_accept_returns_406(authenticated_client):
+    response = authenticated_client.get("/api/audit_logs", headers={"Accept": "text/csv"})
+    assert response.status_code == 406
+    assert formats.JSON in response.get_json()["formats"]
+
+
+def test_gzip_compression(authenticated_client, monkeypatch):
+    monkeypatch.setattr(formats, "brotli", None)
+    for i in range(20):
+        _create(authenticated_client, f"Subscription {i}")
+
+    plain = authenticated_client.get("/api/subscriptions")
+    compressed = authenticated_client.get("/api/subscriptions", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.vary
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+    small = authenticated_client.get("/api/subscriptions/1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_brotli_preferred_when_accepted(authenticated_client):
+    for i in range(20):
+        _create(authenticated_client, f"Subscription {i}")
+
+    plain = authenticated_client.get("/api/subscriptions")
+    compressed = authenticated_client.get("/api/subscriptions", headers={"Accept-Encoding": "gzip, br"})
+    assert compressed.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(compressed.get_data()) == plain.get_data()
+
+
+def test_msgpack_list(authenticated_client):
+    _create(authenticated_client, "Netflix")
+
+    response = authenticated_client.get("/api/subscriptions", headers={"Accept": formats.MSGPACK})
+    assert response.mimetype == formats.MSGPACK
+    rows = msgpack.unpackb(response.get_data())["subscriptions"]
+    assert rows[0]["name"] == "Netflix"
+    assert rows[0]["amount"] == 100.0
+    assert rows[0]["next_billing_date"] == "2026-12-01"
@@ -0,0 +1,96 @@
+"""
+Тесты для хуков gunicorn.conf.py (preload_app и fork воркеров).
+"""
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app import create_app
+from app.models import db
+from app.services.reminders import reminder_scheduler
+from config import TestingConfig
+
+CONF_PATH = Path(__file__).resolve().parent.parent / 'gunicorn.conf.py'
+
+
+class _Log:
+    def info(self, message):
+        pass
+
+
+class _Scheduler:
+    started = 0
+
+    def start(self):
+        self.started += 1
+
+
+@pytest.fixture
+def conf(monkeypatch):
+    # Модуль конфигурации выставляет REMINDER_SCHEDULER_AUTOSTART=0
+    monkeypatch.setenv('REMINDER_SCHEDULER_AUTOSTART', '1')
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def preloaded_app(monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'REMINDER_SCHEDULER_ENABLED', True)
+    monkeypatch.setattr(TestingConfig, 'REMINDER_SCHEDULER_AUTOSTART', False)
+    app = create_app('testing')
+    app.extensions['reminder_scheduler'] = _Scheduler()
+    return app
+
+
+def test_conf_preloads_app(conf):
+    assert conf.preload_app is True
+    assert conf.wsgi_app == 'wsgi:app'
+    assert conf.workers >= 3
+    assert conf.max_requests_jitter > 0
+
+
+def test_scheduler_not_started_before_fork(preloaded_app):
+    assert reminder_scheduler._thread is None
+
+
+def test_reminders_run_in_one_worker(conf):
+    server = SimpleNamespace(WORKERS={}, log=_Log())
+    workers = [SimpleNamespace() for _ in range(3)]
+    for pid, worker in enumerate(workers, 1):
+        conf.pre_fork(server, worker)
+        server.WORKERS[pid] = worker
+    assert [worker.runs_reminders for worker in workers] == [True, False, False]
+
+    # Воркер с планировщиком перезапущен: его роль переходит к новому
+    del server.WORKERS[1]
+    replacement = SimpleNamespace()
+    conf.pre_fork(server, replacement)
+    assert replacement.runs_reminders
+
+
+def test_post_fork_resets_pool_and_starts_scheduler(conf, preloaded_app):
+    with preloaded_app.app_context():
+        pool = db.engine.pool
+    server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: preloaded_app), log=_Log())
+
+    conf.post_fork(server, SimpleNamespace(pid=2, runs_reminders=False))
+    assert preloaded_app.extensions['reminder_scheduler'].started == 0
+    conf.post_fork(server, SimpleNamespace(pid=1, runs_reminders=True))
+    assert preloaded_app.extensions['reminder_scheduler'].started == 1
+
+    with preloaded_app.app_context():
+        assert db.engine.pool is not pool
+
+
+def test_scripts_do_not_start_scheduler(monkeypatch):
+    # create_app из скриптов (outbox_worker.py, архивация, revenue_report)
+    # не запускает планировщик, даже если он включён в окружении
+    started = []
+    monkeypatch.setattr(TestingConfig, 'REMINDER_SCHEDULER_ENABLED', True)
+    monkeypatch.setattr(reminder_scheduler, 'start', lambda: started.append(True))
+    create_app('testing')
+    assert started == []
@@ -0,0 +1,140 @@
+"""
+Тесты для Idempotency-Key.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import db, AuditLog, IdempotencyKey, Subscription
+from app.routes import api
+from app.services.idempotency import Reservation, _complete, idempotency_store
+
+PAYLOAD = {
+    "name": "Netflix",
+    "amount": 499.0,
+    "interval": "monthly",
+    "next_billing_date": "2026-12-01",
+}
+
+
+def _post(client, key, payload=PAYLOAD):
+    return client.post("/api/subscriptions", json=payload, headers={"Idempotency-Key": key})
+
+
+def test_replay_returns_stored_response_without_queries(app, authenticated_client):
+    first = _post(authenticated_client, "key-1")
+    assert first.status_code == 201
+    stored = db.session.query(IdempotencyKey).one()
+    assert (stored.key, stored.status_code) == ("key-1", 201)
+
+    statements = []
+    listener = lambda conn, cursor, sql, *args: statements.append(sql)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        replay = _post(authenticated_client, "key-1")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.headers["ETag"] == first.headers["ETag"]
+    assert replay.get_json() == first.get_json()
+    assert not [sql for sql in statements if "subscriptions" in sql]
+    assert db.session.query(Subscription).count() == 1
+    assert db.session.query(AuditLog).filter_by(action="create").count() == 1
+
+
+def test_key_reused_with_other_payload(authenticated_client):
+    assert _post(authenticated_client, "key-2").status_code == 201
+    response = _post(authenticated_client, "key-2", dict(PAYLOAD, name="Spotify"))
+    assert response.status_code == 422
+    assert _post(authenticated_client, "key-3", dict(PAYLOAD, name="Spotify")).status_code == 201
+
+
+def test_key_reserved_by_other_worker_is_waited_for(app, authenticated_client, user, monkeypatch):
+    # Другой воркер зарезервировал ключ и ещё не сохранил ответ
+    body = json.dumps(PAYLOAD).encode()
+    reservation = Reservation(user.id, "api.create_subscription", "key-4",
+                              hashlib.blake2b(body, digest_size=16).digest())
+    idempotency_store.reserve(reservation)
+    db.session.commit()
+
+    monkeypatch.setitem(app.config, "IDEMPOTENCY_WAIT", 0.1)
+    response = authenticated_client.post("/api/subscriptions", data=body, headers={
+        "Idempotency-Key": "key-4", "Content-Type": "application/json"})
+    assert response.status_code == 409
+
+    _complete(reservation, 201, b'{"id": 7}', [["Content-Type", "application/json"]])
+    db.session.commit()
+    response = authenticated_client.post("/api/subscriptions", data=body, headers={
+        "Idempotency-Key": "key-4", "Content-Type": "application/json"})
+    assert response.status_code == 201
+    assert response.get_json() == {"id": 7}
+
+    # Строка не видна при проверке (COMMIT другого воркера позже): запись
+    # упирается в уникальный ключ, откатывается, и отдаётся его ответ
+    lookup, calls = idempotency_store.lookup, []
+    monkeypatch.setattr(idempotency_store, "lookup",
+                        lambda *args: lookup(*args) if calls.append(1) or len(calls) > 1 else None)
+    conflicts = idempotency_store.stats["conflicts"]
+    response = authenticated_client.post("/api/subscriptions", data=body, headers={
+        "Idempotency-Key": "key-4", "Content-Type": "application/json"})
+    assert response.get_json() == {"id": 7}
+    assert idempotency_store.stats["conflicts"] == conflicts + 1
+    assert db.session.query(Subscription).count() == 0
+
+
+def test_failed_write_releases_key(authenticated_client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("outbox недоступен")
+
+    monkeypatch.setattr(api.outbox, "enqueue", broken)
+    assert _post(authenticated_client, "key-5").status_code == 500
+    assert db.session.query(IdempotencyKey).count() == 0
+    assert db.session.query(Subscription).count() == 0
+
+    monkeypatch.undo()
+    assert _post(authenticated_client, "key-5").status_code == 201
+    assert db.session.query(Subscription).count() == 1
+
+
+def test_expired_keys_are_reused_and_purged(authenticated_client):
+    assert _post(authenticated_client, "key-6").status_code == 201
+    assert _post(authenticated_client, "key-7").status_code == 201
+    db.session.execute(db.update(IdempotencyKey).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    # Просроченный ключ можно использовать с другим телом
+    assert _post(authenticated_client, "key-6", dict(PAYLOAD, name="Spotify")).status_code == 201
+    assert idempotency_store.purge_expired() == 1
+    assert db.session.execute(db.select(IdempotencyKey.key)).scalars().all() == ["key-6"]
+
+
+def test_unfinished_key_is_taken_over_after_lease(authenticated_client, monkeypatch):
+    # Ответ не сохранился (например, писатель не успел): запрос всё равно
+    # получает свой ответ, а ключ остаётся "в работе"
+    def broken(*args):
+        raise RuntimeError("писатель недоступен")
+
+    monkeypatch.setattr(idempotency_store, "complete", broken)
+    assert _post(authenticated_client, "key-8").status_code == 201
+    monkeypatch.undo()
+    assert db.session.query(IdempotencyKey).one().status_code is None
+
+    # Пока аренда не истекла, повтор ждёт первый запрос
+    monkeypatch.setitem(authenticated_client.application.config, "IDEMPOTENCY_WAIT", 0.1)
+    assert _post(authenticated_client, "key-8").status_code == 409
+
+    # После аренды повтор забирает ключ и выполняется заново
+    db.session.execute(db.update(IdempotencyKey).values(
+        created_at=datetime.utcnow() - timedelta(seconds=idempotency_store.lease + 1)))
+    db.session.commit()
+    taken_over = idempotency_store.stats["taken_over"]
+    response = _post(authenticated_client, "key-8")
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert idempotency_store.stats["taken_over"] == taken_over + 1
+    assert db.session.query(IdempotencyKey).one().status_code == 201
+    assert _post(authenticated_client, "key-8").headers["Idempotent-Replayed"] == "true"
@@ -0,0 +1,50 @@
+"""
+Тесты для JSON провайдера.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.utils import json_provider
+
+NAMES = ["Netflix", "Яндекс Плюс", "emoji 🎵", "tab\t\"q\" \\ /", "ctl\x01\x1f\x7f", "<b>&</b>"]
+
+
+def _payload(native):
+    convert = (lambda value: value) if native else (
+        lambda value: float(value) if isinstance(value, Decimal) else value.isoformat()
+    )
+    return {
+        "subscriptions": [
+            {
+                "name": name,
+                "amount": convert(Decimal(amount)),
+                "next_billing_date": convert(date(2026, 1, i + 1)),
+                "created_at": convert(datetime(2026, 1, 1, 12, 0, 0, i * 1000)),
+                "id": i,
+                "is_active": None if i == 3 else bool(i % 2),
+            }
+            for i, (name, amount) in enumerate(zip(NAMES, ["499.00", "9.99", "0.10", "12345678.91", "1", "0.01"]))
+        ]
+    }
+
+
+def _expected():
+    return json.dumps(_payload(native=False), ensure_ascii=True, sort_keys=True,
+                      separators=(",", ":")).encode() + b"\n"
+
+
+def test_response_is_byte_identical_to_stdlib(app):
+    with app.test_request_context():
+        assert app.json.response(_payload(native=True)).get_data() == _expected()
+
+
+def test_stdlib_fallback_without_orjson(app, monkeypatch):
+    monkeypatch.setattr(json_provider, "orjson", None)
+    with app.test_request_context():
+        assert app.json.response(_payload(native=True)).get_data() == _expected()
+
+
+def test_dumps_keeps_flask_format(app):
+    data = {"b": Decimal("1.50"), "a": date(2026, 1, 2), "c": "ё"}
+    assert app.json.dumps(data) == '{"a": "2026-01-02", "b": 1.5, "c": "\\u0451"}'
@@ -0,0 +1,88 @@
+"""
+Тесты для transactional outbox.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, OutboxEvent
+from app.services.outbox import LocalWebhookReceiver, OutboxDispatcher, outbox_lag, post_batch
+
+
+@pytest.fixture
+def receiver(app, monkeypatch):
+    with LocalWebhookReceiver() as receiver:
+        monkeypatch.setitem(app.config, "OUTBOX_ENDPOINTS", [receiver.url])
+        yield receiver
+
+
+@pytest.fixture
+def dispatcher(app):
+    dispatcher = OutboxDispatcher(app)
+    yield dispatcher
+    dispatcher.close()
+
+
+def _create(client, name):
+    response = client.post("/api/subscriptions", json={
+        "name": name,
+        "amount": 100,
+        "interval": "monthly",
+        "next_billing_date": "2026-12-01",
+    })
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def test_changes_are_written_to_outbox_and_delivered(authenticated_client, receiver, dispatcher):
+    subscription_id = _create(authenticated_client, "Netflix")
+    authenticated_client.patch(f"/api/subscriptions/{subscription_id}", json={"amount": 200})
+    authenticated_client.delete(f"/api/subscriptions/{subscription_id}")
+    assert db.session.query(OutboxEvent).count() == 3
+
+    assert dispatcher.run_once() == 3
+    events = receiver.events
+    assert [e["type"] for e in events] == [
+        "subscription.created", "subscription.updated", "subscription.deleted"
+    ]
+    assert events[1]["data"]["amount"] == 200.0
+    assert events[2]["data"] is None
+    assert len(receiver.batches) == 1
+    assert outbox_lag() == {}
+
+
+def test_failed_change_leaves_no_event(authenticated_client, receiver):
+    response = authenticated_client.patch("/api/subscriptions/999", json={"amount": 1})
+    assert response.status_code == 404
+    db.session.rollback()
+    assert db.session.query(OutboxEvent).count() == 0
+
+
+def test_failed_batch_is_retried_in_order(app, authenticated_client, dispatcher, monkeypatch):
+    with LocalWebhookReceiver(statuses=[500]) as receiver:
+        monkeypatch.setitem(app.config, "OUTBOX_ENDPOINTS", [receiver.url])
+        first = _create(authenticated_client, "Netflix")
+
+        dispatcher.retry_base = 60
+        now = datetime.utcnow()
+        assert dispatcher.run_once(now) == 0
+        assert receiver.url in outbox_lag(now)
+
+        # Новое событие той же подписки ждёт повтора первого, другой - нет
+        authenticated_client.patch(f"/api/subscriptions/{first}", json={"amount": 200})
+        second = _create(authenticated_client, "Spotify")
+
+        assert dispatcher.run_once() == 1
+        assert [e["subscription_id"] for e in receiver.events] == [second]
+
+        assert dispatcher.run_once(now + timedelta(seconds=60)) == 2
+        assert [(e["subscription_id"], e["type"]) for e in receiver.events[1:]] == [
+            (first, "subscription.created"), (first, "subscription.updated")
+        ]
+
+
+def test_endpoints_must_be_http(app, authenticated_client, monkeypatch):
+    monkeypatch.setitem(app.config, "OUTBOX_ENDPOINTS", ["file:///etc/passwd"])
+    with pytest.raises(ValueError):
+        OutboxDispatcher(app)
+    assert post_batch("file:///etc/passwd", b"{}", timeout=1) is False
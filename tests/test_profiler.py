@@ -0,0 +1,65 @@
+"""
+Тесты для профилировщика запросов.
+"""
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.models import db, User
+from app.services.profiler import StackSampler
+from config import TestingConfig
+
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_collects_collapsed_stacks():
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    _busy_loop(0.1)
+    sampler.stop()
+
+    assert sampler.samples > 0
+    lines = sampler.collapsed().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1] == "tests/test_profiler:_busy_loop"
+
+
+def test_profiler_is_not_installed_without_token(app):
+    assert app.before_request_funcs.get(None, []) == []
+
+
+@pytest.fixture
+def profiled_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, "PROFILER_TOKEN", "secret", raising=False)
+    monkeypatch.setattr(TestingConfig, "PROFILER_INTERVAL", 0.001, raising=False)
+    monkeypatch.setattr(TestingConfig, "PROFILER_OUTPUT_DIR", str(tmp_path), raising=False)
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        user = User(username="profiled", email="profiled@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+    return client
+
+
+def test_profile_written_only_for_authorized_requests(profiled_client, tmp_path):
+    assert "X-Profile-File" not in profiled_client.get("/api/subscriptions").headers
+    assert "X-Profile-File" not in profiled_client.get(
+        "/api/subscriptions", headers={"X-Profile": "wrong"}).headers
+
+    response = profiled_client.get("/api/subscriptions", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    name = response.headers["X-Profile-File"]
+    assert [path.name for path in tmp_path.iterdir()] == [name]
+    assert "api_get_subscriptions" in name
@@ -0,0 +1,34 @@
+"""
+Тесты для реестра заранее построенных запросов.
+"""
+from app.services.queries import (
+    active_subscriptions_by_user, reset_statement_cache_stats, statement_cache_stats
+)
+
+
+def test_statement_built_once():
+    assert active_subscriptions_by_user() is active_subscriptions_by_user()
+
+
+def test_hot_paths_hit_caches(authenticated_client):
+    # Прогрев: первые обращения строят запросы и компилируют SQL
+    authenticated_client.get("/api/subscriptions")
+    authenticated_client.get("/api/audit_logs")
+    reset_statement_cache_stats()
+
+    for _ in range(3):
+        assert authenticated_client.get("/api/subscriptions").status_code == 200
+        assert authenticated_client.get("/api/audit_logs").status_code == 200
+
+    stats = statement_cache_stats()
+    # Список подписок и аудит (пользователь уже загружен в контексте теста)
+    assert stats['registry'] == {'hit': 6}
+    assert 'cache_miss' not in stats['compiled']
+    assert stats['compiled']['cache_hit'] >= 6
+
+
+def test_get_subscription_not_found(authenticated_client):
+    response = authenticated_client.get("/api/subscriptions/404")
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Ресурс не найден'}
@@ -0,0 +1,279 @@
+"""
+Регрессионные тесты планов горячих запросов (только PostgreSQL).
+
+Тесты заполняют отдельную базу PLAN_TEST_DATABASE_URL реалистичным
+объёмом данных, выполняют запросы роутов api_bp и auth_bp (и load_user)
+через тестовый клиент, перехватывают каждый SQL запрос и получают его
+план через EXPLAIN (FORMAT JSON). План сравнивается с эталоном
+tests/query_plans.json: тест падает, если план перестал использовать
+индекс из эталона, начал последовательно читать новую таблицу или его
+оценка стоимости выросла больше чем в PLAN_COST_TOLERANCE раз.
+
+База PLAN_TEST_DATABASE_URL пересоздаётся при каждом запуске. Без неё
+тесты пропускаются. Эталон перезаписывается запуском с
+UPDATE_QUERY_PLANS=1:
+
+    PLAN_TEST_DATABASE_URL=postgresql+psycopg2://localhost/subscriptions_plans \\
+    UPDATE_QUERY_PLANS=1 pytest tests/test_query_plans.py
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, text
+
+from app import create_app
+from app.models import db, User
+from config import TestingConfig
+
+DATABASE_URL = os.environ.get('PLAN_TEST_DATABASE_URL')
+UPDATE_BASELINE = os.environ.get('UPDATE_QUERY_PLANS') == '1'
+BASELINE_PATH = Path(__file__).with_name('query_plans.json')
+
+# Допустимый рост оценки стоимости относительно эталона
+PLAN_COST_TOLERANCE = 1.5
+
+# Объём данных: при таких размерах планировщик выбирает те же планы,
+# что и в production
+USERS = 5_000
+SUBSCRIPTIONS_PER_USER = 40
+ARCHIVED_PER_USER = 20
+TOMBSTONES_PER_USER = 10
+AUDIT_LOGS_PER_USER = 100
+PASSWORD = 'PlanTest123!'
+
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL or not DATABASE_URL.startswith('postgresql'),
+    reason='Нужна PostgreSQL база PLAN_TEST_DATABASE_URL',
+)
+
+_SEED_SQL = [
+    "SELECT setseed(0.42)",
+    """
+    INSERT INTO users (username, email, password_hash, created_at, change_seq, sync_floor_seq)
+    SELECT 'user' || g, 'user' || g || '@example.com', :password_hash,
+           now() - g * interval '1 minute', :per_user, 0
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO subscriptions (user_id, name, amount, interval, next_billing_date,
+                               is_active, created_at, updated_at, version, change_seq)
+    SELECT u.id, 'Subscription ' || u.id || '-' || s, round((random() * 5000)::numeric, 2),
+           CASE WHEN s % 5 = 0 THEN 'yearly' ELSE 'monthly' END,
+           current_date + (random() * 365)::int, random() > 0.1,
+           now(), now(), 1, s
+    FROM users u, generate_series(1, :per_user) s
+    """,
+    """
+    INSERT INTO subscriptions_archive (id, user_id, name, amount, interval, next_billing_date,
+                                       is_active, created_at, updated_at, version,
+                                       change_seq, archived_at)
+    SELECT 100000000 + u.id * 1000 + s, u.id, 'Archived ' || s, 99.00, 'monthly',
+           current_date - s, false, now() - interval '1 year', now() - interval '1 year',
+           1, 0, now()
+    FROM users u, generate_series(1, :archived) s
+    """,
+    """
+    INSERT INTO subscription_tombstones (user_id, subscription_id, change_seq, deleted_at)
+    SELECT u.id, 200000000 + u.id * 1000 + s, s, now() - s * interval '1 day'
+    FROM users u, generate_series(1, :tombstones) s
+    """,
+    """
+    INSERT INTO audit_logs (user_id, action, entity_type, entity_id, timestamp,
+                            ip_address, user_agent)
+    SELECT u.id, (ARRAY['create', 'update', 'delete'])[1 + s % 3], 'subscription', s,
+           now() - s * interval '1 hour', '127.0.0.1', 'plan-test'
+    FROM users u, generate_series(1, :audit_logs) s
+    """,
+]
+
+# Сценарий: (имя, метод, путь, аргументы запроса, нужна ли авторизация).
+# В пути подставляются subscription_id и archived_id пользователя user1.
+SCENARIOS = [
+    ('login', 'POST', '/login', {'json': {'username': 'user1', 'password': PASSWORD}}, False),
+    ('register', 'POST', '/register', {'json': {
+        'username': 'new{uid}', 'email': 'new{uid}@example.com', 'password': PASSWORD,
+    }}, False),
+    ('get_subscriptions', 'GET', '/api/subscriptions', {}, True),
+    ('get_subscriptions_fields', 'GET', '/api/subscriptions?fields=id,name,amount', {}, True),
+    ('search', 'GET', '/api/subscriptions/search?q=Subscription', {}, True),
+    ('changes', 'GET', '/api/subscriptions/changes?since={since}', {}, True),
+    ('events', 'GET', '/api/subscriptions/events', {'buffered': False}, True),
+    ('get_subscription', 'GET', '/api/subscriptions/{subscription_id}', {}, True),
+    ('get_subscription_fields', 'GET',
+     '/api/subscriptions/{subscription_id}?fields=id,version', {}, True),
+    ('get_archived_subscription', 'GET', '/api/subscriptions/{archived_id}', {}, True),
+    ('create_subscription', 'POST', '/api/subscriptions', {'json': {
+        'name': 'Plan test', 'amount': 100, 'interval': 'monthly',
+        'next_billing_date': '2030-01-01',
+    }}, True),
+    ('update_subscription', 'PATCH', '/api/subscriptions/{subscription_id}',
+     {'json': {'name': 'Plan test renamed'}}, True),
+    ('delete_subscription', 'DELETE', '/api/subscriptions/{deleted_id}', {}, True),
+    ('restore_subscription', 'POST', '/api/subscriptions/{archived_id}/restore', {}, True),
+    ('audit_logs', 'GET', '/api/audit_logs', {}, True),
+    ('audit_logs_fields', 'GET', '/api/audit_logs?fields=id,action,timestamp', {}, True),
+]
+
+_recorded = {}
+
+
+@pytest.fixture(scope='module')
+def plan_app():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', DATABASE_URL)
+        app = create_app('testing')
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='seed', email='seed@example.com')
+        user.set_password(PASSWORD)
+        params = {
+            'password_hash': user.password_hash,
+            'users': USERS,
+            'per_user': SUBSCRIPTIONS_PER_USER,
+            'archived': ARCHIVED_PER_USER,
+            'tombstones': TOMBSTONES_PER_USER,
+            'audit_logs': AUDIT_LOGS_PER_USER,
+        }
+        for sql in _SEED_SQL:
+            db.session.execute(text(sql), params)
+        db.session.commit()
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('ANALYZE'))
+    yield app
+
+    if UPDATE_BASELINE and _recorded:
+        baseline = _load_baseline()
+        baseline.update(_recorded)
+        BASELINE_PATH.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True, ensure_ascii=False) + '\n'
+        )
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture(scope='module')
+def owner(plan_app):
+    """Id пользователя user1 и его строк для подстановки в пути сценариев."""
+    with plan_app.app_context():
+        user_id = db.session.execute(text("SELECT id FROM users WHERE username = 'user1'")).scalar()
+        subscription_ids = db.session.execute(
+            text('SELECT id FROM subscriptions WHERE user_id = :u ORDER BY id LIMIT 2'),
+            {'u': user_id},
+        ).scalars().all()
+        archived_id = db.session.execute(
+            text('SELECT min(id) FROM subscriptions_archive WHERE user_id = :u'), {'u': user_id}
+        ).scalar()
+    return {
+        'user_id': user_id,
+        'subscription_id': subscription_ids[0],
+        'deleted_id': subscription_ids[1],
+        'archived_id': archived_id,
+        'since': SUBSCRIPTIONS_PER_USER // 2,
+    }
+
+
+def _load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def _plan_summary(plan):
+    """Индексы, последовательно читаемые таблицы и оценка стоимости плана."""
+    indexes, seq_scans = set(), set()
+    nodes = [plan['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        if node['Node Type'] == 'Seq Scan':
+            seq_scans.add(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return {
+        'indexes': sorted(indexes),
+        'seq_scans': sorted(seq_scans),
+        'cost': plan['Plan']['Total Cost'],
+    }
+
+
+def _run_scenario(app, owner, method, path, kwargs, authenticated):
+    """Выполнить запрос и вернуть перехваченные запросы к данным."""
+    client = app.test_client()
+    if authenticated:
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(owner['user_id'])
+            sess['_fresh'] = True
+    values = dict(owner, uid=uuid.uuid4().hex[:12])
+    kwargs = json.loads(json.dumps(kwargs).replace('{uid}', values['uid']))
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.open(path.format(**values), method=method, **kwargs)
+        response.close()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code < 400, response.get_data(as_text=True)
+    return statements
+
+
+def _explain(app, statements):
+    plans = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                # EXPLAIN без ANALYZE не выполняет запрос, только планирует
+                plan = conn.exec_driver_sql(
+                    'EXPLAIN (FORMAT JSON) ' + statement, parameters
+                ).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plans.append(dict(_plan_summary(plan[0]), sql=' '.join(statement.split())))
+            conn.rollback()
+    return plans
+
+
+@pytest.mark.parametrize(
+    'name, method, path, kwargs, authenticated', SCENARIOS, ids=[s[0] for s in SCENARIOS]
+)
+def test_query_plans_match_baseline(plan_app, owner, name, method, path, kwargs, authenticated):
+    plans = _explain(plan_app, _run_scenario(plan_app, owner, method, path, kwargs, authenticated))
+    assert plans, 'Сценарий не выполнил ни одного запроса'
+
+    if UPDATE_BASELINE:
+        _recorded[name] = plans
+        return
+
+    expected = _load_baseline().get(name)
+    if expected is None:
+        pytest.fail(f'Нет эталона для {name}: запустите с UPDATE_QUERY_PLANS=1')
+    assert [plan['sql'] for plan in plans] == [plan['sql'] for plan in expected], (
+        'Запросы сценария изменились: обновите эталон (UPDATE_QUERY_PLANS=1)'
+    )
+
+    problems = []
+    for number, (actual, baseline) in enumerate(zip(plans, expected), 1):
+        label = f'{name} #{number}: {actual["sql"][:120]}'
+        lost = set(baseline['indexes']) - set(actual['indexes'])
+        if lost:
+            problems.append(f'{label}\n  не используются индексы: {", ".join(sorted(lost))}')
+        new_scans = set(actual['seq_scans']) - set(baseline['seq_scans'])
+        if new_scans:
+            problems.append(f'{label}\n  новый Seq Scan: {", ".join(sorted(new_scans))}')
+        if actual['cost'] > baseline['cost'] * PLAN_COST_TOLERANCE:
+            problems.append(
+                f'{label}\n  стоимость {actual["cost"]:.2f} > эталона {baseline["cost"]:.2f}'
+            )
+    assert not problems, '\n'.join(problems)
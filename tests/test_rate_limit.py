@@ -0,0 +1,132 @@
+"""
+Тесты для ограничения частоты запросов.
+"""
+import multiprocessing
+
+import pytest
+
+from app.services.rate_limit import (
+    ConcurrencyLimiter, MemoryBucketStore, SharedBucketStore, SharedConcurrencyLimiter,
+    parse_rate, rate_limiter,
+)
+
+
+@pytest.fixture
+def limits_enabled(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(rate_limiter, 'store', MemoryBucketStore())
+
+
+def test_parse_rate():
+    assert parse_rate('10/minute') == (10 / 60, 10)
+    assert parse_rate('5/second') == (5, 5)
+
+
+def test_memory_bucket_refills():
+    store = MemoryBucketStore()
+    assert [store.consume('k', 1, 2, now=100)[0] for _ in range(3)] == [True, True, False]
+
+    allowed, retry_after = store.consume('k', 1, 2, now=100.5)
+    assert allowed is False
+    assert retry_after == pytest.approx(0.5)
+    assert store.consume('k', 1, 2, now=101)[0] is True
+
+
+def test_shared_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'buckets.bin')
+    worker_a = SharedBucketStore(path, shards=4, slots=8)
+    worker_b = SharedBucketStore(path, shards=4, slots=8)
+    try:
+        assert worker_a.consume('login:ip:1.2.3.4', 1, 2, now=10)[0] is True
+        assert worker_b.consume('login:ip:1.2.3.4', 1, 2, now=10)[0] is True
+        assert worker_a.consume('login:ip:1.2.3.4', 1, 2, now=10)[0] is False
+        # Другие ключи не затронуты
+        assert worker_b.consume('login:ip:5.6.7.8', 1, 2, now=10)[0] is True
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_shared_store_evicts_when_shard_full(tmp_path):
+    store = SharedBucketStore(str(tmp_path / 'buckets.bin'), shards=1, slots=4)
+    try:
+        for i in range(10):
+            assert store.consume(f'key{i}', 1, 1, now=i)[0] is True
+    finally:
+        store.close()
+
+
+def test_concurrency_limiter_sheds_load():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_wait=0.01)
+    assert limiter.acquire() is True
+    assert limiter.acquire() is False
+    limiter.release()
+    assert limiter.acquire() is True
+
+
+def _hold_slot(path, acquired, release):
+    limiter = SharedConcurrencyLimiter(path, max_concurrent=2, max_wait=1)
+    limiter.acquire()
+    acquired.set()
+    release.wait(5)
+
+
+def test_shared_concurrency_limiter_spans_processes(tmp_path):
+    path = str(tmp_path / 'auth.slots')
+    context = multiprocessing.get_context('fork')
+    acquired, release = context.Event(), context.Event()
+    worker = context.Process(target=_hold_slot, args=(path, acquired, release))
+    worker.start()
+    limiter = SharedConcurrencyLimiter(path, max_concurrent=2, max_wait=0.05)
+    try:
+        assert acquired.wait(5)
+        # Второй слот из двух - у этого процесса, первый занят другим воркером
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False
+        limiter.release()
+        assert limiter.acquire() is True
+
+        # Слоты завершившегося воркера освобождает ядро
+        release.set()
+        worker.join(5)
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False
+    finally:
+        release.set()
+        worker.join(5)
+        limiter.close()
+
+
+def test_concurrency_split_between_workers_without_shared_file(app, monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    monkeypatch.setitem(app.config, 'RATELIMIT_STORAGE_PATH', None)
+    monkeypatch.setitem(app.config, 'RATELIMIT_AUTH_CONCURRENCY', 8)
+    monkeypatch.setitem(app.config, 'RATELIMIT_WORKERS', 3)
+    with app.app_context():
+        assert rate_limiter._concurrency_limiter('auth').max_concurrent == 3
+
+
+def test_login_limited_per_username(client, user, limits_enabled):
+    for _ in range(10):
+        response = client.post("/login", json={"username": "testuser", "password": "wrong"})
+        assert response.status_code == 401
+
+    response = client.post("/login", json={"username": "testuser", "password": "wrong"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # GET страницы входа лимит не расходует
+    assert client.get("/login").status_code == 200
+
+
+def test_api_limited_per_user(app, authenticated_client, limits_enabled, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_API', '2/minute')
+
+    assert authenticated_client.get("/api/subscriptions").status_code == 200
+    assert authenticated_client.get("/api/subscriptions").status_code == 200
+    response = authenticated_client.get("/api/subscriptions")
+
+    assert response.status_code == 429
+    assert "error" in response.get_json()
+    # Лимит считается по маршруту
+    assert authenticated_client.get("/api/audit_logs").status_code == 200
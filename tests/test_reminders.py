@@ -0,0 +1,144 @@
+"""
+Тесты для планировщика напоминаний.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import Subscription, SubscriptionTombstone
+from app.services.reminders import ReminderScheduler, reminder_scheduler
+
+
+NOW = datetime(2024, 12, 1, 12, 0)
+
+
+@pytest.fixture
+def scheduler(app, monkeypatch, tmp_path):
+    """Отдельный экземпляр планировщика с checkpoint во временном каталоге."""
+    monkeypatch.setitem(app.config, 'REMINDER_CHECKPOINT_PATH', str(tmp_path / 'reminders.json'))
+    monkeypatch.setitem(app.extensions, 'reminder_scheduler', reminder_scheduler)
+    return ReminderScheduler(app)
+
+
+def _add_subscription(db_session, user_id, name, billing_date, is_active=True):
+    subscription = Subscription(
+        user_id=user_id,
+        name=name,
+        amount=100,
+        interval="monthly",
+        next_billing_date=billing_date,
+        is_active=is_active,
+    )
+    db_session.add(subscription)
+    db_session.commit()
+    return subscription.id
+
+
+def test_load_only_window(scheduler, user, db_session):
+    """В кучу попадают только активные подписки в пределах горизонта."""
+    soon = _add_subscription(db_session, user.id, "Soon", date(2024, 12, 6))
+    _add_subscription(db_session, user.id, "Later", date(2025, 3, 1))
+    _add_subscription(db_session, user.id, "Inactive", date(2024, 12, 6), is_active=False)
+
+    scheduler.load(NOW)
+
+    assert scheduler.memory_usage()['items'] == 1
+    assert scheduler.next_fire_time() == scheduler.fire_time(date(2024, 12, 6))
+    assert scheduler.run_pending(NOW) == []
+
+    events = scheduler.run_pending(datetime(2024, 12, 3, 9, 0))
+    assert [event['subscription_id'] for event in events] == [soon]
+
+
+def test_run_pending_skips_changed_subscription(scheduler, user, db_session):
+    """Перед срабатыванием подписка перепроверяется в БД."""
+    subscription_id = _add_subscription(db_session, user.id, "Moved", date(2024, 12, 6))
+    scheduler.load(NOW)
+
+    subscription = db_session.get(Subscription, subscription_id)
+    subscription.next_billing_date = date(2024, 12, 31)
+    db_session.commit()
+
+    assert scheduler.run_pending(datetime(2024, 12, 4)) == []
+
+
+def test_checkpoint_restore(scheduler, app, user, db_session):
+    """После перезапуска окно восстанавливается из checkpoint без рескана."""
+    subscription_id = _add_subscription(db_session, user.id, "Netflix", date(2024, 12, 6))
+    scheduler.load(NOW)
+
+    # Строки, добавленные в уже загруженное окно в обход хуков, не сканируются повторно
+    _add_subscription(db_session, user.id, "Bypass", date(2024, 12, 5))
+
+    restarted = ReminderScheduler(app)
+    restarted.load(NOW)
+
+    assert restarted.memory_usage()['items'] == 1
+    events = restarted.run_pending(datetime(2024, 12, 3, 9, 0))
+    assert [event['subscription_id'] for event in events] == [subscription_id]
+
+
+def test_routes_update_schedule(authenticated_client, user, db_session, monkeypatch):
+    """Создание, изменение и удаление подписки через API обновляют расписание."""
+    for attr in ('_heap', '_entries', '_loaded_until', '_fired_until', '_synced_at'):
+        monkeypatch.setattr(reminder_scheduler, attr, getattr(reminder_scheduler, attr))
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    reminder_scheduler.load(tomorrow - timedelta(days=2))
+
+    billing_date = (tomorrow + timedelta(days=3)).date()
+    response = authenticated_client.post("/api/subscriptions", json={
+        "name": "Spotify",
+        "amount": 5.99,
+        "interval": "monthly",
+        "next_billing_date": billing_date.isoformat(),
+    })
+    subscription_id = response.get_json()["id"]
+    assert reminder_scheduler.next_fire_time() == reminder_scheduler.fire_time(billing_date)
+
+    moved_date = billing_date + timedelta(days=1)
+    authenticated_client.put(
+        f"/api/subscriptions/{subscription_id}",
+        json={"next_billing_date": moved_date.isoformat()},
+    )
+    assert reminder_scheduler.next_fire_time() == reminder_scheduler.fire_time(moved_date)
+
+    authenticated_client.delete(f"/api/subscriptions/{subscription_id}")
+    assert reminder_scheduler.next_fire_time() is None
+
+
+def test_sync_changes_picks_up_writes_from_other_workers(scheduler, user, db_session):
+    """Изменения в обход хуков этого воркера подхватываются на тике."""
+    now = datetime.utcnow()
+    soon = (now + timedelta(days=5)).date()
+    moved_id = _add_subscription(db_session, user.id, "Moved", soon)
+    deleted_id = _add_subscription(db_session, user.id, "Deleted", soon)
+    scheduler.load(now)
+    assert scheduler.memory_usage()['items'] == 2
+
+    # Другой воркер: новая подписка, перенос, удаление с надгробием
+    created_id = _add_subscription(db_session, user.id, "Created", soon)
+    db_session.get(Subscription, moved_id).next_billing_date = soon + timedelta(days=1)
+    db_session.delete(db_session.get(Subscription, deleted_id))
+    db_session.add(SubscriptionTombstone(user_id=user.id, subscription_id=deleted_id, change_seq=1))
+    db_session.commit()
+
+    assert scheduler.sync_changes(now + timedelta(minutes=1)) == 3
+    assert scheduler.memory_usage()['items'] == 2
+
+    # Строки в пределах перекрытия перечитываются снова, но куча не растёт
+    heap_size = len(scheduler._heap)
+    scheduler.sync_changes(now + timedelta(minutes=2))
+    assert len(scheduler._heap) == heap_size
+
+    events = scheduler.run_pending(now + timedelta(days=4))
+    assert sorted(event['subscription_id'] for event in events) == sorted([created_id, moved_id])
+
+
+def test_memory_usage_per_item(scheduler, user, db_session):
+    for day in range(1, 8):
+        _add_subscription(db_session, user.id, f"Service {day}", date(2024, 12, 4 + day))
+    scheduler.load(NOW)
+
+    usage = scheduler.memory_usage()
+    assert usage['items'] == 7
+    assert 0 < usage['bytes_per_item'] < 1024
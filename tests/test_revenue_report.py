@@ -0,0 +1,53 @@
+"""
+Тесты для отчёта по выручке.
+"""
+from datetime import date
+from decimal import Decimal
+
+from app.models import Subscription, User
+from app.services.revenue_report import build_report, merge_partials, split_id_range
+
+
+def test_split_id_range():
+    assert split_id_range(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+    assert split_id_range(5, 5, 100) == [(5, 5)]
+
+
+def test_merge_partials():
+    partials = [
+        {'mrr': Decimal('10'), 'upcoming_charges': 1,
+         'by_interval': {'monthly': {'count': 1, 'mrr': Decimal('10')}}},
+        {'mrr': Decimal('15'), 'upcoming_charges': 0,
+         'by_interval': {'monthly': {'count': 1, 'mrr': Decimal('5')},
+                         'yearly': {'count': 1, 'mrr': Decimal('10')}}},
+    ]
+    report = merge_partials(partials)
+
+    assert report['mrr'] == Decimal('25.00')
+    assert report['upcoming_charges'] == 1
+    assert report['by_interval']['monthly'] == {'count': 2, 'mrr': Decimal('15.00')}
+
+
+def test_build_report_in_process(db_session, user):
+    other = User(username="other", email="other@example.com")
+    other.set_password("password123")
+    db_session.add(other)
+    db_session.commit()
+
+    db_session.add_all([
+        Subscription(user_id=user.id, name="Netflix", amount=999, interval="monthly",
+                     next_billing_date=date(2024, 12, 3)),
+        Subscription(user_id=other.id, name="Office", amount=1000, interval="yearly",
+                     next_billing_date=date(2025, 6, 1)),
+        Subscription(user_id=other.id, name="Old", amount=500, interval="monthly",
+                     next_billing_date=date(2024, 12, 2), is_active=False),
+    ])
+    db_session.commit()
+
+    report = build_report(workers=1, chunk_size=1, upcoming_days=7, today=date(2024, 12, 1))
+
+    assert report['mrr'] == Decimal('1082.33')
+    assert report['by_interval']['monthly']['count'] == 1
+    assert report['by_interval']['yearly']['mrr'] == Decimal("83.33")
+    assert report['upcoming_charges'] == 1
+    assert len(report['timing']['chunks']) == 2
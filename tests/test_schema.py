@@ -0,0 +1,71 @@
+"""
+Тесты для обновления схемы существующей БД (create_tables.py).
+"""
+from sqlalchemy import inspect
+
+from app.models import db, Subscription, User
+from app.services.schema import upgrade_schema
+
+# Таблицы в том виде, в каком их создавала первая версия приложения
+_LEGACY_DDL = (
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+        email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(255) NOT NULL,
+        created_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE subscriptions (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        name VARCHAR(200) NOT NULL, amount NUMERIC(10, 2) NOT NULL,
+        interval VARCHAR(20) NOT NULL, next_billing_date DATE NOT NULL,
+        is_active BOOLEAN NOT NULL, created_at DATETIME
+    )
+    """,
+    "CREATE INDEX ix_subscriptions_user_id ON subscriptions (user_id)",
+    "INSERT INTO users VALUES (1, 'legacy', 'legacy@example.com', 'x', '2024-01-01 00:00:00')",
+    "INSERT INTO subscriptions VALUES (1, 1, 'Netflix', 599, 'monthly', '2030-01-01', 1, '2024-01-02 00:00:00')",
+    "INSERT INTO subscriptions VALUES (2, 1, 'Spotify', 169, 'monthly', '2030-01-05', 1, '2024-01-03 00:00:00')",
+)
+
+
+def test_upgrade_adds_columns_and_numbers_legacy_rows(app, client):
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        connection = db.session.connection()
+        for statement in _LEGACY_DDL:
+            connection.exec_driver_sql(statement)
+        db.session.commit()
+
+        db.create_all()
+        report = upgrade_schema()
+        assert sorted(report['added']) == [
+            'subscriptions.change_seq', 'subscriptions.updated_at', 'subscriptions.version',
+            'users.change_seq', 'users.sync_floor_seq',
+        ]
+        assert 'ix_subscriptions_user_change_seq' in report['indexes']
+        assert report['backfilled'] == 2
+
+        rows = db.session.execute(
+            db.select(Subscription.id, Subscription.change_seq, Subscription.version,
+                      Subscription.updated_at, Subscription.created_at)
+            .order_by(Subscription.id)
+        ).all()
+        assert [(row.id, row.change_seq, row.version) for row in rows] == [(1, 1, 1), (2, 2, 1)]
+        assert all(row.updated_at == row.created_at for row in rows)
+        assert db.session.get(User, 1).change_seq == 2
+
+        # Повторный запуск ничего не меняет
+        assert upgrade_schema() == {'added': [], 'indexes': [], 'backfilled': 0}
+        columns = {column['name'] for column in inspect(db.engine).get_columns('subscriptions')}
+        assert {'updated_at', 'version', 'change_seq'} <= columns
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = '1'
+    snapshot = client.get('/api/subscriptions/changes').get_json()
+    assert [sub['name'] for sub in snapshot['changed']] == ['Netflix', 'Spotify']
+    assert snapshot['next'] == '2'
+    delta = client.get('/api/subscriptions/changes?since=1').get_json()
+    assert [sub['name'] for sub in delta['changed']] == ['Spotify']
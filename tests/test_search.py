@@ -0,0 +1,77 @@
+"""
+Тесты для поиска подписок.
+"""
+from datetime import date
+
+from app.models import Subscription
+from app.services.search import UserNgramIndex, trigrams
+
+
+def _add(db_session, user_id, *names):
+    db_session.add_all([
+        Subscription(user_id=user_id, name=name, amount=10, interval="monthly",
+                     next_billing_date=date(2024, 12, 1))
+        for name in names
+    ])
+    db_session.commit()
+
+
+def test_trigrams_normalization():
+    assert trigrams("Go") == {"  g", " go", "go "}
+    assert trigrams("YA-ya") == trigrams("ya ya")
+
+
+def test_ngram_index_ranking():
+    index = UserNgramIndex([(1, "Yandex Music"), (2, "Spotify"), (3, "Yandex Plus")])
+
+    assert [sid for sid, _ in index.search("music", 10)] == [1]
+    assert [sid for sid, _ in index.search("spotfy", 10)] == [2]  # опечатка
+    assert {sid for sid, _ in index.search("yandex", 10)} == {1, 3}
+
+    index.remove(1)
+    assert [sid for sid, _ in index.search("music", 10)] == []
+
+
+def test_search_endpoint(authenticated_client, user, db_session):
+    _add(db_session, user.id, "Netflix Premium", "Spotify Family", "Yandex Music")
+    _add(db_session, 9999, "Netflix")  # чужая подписка
+
+    response = authenticated_client.get("/api/subscriptions/search?q=netflx")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [sub["name"] for sub in data["subscriptions"]] == ["Netflix Premium"]
+    assert data["subscriptions"][0]["score"] > 0
+
+
+def test_search_substring_first(authenticated_client, user, db_session):
+    _add(db_session, user.id, "Music box", "Yandex Music", "Musik")
+
+    response = authenticated_client.get("/api/subscriptions/search?q=music")
+    names = [sub["name"] for sub in response.get_json()["subscriptions"]]
+
+    assert set(names[:2]) == {"Music box", "Yandex Music"}
+
+
+def test_search_index_follows_mutations(authenticated_client, user):
+    # Первый поиск строит индекс пользователя
+    assert authenticated_client.get("/api/subscriptions/search?q=kino").get_json()["subscriptions"] == []
+
+    response = authenticated_client.post("/api/subscriptions", json={
+        "name": "Kinopoisk",
+        "amount": 299,
+        "interval": "monthly",
+        "next_billing_date": "2024-12-01",
+    })
+    subscription_id = response.get_json()["id"]
+    found = authenticated_client.get("/api/subscriptions/search?q=kino").get_json()["subscriptions"]
+    assert [sub["id"] for sub in found] == [subscription_id]
+
+    authenticated_client.delete(f"/api/subscriptions/{subscription_id}")
+    assert authenticated_client.get("/api/subscriptions/search?q=kino").get_json()["subscriptions"] == []
+
+
+def test_search_requires_query(authenticated_client):
+    response = authenticated_client.get("/api/subscriptions/search")
+
+    assert response.status_code == 400
@@ -0,0 +1,169 @@
+"""
+Тесты для SQLite профиля: PRAGMA соединений и очередь писателя.
+"""
+import threading
+
+import pytest
+
+from app import create_app
+from app.models import db, AuditLog, Subscription, User
+from app.services.sqlite_writer import sqlite_writer
+from config import SQLiteConfig
+
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(SQLiteConfig, 'RATELIMIT_ENABLED', False)
+    monkeypatch.setattr(SQLiteConfig, 'RATELIMIT_STORAGE_PATH', None)
+    app = create_app('sqlite')
+    with app.app_context():
+        db.create_all()
+        user = User(username='edge', email='edge@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        app.config['TEST_USER_ID'] = user.id
+    yield app
+    sqlite_writer.stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _audit(action):
+    db.session.add(AuditLog(user_id=None, action=action, entity_type='test', entity_id=0))
+
+
+def test_pragmas_applied(sqlite_app):
+    with sqlite_app.app_context():
+        connection = db.session.connection()
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+
+
+def test_failed_job_does_not_roll_back_batch(sqlite_app):
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+        _audit('first')
+
+    def broken():
+        _audit('broken')
+        raise ValueError('ошибка задания')
+
+    first = sqlite_writer.submit(blocker)
+    started.wait(5)
+    # Пока писатель занят, задания копятся и попадают в одну пачку
+    commits = sqlite_writer.stats['commits']
+    futures = [sqlite_writer.submit(broken), sqlite_writer.submit(_audit, 'second')]
+    release.set()
+
+    first.result(5)
+    with pytest.raises(ValueError):
+        futures[0].result(5)
+    futures[1].result(5)
+    assert sqlite_writer.stats['commits'] - commits == 2
+    with sqlite_app.app_context():
+        actions = db.session.execute(db.select(AuditLog.action)).scalars().all()
+    assert sorted(actions) == ['first', 'second']
+
+
+def test_concurrent_creates_are_group_committed(sqlite_app):
+    user_id = sqlite_app.config['TEST_USER_ID']
+    statuses = []
+
+    def create(worker):
+        client = sqlite_app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+        for i in range(10):
+            response = client.post('/api/subscriptions', json={
+                'name': f'Edge {worker}-{i}', 'amount': 100, 'interval': 'monthly',
+                'next_billing_date': '2030-01-01',
+            })
+            statuses.append(response.status_code)
+
+    jobs_before = sqlite_writer.stats['jobs']
+    commits_before = sqlite_writer.stats['commits']
+    threads = [threading.Thread(target=create, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sqlite_writer.stop()
+
+    assert statuses == [201] * 80
+    with sqlite_app.app_context():
+        assert db.session.execute(db.select(db.func.count(Subscription.id))).scalar() == 80
+        assert db.session.execute(db.select(db.func.count(AuditLog.id))).scalar() == 80
+        change_seqs = db.session.execute(db.select(Subscription.change_seq)).scalars().all()
+    assert sorted(change_seqs) == list(range(1, 81))
+    # Подписка и запись аудита - 160 заданий, пачками меньше коммитов
+    assert sqlite_writer.stats['jobs'] - jobs_before == 160
+    assert sqlite_writer.stats['commits'] - commits_before < 160
+
+
+def test_all_writes_go_through_writer(sqlite_app):
+    client = sqlite_app.test_client()
+    jobs = sqlite_writer.stats['jobs']
+    response = client.post('/register', json={
+        'username': 'writer', 'email': 'writer@example.com', 'password': 'Password123'})
+    assert response.status_code == 201
+
+    created = client.post('/api/subscriptions', json={
+        'name': 'Edge', 'amount': 100, 'interval': 'monthly', 'next_billing_date': '2030-01-01'})
+    url = f"/api/subscriptions/{created.get_json()['id']}"
+    assert client.patch(url, json={'amount': 200}).status_code == 200
+    # Условная запись с устаревшей версией откатывается целиком
+    response = client.patch(url, json={'amount': 300}, headers={'If-Match': '"1"'})
+    assert response.status_code == 412
+    assert client.delete(url).status_code == 200
+
+    response = client.post('/api/subscriptions/import', data=(
+        'name,amount,interval,next_billing_date\nImported,10,monthly,2030-01-01\n'
+    ), content_type='text/csv')
+    assert response.get_json()['imported'] == 1
+
+    sqlite_writer.stop()
+    # Четыре записи с аудитом, откаченное обновление и импорт (аудит в
+    # той же транзакции) - всё через писателя
+    assert sqlite_writer.stats['jobs'] - jobs == 10
+    with sqlite_app.app_context():
+        user_id = db.session.execute(db.select(User.id).where(User.username == 'writer')).scalar_one()
+        names = db.session.execute(
+            db.select(Subscription.name).where(Subscription.user_id == user_id)).scalars().all()
+        seq = db.session.get(User, user_id).change_seq
+    assert names == ['Imported']
+    assert seq == 4
+
+
+def test_import_reads_file_outside_writer(sqlite_app, monkeypatch):
+    from app.services import statement_import
+
+    read_csv, load_chunk = statement_import.read_csv, statement_import._load_chunk
+    readers, loaders = set(), []
+
+    def tracked_read(stream, encoding):
+        for record in read_csv(stream, encoding):
+            readers.add(threading.current_thread().name)
+            yield record
+
+    def tracked_load(*args):
+        loaders.append(threading.current_thread().name)
+        return load_chunk(*args)
+
+    monkeypatch.setattr(statement_import, 'read_csv', tracked_read)
+    monkeypatch.setattr(statement_import, '_load_chunk', tracked_load)
+    monkeypatch.setitem(sqlite_app.config, 'IMPORT_CHUNK_SIZE', 2)
+    client = sqlite_app.test_client()
+    client.post('/register', json={
+        'username': 'importer', 'email': 'importer@example.com', 'password': 'Password123'})
+
+    response = client.post('/api/subscriptions/import', data='name,amount,interval,next_billing_date\n' + ''.join(
+        f'Service {i},{i + 1},monthly,2030-01-01\n' for i in range(5)), content_type='text/csv')
+    assert response.get_json()['imported'] == 5
+    # Файл читается в потоке запроса, писателю - по заданию на пачку
+    assert 'sqlite-writer' not in readers
+    assert loaders == ['sqlite-writer'] * 3
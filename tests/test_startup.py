@@ -0,0 +1,53 @@
+"""
+Тесты для времени холодного старта и ленивых импортов create_app.
+"""
+import os
+from pathlib import Path
+
+from startup_profile import measure_startup, parse_importtime, startup_modules
+
+# Бюджет холодного старта: собственная часть приложения (импорт пакета app,
+# create_app и первый запрос) и весь процесс. Переопределяется для медленных CI
+OWN_BUDGET = float(os.environ.get('STARTUP_OWN_BUDGET_MS', 400)) / 1000
+TOTAL_BUDGET = float(os.environ.get('STARTUP_BUDGET_MS', 3000)) / 1000
+
+# Редко нужные модули, которые не должны загружаться при старте
+LAZY_MODULES = {'app.services.statement_import', 'app.services.profiler'}
+if not (Path(__file__).resolve().parent.parent / '.env').exists():
+    LAZY_MODULES.add('dotenv')
+
+
+def test_cold_start_fits_budget():
+    phases = measure_startup('testing', '/login', runs=3)
+    assert phases['status'] == 200
+    assert phases['own'] < OWN_BUDGET, phases
+    assert phases['total'] < TOTAL_BUDGET, phases
+
+
+def test_rarely_used_modules_are_not_imported_at_startup():
+    modules = startup_modules('testing')
+    assert 'app.routes.api' in modules
+    assert not modules & LAZY_MODULES
+
+
+def test_app_without_blueprints_skips_route_modules():
+    modules = startup_modules('testing', blueprints=[])
+    assert 'app.models' in modules
+    assert not {module for module in modules if module.startswith('app.routes')}
+
+    modules = startup_modules('testing', blueprints=['auth'])
+    assert {module for module in modules if module.startswith('app.routes.')} == {'app.routes.auth'}
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     app.utils\n"
+        "import time:      2000 |       2120 |   app.services.search\n"
+        "import time:       500 |       2620 | app\n"
+    )
+    assert parse_importtime(output) == [
+        {'module': 'app.utils', 'self_us': 120, 'cumulative_us': 120, 'depth': 2},
+        {'module': 'app.services.search', 'self_us': 2000, 'cumulative_us': 2120, 'depth': 1},
+        {'module': 'app', 'self_us': 500, 'cumulative_us': 2620, 'depth': 0},
+    ]
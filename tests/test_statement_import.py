@@ -0,0 +1,110 @@
+"""
+Тесты для импорта подписок из выписок CSV и OFX.
+"""
+import io
+
+from app.models import db, AuditLog, OutboxEvent, Subscription
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260131120000<TRNAMT>-599.00<NAME>Netflix</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260215<TRNAMT>-169.50<MEMO>Spotify Premium</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260201<TRNAMT>50000.00<NAME>Зарплата</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def _import(client, body, **query):
+    return client.post("/api/subscriptions/import", query_string=query, data=body.encode())
+
+
+def test_csv_import_loads_valid_rows_and_reports_errors(authenticated_client, app):
+    body = (
+        "Interval;Name;Amount;Next_Billing_Date;Comment\n"
+        "monthly;Netflix;599,00;2026-11-01;видео\n"
+        ";;;;\n"
+        "yearly;;100;2026-11-01;\n"
+        "weekly;Spotify;-5;01.11.2026;\n"
+        "yearly;Яндекс Плюс;2 990;2027-01-15;\n"
+    )
+    response = _import(authenticated_client, body, format="csv")
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["imported"] == 2
+    assert result["failed"] == 2
+    assert [error["row"] for error in result["errors"]] == [3, 4]
+    assert len(result["errors"][1]["errors"]) == 3
+    assert result["errors_truncated"] is False
+
+    subscriptions = authenticated_client.get("/api/subscriptions").get_json()["subscriptions"]
+    assert sorted((sub["name"], sub["amount"]) for sub in subscriptions) == [
+        ("Netflix", 599.0), ("Яндекс Плюс", 2990.0)
+    ]
+    # Поиск видит импортированные подписки
+    found = authenticated_client.get("/api/subscriptions/search?q=netflix").get_json()
+    assert [sub["name"] for sub in found["subscriptions"]] == ["Netflix"]
+
+    # Аудит: по записи на импортированную подписку, entity_id - её id
+    audit = db.session.query(AuditLog).filter_by(action="import").all()
+    assert sorted(log.entity_id for log in audit) == sorted(sub["id"] for sub in subscriptions)
+    assert {(log.entity_type, log.user_id) for log in audit} == {("subscription", subscriptions[0]["user_id"])}
+
+
+def test_ofx_upload_imports_debits_as_monthly(authenticated_client):
+    response = authenticated_client.post(
+        "/api/subscriptions/import",
+        data={"file": (io.BytesIO(OFX.encode()), "statement.ofx")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result["imported"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["row"] == 3
+
+    subscriptions = authenticated_client.get("/api/subscriptions").get_json()["subscriptions"]
+    assert sorted((sub["name"], sub["amount"], sub["next_billing_date"]) for sub in subscriptions) == [
+        ("Netflix", 599.0, "2026-02-28"),
+        ("Spotify Premium", 169.5, "2026-03-15"),
+    ]
+    assert {sub["interval"] for sub in subscriptions} == {"monthly"}
+
+
+def test_invalid_file_is_rejected_without_changes(authenticated_client, db_session):
+    response = _import(authenticated_client, "name,amount\nNetflix,599\n")
+    assert response.status_code == 400
+    assert "interval" in response.get_json()["error"]
+
+    response = _import(authenticated_client, "<OFX>", format="xlsx")
+    assert response.status_code == 415
+
+    # Ошибка кодировки посреди файла откатывает уже загруженные пачки
+    body = "name,amount,interval,next_billing_date\n" + "A,1,monthly,2026-11-01\n" * 5
+    response = authenticated_client.post(
+        "/api/subscriptions/import", query_string={"format": "csv"},
+        data=body.encode() + b"\xff\xfe,1,monthly,2026-11-01\n",
+    )
+    assert response.status_code == 400
+    assert db_session.query(Subscription).count() == 0
+
+
+def test_import_chunks_share_change_seq_range_and_outbox(authenticated_client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setitem(app.config, "OUTBOX_ENDPOINTS", ["http://example.invalid/hook"])
+    token = authenticated_client.get("/api/subscriptions/changes").get_json()["next"]
+
+    body = "name,amount,interval,next_billing_date\n" + "".join(
+        f"Service {i},{i + 1}.00,monthly,2026-11-01\n" for i in range(5)
+    )
+    assert _import(authenticated_client, body, format="csv").get_json()["imported"] == 5
+
+    delta = authenticated_client.get(f"/api/subscriptions/changes?since={token}").get_json()
+    assert [sub["name"] for sub in delta["changed"]] == [f"Service {i}" for i in range(5)]
+    assert int(delta["next"]) == int(token) + 5
+
+    with app.app_context():
+        events = db.session.execute(db.select(OutboxEvent).order_by(OutboxEvent.change_seq)).scalars().all()
+        assert [event.event_type for event in events] == ["subscription.created"] * 5
+        assert [event.change_seq for event in events] == list(range(int(token) + 1, int(token) + 6))
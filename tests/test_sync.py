@@ -0,0 +1,79 @@
+"""
+Тесты для delta-синхронизации подписок.
+"""
+from datetime import datetime, timedelta
+
+from app.models import Subscription, SubscriptionTombstone
+from app.services.sync import compact_tombstones
+
+
+def _create(client, name):
+    response = client.post("/api/subscriptions", json={
+        "name": name,
+        "amount": 100,
+        "interval": "monthly",
+        "next_billing_date": "2024-12-01",
+    })
+    return response.get_json()["id"]
+
+
+def test_full_snapshot_then_delta(authenticated_client):
+    first = _create(authenticated_client, "First")
+    second = _create(authenticated_client, "Second")
+
+    snapshot = authenticated_client.get("/api/subscriptions/changes").get_json()
+    assert [sub["id"] for sub in snapshot["changed"]] == [first, second]
+    assert snapshot["deleted"] == []
+    token = snapshot["next"]
+
+    # Без изменений дельта пустая, токен не меняется
+    empty = authenticated_client.get(f"/api/subscriptions/changes?since={token}").get_json()
+    assert empty == {"changed": [], "deleted": [], "next": token, "has_more": False}
+
+    authenticated_client.patch(f"/api/subscriptions/{first}", json={"name": "Renamed"})
+    authenticated_client.delete(f"/api/subscriptions/{second}")
+
+    delta = authenticated_client.get(f"/api/subscriptions/changes?since={token}").get_json()
+    assert [sub["name"] for sub in delta["changed"]] == ["Renamed"]
+    assert delta["deleted"] == [second]
+    assert int(delta["next"]) == int(token) + 2
+
+
+def test_changes_pagination(authenticated_client):
+    ids = [_create(authenticated_client, f"Service {i}") for i in range(5)]
+    authenticated_client.delete(f"/api/subscriptions/{ids[0]}")
+
+    seen_changed, seen_deleted = [], []
+    token = "1"  # после создания первой подписки
+    while True:
+        page = authenticated_client.get(f"/api/subscriptions/changes?since={token}&limit=2").get_json()
+        seen_changed += [sub["id"] for sub in page["changed"]]
+        seen_deleted += page["deleted"]
+        token = page["next"]
+        if not page["has_more"]:
+            break
+
+    assert seen_changed == ids[1:]
+    assert seen_deleted == [ids[0]]
+
+
+def test_stale_token_after_compaction(authenticated_client, db_session):
+    subscription_id = _create(authenticated_client, "Old")
+    authenticated_client.delete(f"/api/subscriptions/{subscription_id}")
+
+    assert compact_tombstones(retention_days=30, now=datetime.utcnow() + timedelta(days=31)) == 1
+    assert db_session.query(SubscriptionTombstone).count() == 0
+
+    assert authenticated_client.get("/api/subscriptions/changes?since=1").status_code == 410
+    assert authenticated_client.get("/api/subscriptions/changes?since=2").status_code == 200
+    assert authenticated_client.get("/api/subscriptions/changes?since=abc").status_code == 400
+
+
+def test_snapshot_includes_rows_without_change_seq(authenticated_client, db_session):
+    # Строка из БД до обновления схемы: номера изменения нет
+    legacy = _create(authenticated_client, "Legacy")
+    db_session.query(Subscription).filter_by(id=legacy).update({"change_seq": 0})
+    db_session.commit()
+
+    snapshot = authenticated_client.get("/api/subscriptions/changes").get_json()
+    assert [sub["id"] for sub in snapshot["changed"]] == [legacy]